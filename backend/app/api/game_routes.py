@@ -3,10 +3,12 @@
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from app.core.database import get_db
 from app.services.game_service import GameService
+from app.services.game_orchestrator import game_orchestrator
 from app.schemas.game_schemas import GameCreate, GameResponse, GameStatus
 
 router = APIRouter()
@@ -24,6 +26,11 @@ async def create_game(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/tasks")
+async def get_game_tasks():
+    """获取游戏编排器状态（运行中和排队中的游戏任务）"""
+    return game_orchestrator.snapshot()
+
 @router.get("/{game_id}", response_model=GameResponse)
 async def get_game(
     game_id: int,
@@ -39,11 +46,15 @@ async def get_game(
 @router.get("/{game_id}/messages")
 async def get_game_messages(
     game_id: int,
+    stream: bool = False,
     db: Session = Depends(get_db)
 ):
-    """获取游戏的历史聊天记录"""
+    """获取游戏的历史聊天记录（stream=true时以流式JSON返回）"""
     game_service = GameService(db)
     try:
+        if stream:
+            chunks = await game_service.stream_game_messages(game_id)
+            return StreamingResponse(chunks, media_type="application/json")
         messages = await game_service.get_game_messages(game_id)
         return messages
     except Exception as e:
@@ -88,6 +99,14 @@ async def stop_game(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/{game_id}/task")
+async def get_game_task(game_id: int):
+    """获取游戏主循环任务的状态"""
+    task = game_orchestrator.get(game_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="游戏没有排队中或运行中的任务")
+    return task
+
 @router.get("/{game_id}/status", response_model=GameStatus)
 async def get_game_status(
     game_id: int,
@@ -7,17 +7,20 @@ from typing import List
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.services.ollama_service import OllamaService
+from app.services.health_monitor import health_monitor
+from app.services.generation_sessions import generation_sessions
+from app.services.generation_scheduler import generation_scheduler
+from app.services.model_catalog import model_catalog
+from app.services.ollama_pool import ollama_hosts
 from app.schemas.ollama_schemas import ModelInfo, ChatRequest, ChatResponse
 
 router = APIRouter()
 
 @router.get("/models", response_model=List[ModelInfo])
-async def get_available_models(db: Session = Depends(get_db)):
-    """获取可用的模型列表（包括本地和外部模型）"""
-    ollama_service = OllamaService(db=db)
+async def get_available_models(refresh: bool = False):
+    """获取可用的模型列表（包括本地和外部模型），refresh=true时跳过缓存"""
     try:
-        models = await ollama_service.get_available_models()
-        return models
+        return await model_catalog.get_models(force_refresh=refresh)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取模型列表失败: {str(e)}")
 
@@ -43,7 +46,11 @@ async def check_ollama_health():
         is_healthy = await ollama_service.check_health()
         return {
             "status": "healthy" if is_healthy else "unhealthy",
-            "ollama_available": is_healthy
+            "ollama_available": is_healthy,
+            "backends": health_monitor.snapshot(),
+            "hosts": ollama_hosts.snapshot(),
+            "prompt_eval": generation_sessions.metrics(),
+            "scheduler": generation_scheduler.snapshot()
         }
     except Exception as e:
         return {
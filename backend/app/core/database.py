@@ -2,19 +2,97 @@
 数据库配置
 """
 import os
-from sqlalchemy import create_engine, text
+import shutil
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
 
-# 数据库文件路径
-DATABASE_URL = "sqlite:///./ai_game.db"
+# 数据库连接地址（来自配置，默认为本地SQLite文件）
+DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False},
-    echo=False  # 设置为True可以看到SQL查询日志
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """为每个新的SQLite连接设置WAL和性能相关的PRAGMA
+
+    WAL模式下读取不阻塞写入，synchronous=NORMAL时提交只需写WAL，不再每次fsync整个数据库
+    """
+    cursor = dbapi_connection.cursor()
+    # 新建的数据库直接使用增量VACUUM（对已有数据库无效，需由迁移转换）
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # 启用外键约束，使表结构中的ON DELETE CASCADE生效
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def create_db_engine(database_url: str) -> Engine:
+    """根据数据库地址创建引擎（SQLite启用WAL等优化，其他数据库使用连接池）"""
+    if database_url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT / 1000}
+        if ":memory:" in database_url or database_url.rstrip("/") == "sqlite:":
+            # 内存数据库使用单连接池，不设置连接池大小
+            db_engine = create_engine(database_url, connect_args=connect_args, echo=False)
+        else:
+            db_engine = create_engine(
+                database_url,
+                connect_args=connect_args,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                echo=False  # 设置为True可以看到SQL查询日志
+            )
+        event.listen(db_engine, "connect", _apply_sqlite_pragmas)
+        return db_engine
+    
+    return create_engine(
+        database_url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,  # 多进程部署时连接可能被服务端关闭
+        pool_recycle=1800,
+        echo=False
+    )
+
+engine = create_db_engine(DATABASE_URL)
+# expire_on_commit=False：提交后不让ORM对象过期，避免在事件循环线程上触发隐式的懒加载查询
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# 专用数据库线程：所有会话I/O（查询、提交、fsync）都在该线程中串行执行，不阻塞事件循环
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-worker")
+# 只读查询线程：历史消息回放、状态轮询等不必排在游戏循环的写入之后
+_db_read_executor = ThreadPoolExecutor(max_workers=settings.DB_READ_WORKERS, thread_name_prefix="db-reader")
+
+T = TypeVar("T")
+
+async def run_in_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在专用数据库线程中执行同步的会话操作
+
+    用法：await run_in_db(db.query(Game).filter(Game.id == game_id).first)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+async def run_in_db_read(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在只读查询线程中执行同步的会话查询
+
+    只用于不写入的会话（如接口的查询请求）；同一会话的操作需依次await，不能并发。
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_read_executor, functools.partial(func, *args, **kwargs))
+
+def shutdown_db_executor():
+    """关闭数据库线程（等待已提交的操作完成）"""
+    _db_read_executor.shutdown(wait=True)
+    _db_executor.shutdown(wait=True)
 
 Base = declarative_base()
 
@@ -36,22 +114,80 @@ async def init_db():
     from app.models.elimination import Elimination
     from app.models.vote import Vote
     from app.models.external_model import ExternalModel
+    from app.models.speech_checkpoint import SpeechCheckpoint
+    from app.models.archived_game import ArchivedGame
     
     # 创建所有表
     Base.metadata.create_all(bind=engine)
     
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+        print(f"🗄️ SQLite日志模式: {journal_mode}")
+    
     # 执行数据库迁移
     await _migrate_database()
     
     print("数据库初始化完成")
 
+# 热点查询使用的复合索引：(索引名, 表名, 列)
+COMPOSITE_INDEXES = [
+    ("ix_messages_round_type_seq", "messages", ("round_id", "message_type", "sequence_number")),
+    ("ix_votes_round_phase", "votes", ("round_id", "vote_phase")),
+    ("ix_participants_game_status", "participants", ("game_id", "status")),
+    ("ix_rounds_game_number", "rounds", ("game_id", "round_number")),
+    ("ix_games_status", "games", ("status",)),
+]
+
+def _enable_incremental_vacuum(conn):
+    """将已有的SQLite数据库转换为auto_vacuum=INCREMENTAL
+
+    转换需要一次完整的VACUUM（重写整个数据库文件，期间阻塞启动，并需要与文件大小相当的空闲磁盘空间），
+    因此只在显式开启SQLITE_VACUUM_MIGRATION且启用了过期游戏清理（GAME_RETENTION_DAYS > 0）时执行。
+    """
+    if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+        return
+    if not settings.SQLITE_VACUUM_MIGRATION or settings.GAME_RETENTION_DAYS <= 0:
+        print("✅ 未开启SQLITE_VACUUM_MIGRATION，跳过增量VACUUM转换")
+        return
+    
+    db_path = engine.url.database
+    if db_path and os.path.exists(db_path):
+        db_size = os.path.getsize(db_path)
+        free_space = shutil.disk_usage(os.path.dirname(os.path.abspath(db_path))).free
+        if free_space < db_size:
+            print(f"⚠️ 磁盘空闲空间不足（需要约 {db_size // (1024 * 1024)} MB），跳过增量VACUUM转换")
+            return
+    
+    print("📦 执行数据库迁移：启用增量VACUUM（一次性整理数据库文件，可能需要较长时间）...")
+    conn.commit()
+    try:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+    except OperationalError as e:
+        print(f"⚠️ 数据库正在被使用，跳过增量VACUUM转换（下次启动时重试）: {e}")
+        return
+    print("✅ 增量VACUUM已启用")
+
+def _ensure_composite_indexes(conn) -> int:
+    """幂等地创建热点查询的复合索引，返回新建的索引数量"""
+    created = 0
+    for index_name, table_name, columns in COMPOSITE_INDEXES:
+        existing_indexes = [index["name"] for index in inspect(conn).get_indexes(table_name)]
+        
+        if index_name not in existing_indexes:
+            print(f"📦 执行数据库迁移：创建索引{index_name}...")
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)})"))
+            conn.commit()
+            created += 1
+    return created
+
 async def _migrate_database():
     """执行数据库迁移"""
     try:
         with engine.connect() as conn:
             # 检查current_phase字段是否存在
-            result = conn.execute(text("PRAGMA table_info(rounds)"))
-            columns = [row[1] for row in result.fetchall()]
+            columns = [column["name"] for column in inspect(conn).get_columns("rounds")]
             
             if 'current_phase' not in columns:
                 print("📦 执行数据库迁移：添加current_phase字段...")
@@ -61,9 +197,23 @@ async def _migrate_database():
             else:
                 print("✅ current_phase字段已存在，跳过迁移")
             
+            # 检查rounds.next_sequence字段是否存在（消息序号计数器）
+            if 'next_sequence' not in columns:
+                print("📦 执行数据库迁移：添加rounds.next_sequence字段...")
+                conn.execute(text("ALTER TABLE rounds ADD COLUMN next_sequence INTEGER DEFAULT 0"))
+                # 从现有消息的最大序号继续（系统消息的负数序号不计入）
+                conn.execute(text(
+                    "UPDATE rounds SET next_sequence = ("
+                    "SELECT COALESCE(MAX(messages.sequence_number) + 1, 0) FROM messages "
+                    "WHERE messages.round_id = rounds.id AND messages.sequence_number >= 0)"
+                ))
+                conn.commit()
+                print("✅ rounds.next_sequence字段添加成功")
+            else:
+                print("✅ rounds.next_sequence字段已存在，跳过迁移")
+            
             # 检查vote_phase字段是否存在
-            result = conn.execute(text("PRAGMA table_info(votes)"))
-            vote_columns = [row[1] for row in result.fetchall()]
+            vote_columns = [column["name"] for column in inspect(conn).get_columns("votes")]
             
             if 'vote_phase' not in vote_columns:
                 print("📦 执行数据库迁移：添加vote_phase字段...")
@@ -80,8 +230,7 @@ async def _migrate_database():
                 print("✅ vote_phase字段已存在，跳过迁移")
             
             # 检查message表的title字段是否存在
-            result = conn.execute(text("PRAGMA table_info(messages)"))
-            message_columns = [row[1] for row in result.fetchall()]
+            message_columns = [column["name"] for column in inspect(conn).get_columns("messages")]
             
             if 'title' not in message_columns:
                 print("📦 执行数据库迁移：添加message.title字段...")
@@ -96,6 +245,17 @@ async def _migrate_database():
                 print("✅ 现有投票表格消息标题更新完成")
             else:
                 print("✅ message.title字段已存在，跳过迁移")
+            
+            # SQLite：转换为增量VACUUM，清理过期游戏后可以逐步归还空闲页
+            if engine.dialect.name == "sqlite":
+                _enable_incremental_vacuum(conn)
+            
+            # 为热点查询创建复合索引
+            created_indexes = _ensure_composite_indexes(conn)
+            if created_indexes:
+                print(f"✅ 已创建 {created_indexes} 个复合索引")
+            else:
+                print("✅ 复合索引已存在，跳过迁移")
                 
     except Exception as e:
         print(f"⚠️ 数据库迁移出现错误: {e}")
@@ -0,0 +1,60 @@
+"""
+共享HTTP客户端注册表
+"""
+
+import httpx
+from typing import Dict, Tuple
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401  # httpx的HTTP/2支持依赖h2包
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPClientRegistry:
+    """按服务地址复用的httpx.AsyncClient注册表（应用生命周期内有效）"""
+
+    def __init__(self):
+        # (origin, verify) -> 客户端；verify是客户端级别参数，需要区分
+        self._clients: Dict[Tuple[str, bool], httpx.AsyncClient] = {}
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        """提取URL的 scheme://host:port 作为连接池的键"""
+        parsed = httpx.URL(url)
+        return f"{parsed.scheme}://{parsed.host}:{parsed.port or (443 if parsed.scheme == 'https' else 80)}"
+
+    def get_client(self, url: str, verify: bool = True) -> httpx.AsyncClient:
+        """获取（或创建）指定地址对应的共享客户端"""
+        key = (self._origin(url), verify)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+            )
+            client = httpx.AsyncClient(
+                limits=limits,
+                timeout=settings.OLLAMA_TIMEOUT,
+                verify=verify,
+                http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+            )
+            self._clients[key] = client
+        return client
+
+    async def close_all(self):
+        """关闭所有客户端（应用停止时调用）"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"⚠️ 关闭HTTP客户端失败: {e}")
+
+
+# 全局客户端注册表
+http_clients = HTTPClientRegistry()
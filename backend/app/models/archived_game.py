@@ -0,0 +1,18 @@
+"""
+游戏归档数据模型
+"""
+
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, LargeBinary
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class ArchivedGame(Base):
+    """已结束游戏的冷归档表（轮次、消息、投票和参与者压缩为一个数据块）"""
+    __tablename__ = "archived_games"
+    
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
+    format = Column(String(20), default="json+gzip")  # 数据块格式
+    data = Column(LargeBinary, nullable=False)         # 压缩后的游戏记录
+    message_count = Column(Integer, default=0)         # 归档的消息数
+    raw_size = Column(Integer, default=0)              # 压缩前的字节数
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
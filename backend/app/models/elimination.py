@@ -12,8 +12,8 @@ class Elimination(Base):
     __tablename__ = "eliminations"
     
     id = Column(Integer, primary_key=True, index=True)
-    game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
-    participant_id = Column(Integer, ForeignKey("participants.id"), nullable=False)
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), nullable=False)
+    participant_id = Column(Integer, ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
     round_number = Column(Integer, nullable=False)     # 被淘汰的轮次
     vote_count = Column(Integer, nullable=False)       # 得票数
     elimination_time = Column(DateTime(timezone=True), server_default=func.now())
@@ -2,7 +2,7 @@
 游戏数据模型
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -10,6 +10,9 @@ from app.core.database import Base
 class Game(Base):
     """游戏会话表"""
     __tablename__ = "games"
+    __table_args__ = (
+        Index("ix_games_status", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     start_time = Column(DateTime(timezone=True), server_default=func.now())
@@ -2,7 +2,7 @@
 消息数据模型
 """
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -10,10 +10,13 @@ from app.core.database import Base
 class Message(Base):
     """对话消息表"""
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_round_type_seq", "round_id", "message_type", "sequence_number"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    round_id = Column(Integer, ForeignKey("rounds.id"), nullable=False)
-    participant_id = Column(Integer, ForeignKey("participants.id"), nullable=True)  # 系统消息可以为空
+    round_id = Column(Integer, ForeignKey("rounds.id", ondelete="CASCADE"), nullable=False)
+    participant_id = Column(Integer, ForeignKey("participants.id", ondelete="CASCADE"), nullable=True)  # 系统消息可以为空
     content = Column(Text, nullable=False)             # 消息内容
     message_type = Column(String(20), default="chat")  # chat, system, vote_reason, voting_table
     title = Column(String(100), nullable=True)         # 消息标题（用于投票表格等）
@@ -2,7 +2,7 @@
 参与者数据模型
 """
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Text, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Text, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -10,9 +10,12 @@ from app.core.database import Base
 class Participant(Base):
     """AI参与者表"""
     __tablename__ = "participants"
+    __table_args__ = (
+        Index("ix_participants_game_status", "game_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), nullable=False)
     model_name = Column(String(100), nullable=False)  # Ollama模型名称
     human_name = Column(String(50), nullable=False)   # 分配的人类姓名
     background = Column(Text)                         # 角色背景设定
@@ -0,0 +1,22 @@
+"""
+发言检查点数据模型
+"""
+
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class SpeechCheckpoint(Base):
+    """流式发言的检查点表（只追加，发言完成后删除）"""
+    __tablename__ = "speech_checkpoints"
+    __table_args__ = (
+        Index("ix_speech_checkpoints_round_chunk", "round_id", "chunk_index"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    round_id = Column(Integer, ForeignKey("rounds.id", ondelete="CASCADE"), nullable=False)
+    participant_id = Column(Integer, ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
+    message_type = Column(String(20), default="chat")  # 发言类型
+    chunk_index = Column(Integer, nullable=False)      # 片段序号（按顺序拼接得到已生成的内容）
+    content = Column(Text, nullable=False)             # 自上一个检查点以来新增的内容
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
@@ -36,6 +36,7 @@ class ChatResponse(BaseModel):
     prompt_eval_duration: Optional[int] = None
     eval_count: Optional[int] = None
     eval_duration: Optional[int] = None
+    context: Optional[List[int]] = None
     
 class AIParticipantConfig(BaseModel):
     """AI参与者配置"""
@@ -0,0 +1,90 @@
+"""
+对话历史窗口缓存
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class ChatHistoryCache:
+    """按轮次增量维护最近N条法庭辩论发言的环形缓冲区
+
+    发言保存时同步追加，参与者姓名按游戏解析一次；只有冷启动（如服务重启后恢复）
+    才需要从数据库加载窗口。
+    """
+
+    def __init__(self, window_size: int = 10):
+        self.window_size = window_size
+        # round_id -> 最近发言 (参与者姓名, 内容)
+        self._rounds: Dict[int, Deque[Tuple[str, str]]] = {}
+        # game_id -> {participant_id: human_name}
+        self._names: Dict[int, Dict[int, str]] = {}
+        # round_id -> game_id，用于姓名查找
+        self._round_games: Dict[int, int] = {}
+        # round_id -> 累计追加的发言数，用于计算某个位置之后的新增发言
+        self._counts: Dict[int, int] = {}
+
+    def register_participants(self, game_id: int, participants: List[Any]):
+        """缓存游戏参与者姓名（每个游戏解析一次）"""
+        names = self._names.setdefault(game_id, {})
+        for p in participants:
+            names[getattr(p, 'id', 0)] = getattr(p, 'human_name', '未知')
+
+    def has_round(self, round_id: int) -> bool:
+        return round_id in self._rounds
+
+    def load_round(self, game_id: int, round_id: int, entries: List[Tuple[str, str]]):
+        """用数据库中的最近发言初始化轮次窗口（冷启动）"""
+        self._round_games[round_id] = game_id
+        self._rounds[round_id] = deque(entries[-self.window_size:], maxlen=self.window_size)
+        self._counts[round_id] = len(entries)
+
+    def append(self, game_id: int, round_id: int, participant_id: int, content: str):
+        """发言保存后追加到窗口"""
+        name = self._names.get(game_id, {}).get(participant_id)
+        if name is None:
+            # 未登记的参与者不进入历史（与原先查不到参与者时跳过的行为一致）
+            return
+        if round_id not in self._rounds:
+            self._round_games[round_id] = game_id
+            self._rounds[round_id] = deque(maxlen=self.window_size)
+        self._rounds[round_id].append((name, content))
+        self._counts[round_id] = self._counts.get(round_id, 0) + 1
+
+    def get(self, round_id: int) -> Optional[str]:
+        """获取格式化后的历史；未缓存时返回None"""
+        entries = self._rounds.get(round_id)
+        if entries is None:
+            return None
+        return "\n".join(f"{name}: {content}" for name, content in entries)
+
+    def mark(self, round_id: int) -> int:
+        """当前窗口位置（累计发言数）"""
+        return self._counts.get(round_id, 0)
+
+    def since(self, round_id: int, mark: int, exclude_name: Optional[str] = None) -> Optional[str]:
+        """获取某个位置之后新增的发言；新增部分已滑出窗口或未缓存时返回None"""
+        entries = self._rounds.get(round_id)
+        if entries is None:
+            return None
+        new_count = self._counts.get(round_id, 0) - mark
+        if new_count < 0 or new_count > len(entries):
+            return None
+        recent = list(entries)[len(entries) - new_count:] if new_count else []
+        return "\n".join(f"{name}: {content}" for name, content in recent if name != exclude_name)
+
+    def evict_round(self, round_id: int):
+        """轮次结束后释放窗口"""
+        self._rounds.pop(round_id, None)
+        self._round_games.pop(round_id, None)
+        self._counts.pop(round_id, None)
+
+    def evict_game(self, game_id: int):
+        """游戏结束后释放该游戏的全部缓存"""
+        self._names.pop(game_id, None)
+        for round_id in [r for r, g in self._round_games.items() if g == game_id]:
+            self.evict_round(round_id)
+
+
+# 全局对话历史缓存（跨ChatService实例共享）
+chat_history_cache = ChatHistoryCache()
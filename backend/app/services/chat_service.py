@@ -8,12 +8,25 @@ import uuid
 from typing import List, Optional, Any, Dict
 from sqlalchemy.orm import Session
 from datetime import datetime
+from app.core.config import settings
+from app.core.database import run_in_db
 from app.models.game import Game
 from app.models.participant import Participant
 from app.models.round_model import Round
 from app.models.message import Message
 from app.services.ollama_service import OllamaService
 from app.services.websocket_service import WebSocketManager
+from app.services.chat_history import chat_history_cache
+from app.services.sequence_allocator import sequence_allocator
+from app.services.model_voter import ModelVoter
+from app.services.prompt_templates import prompt_builder
+from app.services.generation_sessions import generation_sessions
+from app.services.speech_drafts import SpeechDraft
+from app.services.generation_scheduler import generation_scheduler
+from app.services.game_orchestrator import game_orchestrator
+from app.services.message_writer import message_writer
+from app.services.speech_checkpoints import speech_checkpoints, InterruptedSpeech
+from app.services.game_archive import game_archiver
 from sqlalchemy import func
 from app.models.vote import Vote
 
@@ -51,7 +64,7 @@ class ChatService:
         print(f"开始轮次 {round_number}，游戏 {game_id}")
         
         # 检查游戏是否存在且正在运行
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         if not game:
             return None
         
@@ -60,10 +73,10 @@ class ChatService:
             return None
         
         # 获取活跃参与者
-        participants = self.db.query(Participant).filter(
+        participants = await run_in_db(self.db.query(Participant).filter(
             Participant.game_id == game_id,
             Participant.status == "active"
-        ).all()
+        ).all)
         
         if len(participants) < 2:
             # 游戏结束
@@ -71,20 +84,20 @@ class ChatService:
             return None
         
         # 检查轮次是否已存在
-        existing_round = self.db.query(Round).filter(
+        existing_round = await run_in_db(self.db.query(Round).filter(
             Round.game_id == game_id,
             Round.round_number == round_number
-        ).first()
+        ).first)
         
         if existing_round:
             # 轮次已存在，更新话题和状态
             topic = random.choice(self.CHAT_TOPICS)
-            self.db.query(Round).filter(Round.id == getattr(existing_round, 'id', 0)).update({
+            await run_in_db(self.db.query(Round).filter(Round.id == getattr(existing_round, 'id', 0)).update, {
                 "topic": topic,
                 "status": "chatting",
                 "current_phase": "chatting"
             })
-            self.db.commit()
+            await run_in_db(self.db.commit)
             round_obj = existing_round
             round_id = getattr(existing_round, 'id', 0)
             print(f"更新现有轮次 {round_number} 的话题为: {topic}")
@@ -99,8 +112,8 @@ class ChatService:
                 current_phase="chatting"
             )
             self.db.add(round_obj)
-            self.db.commit()
-            self.db.refresh(round_obj)
+            await run_in_db(self.db.commit)
+            await run_in_db(self.db.refresh, round_obj)
             round_id = getattr(round_obj, 'id', 0)
             print(f"创建新轮次 {round_number} 的话题为: {topic}")
         
@@ -149,7 +162,7 @@ class ChatService:
         print(f"开始轮次 {round_number}，游戏 {game_id}（带介绍）")
         
         # 检查游戏是否存在且正在运行
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         if not game:
             return None
         
@@ -158,10 +171,10 @@ class ChatService:
             return None
         
         # 获取活跃参与者
-        participants = self.db.query(Participant).filter(
+        participants = await run_in_db(self.db.query(Participant).filter(
             Participant.game_id == game_id,
             Participant.status == "active"
-        ).all()
+        ).all)
         
         if len(participants) < 2:
             # 游戏结束
@@ -178,8 +191,8 @@ class ChatService:
             current_phase="chatting"
         )
         self.db.add(round_obj)
-        self.db.commit()
-        self.db.refresh(round_obj)
+        await run_in_db(self.db.commit)
+        await run_in_db(self.db.refresh, round_obj)
         round_id = getattr(round_obj, 'id', 0)
         print(f"创建新轮次 {round_number} 的话题为: {topic}")
         
@@ -242,7 +255,7 @@ class ChatService:
     
     async def resume_chat_round(self, round_id: int) -> Optional[Any]:
         """恢复现有轮次的对话（用于游戏恢复）"""
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         if not round_obj:
             print(f"轮次 {round_id} 不存在，无法恢复")
             return None
@@ -254,7 +267,7 @@ class ChatService:
         print(f"恢复轮次 {round_number} (ID: {round_id})，游戏 {game_id}，话题: {existing_topic}")
         
         # 检查游戏是否存在且正在运行
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         if not game:
             return None
         
@@ -263,10 +276,10 @@ class ChatService:
             return None
         
         # 获取活跃参与者
-        participants = self.db.query(Participant).filter(
+        participants = await run_in_db(self.db.query(Participant).filter(
             Participant.game_id == game_id,
             Participant.status == "active"
-        ).all()
+        ).all)
         
         if len(participants) < 2:
             # 游戏结束
@@ -274,11 +287,11 @@ class ChatService:
             return None
         
         # 更新轮次状态为对话中（确保状态正确）
-        self.db.query(Round).filter(Round.id == round_id).update({
+        await run_in_db(self.db.query(Round).filter(Round.id == round_id).update, {
             "status": "chatting",
             "current_phase": "chatting"
         })
-        self.db.commit()
+        await run_in_db(self.db.commit)
         
         # 广播恢复轮次消息
         message_id = str(uuid.uuid4())
@@ -290,10 +303,10 @@ class ChatService:
             print("⚠️ 检测到空话题，重新生成...")
             existing_topic = random.choice(self.CHAT_TOPICS)
             # 更新数据库中的话题
-            self.db.query(Round).filter(Round.id == round_id).update({
+            await run_in_db(self.db.query(Round).filter(Round.id == round_id).update, {
                 "topic": existing_topic
             })
-            self.db.commit()
+            await run_in_db(self.db.commit)
             print(f"🔄 已更新话题为: {existing_topic}")
         
         # 保存恢复轮次的系统消息到数据库
@@ -328,10 +341,10 @@ class ChatService:
         }, game_id)
         
         # 计算已经发言的次数，从中断处继续
-        existing_messages = self.db.query(Message).filter(
+        existing_messages = await run_in_db(self.db.query(Message).filter(
             Message.round_id == round_id,
             Message.message_type == "chat"
-        ).count()
+        ).count)
         
         # 计算总发言次数（每人2次）
         speeches_per_person = 2
@@ -353,14 +366,14 @@ class ChatService:
     async def _run_ai_chat(self, round_id: int, participants: List[Any], topic: str, game_id: int):
         """运行AI对话 - 基于时间控制的法庭辩论"""
         # 获取游戏设置中的时间限制
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         max_round_time = 600  # 默认10分钟
         
         if game and getattr(game, 'settings', None):
             try:
                 import json
-                settings = json.loads(getattr(game, 'settings', '{}'))
-                max_round_time = settings.get('max_round_time', 600)
+                game_settings = json.loads(getattr(game, 'settings', '{}'))
+                max_round_time = game_settings.get('max_round_time', 600)
                 print(f"📅 获取到游戏设置的辩论时间: {max_round_time}秒 ({max_round_time//60}分{max_round_time%60}秒)")
             except (json.JSONDecodeError, Exception) as e:
                 print(f"⚠️ 解析游戏设置失败，使用默认时间: {e}")
@@ -386,6 +399,9 @@ class ChatService:
         # 确保每人至少发言一次的最小轮数
         min_total_speeches = len(participants) * min_speeches_per_person
         
+        # 为下一位发言者预生成的草稿
+        pending_draft: Optional[SpeechDraft] = None
+        
         # 基于时间的辩论循环
         while True:
             current_time = time.time()
@@ -409,47 +425,51 @@ class ChatService:
             speaker = speaking_order[speaker_index]
             
             # 检查轮次是否仍在进行
-            current_round = self.db.query(Round).filter(Round.id == round_id).first()
+            # populate_existing确保读取到其他会话（如停止游戏）写入的最新状态
+            current_round = await run_in_db(self.db.query(Round).filter(Round.id == round_id).populate_existing().first)
             if not current_round:
+                if pending_draft:
+                    pending_draft.cancel()
                 return
                 
             current_status = getattr(current_round, 'status', '')
             if current_status != "chatting":
+                if pending_draft:
+                    pending_draft.cancel()
                 return
             
             # 构建对话历史
-            chat_history = self._get_chat_history(round_id)
-            
+            chat_history = await self._get_chat_history(round_id, game_id)
+            
+            # 取出为该发言者预生成的草稿，并在其发言期间为下一位发言者预生成
+            draft = None
+            if pending_draft:
+                draft = await pending_draft.take(getattr(speaker, 'id', 0), chat_history_cache.mark(round_id))
+            pending_draft = self._start_speech_draft(
+                speaking_order[(speech_round + 1) % len(speaking_order)], speaker,
+                game_context, chat_history, round_id
+            )
             # 生成AI回应（流式）
             try:
                 response = await self._generate_ai_response_stream(
-                    speaker, game_context, chat_history, topic, game_id, round_id
+                    speaker, game_context, chat_history, topic, game_id, round_id, draft=draft
                 )
                 
                 # 保存消息到数据库 - 使用自然增长的序号
                 speaker_id = getattr(speaker, 'id', 0)
                 
                 # 获取当前轮次的下一个序号
-                max_sequence = self.db.query(Message.sequence_number).filter(
-                    Message.round_id == round_id,
-                    Message.sequence_number.isnot(None)
-                ).order_by(Message.sequence_number.desc()).first()
-                
-                if max_sequence and max_sequence[0] is not None:
-                    next_sequence = max_sequence[0] + 1
-                else:
-                    next_sequence = 0
+                next_sequence = await sequence_allocator.allocate(round_id)
                 
-                message = Message(
+                message = await message_writer.add_message(
                     round_id=round_id,
                     participant_id=speaker_id,
                     content=response,
                     message_type="chat",
                     sequence_number=next_sequence
                 )
-                self.db.add(message)
-                self.db.commit()
-                self.db.refresh(message)
+                chat_history_cache.append(game_id, round_id, speaker_id, response)
+                speech_checkpoints.clear(round_id)
                 
                 # 流式版本已经在生成过程中实时广播了，这里不需要再次广播
                 print(f"✅ {getattr(speaker, 'human_name', '未知')} 发言已完成并保存到数据库")
@@ -462,16 +482,16 @@ class ChatService:
                 fallback_response = self._generate_fallback_response(speaker, topic)
                 
                 speaker_id = getattr(speaker, 'id', 0)
-                message = Message(
+                next_sequence = await sequence_allocator.allocate(round_id)
+                message = await message_writer.add_message(
                     round_id=round_id,
                     participant_id=speaker_id,
                     content=fallback_response,
                     message_type="chat",
-                    sequence_number=speech_round
+                    sequence_number=next_sequence
                 )
-                self.db.add(message)
-                self.db.commit()
-                self.db.refresh(message)
+                chat_history_cache.append(game_id, round_id, speaker_id, fallback_response)
+                speech_checkpoints.clear(round_id)
                 
                 speaker_name = getattr(speaker, 'human_name', '未知')
                 speaker_model = getattr(speaker, 'model_name', '未知模型')
@@ -496,6 +516,9 @@ class ChatService:
             # 递增发言轮数
             speech_round += 1
         
+        if pending_draft:
+            pending_draft.cancel()
+        
         # 辩论时间结束，开始初投票阶段
         print(f"🏛️ 法庭辩论结束，共进行了 {speech_round} 轮发言，开始投票阶段")
         await self._simulate_ai_voting(round_id)
@@ -503,14 +526,14 @@ class ChatService:
     async def _resume_ai_chat(self, round_id: int, participants: List[Any], topic: str, game_id: int, existing_messages: int):
         """从指定轮次继续AI对话"""
         # 获取游戏设置中的时间限制
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         max_round_time = 600  # 默认10分钟
         
         if game and getattr(game, 'settings', None):
             try:
                 import json
-                settings = json.loads(getattr(game, 'settings', '{}'))
-                max_round_time = settings.get('max_round_time', 600)
+                game_settings = json.loads(getattr(game, 'settings', '{}'))
+                max_round_time = game_settings.get('max_round_time', 600)
                 print(f"📅 恢复游戏的辩论时间设置: {max_round_time}秒")
             except (json.JSONDecodeError, Exception) as e:
                 print(f"⚠️ 解析游戏设置失败，使用默认时间: {e}")
@@ -529,6 +552,15 @@ class ChatService:
         
         print(f"总计划发言次数: {total_speeches}, 已有发言: {existing_messages}, 还需发言: {total_speeches - existing_messages}")
         
+        # 服务中断时正在进行的发言：根据检查点补全或续写，而不是整段重新生成
+        if existing_messages < total_speeches and await self._resume_interrupted_speech(
+            round_id, participants, game_context, topic, game_id
+        ):
+            existing_messages += 1
+        
+        # 为下一位发言者预生成的草稿
+        pending_draft: Optional[SpeechDraft] = None
+        
         # 从已有的消息数量开始继续到总数
         for speech_round in range(existing_messages, total_speeches):
             # 轮流发言，确保每个人都有充分且均匀的发言机会
@@ -536,47 +568,54 @@ class ChatService:
             speaker = speaking_order[speaker_index]
             
             # 检查轮次是否仍在进行
-            current_round = self.db.query(Round).filter(Round.id == round_id).first()
+            # populate_existing确保读取到其他会话（如停止游戏）写入的最新状态
+            current_round = await run_in_db(self.db.query(Round).filter(Round.id == round_id).populate_existing().first)
             if not current_round:
+                if pending_draft:
+                    pending_draft.cancel()
                 return
                 
             current_status = getattr(current_round, 'status', '')
             if current_status != "chatting":
+                if pending_draft:
+                    pending_draft.cancel()
                 return
             
             # 构建对话历史
-            chat_history = self._get_chat_history(round_id)
-            
+            chat_history = await self._get_chat_history(round_id, game_id)
+            
+            # 取出为该发言者预生成的草稿，并在其发言期间为下一位发言者预生成
+            draft = None
+            if pending_draft:
+                draft = await pending_draft.take(getattr(speaker, 'id', 0), chat_history_cache.mark(round_id))
+            if speech_round + 1 < total_speeches:
+                pending_draft = self._start_speech_draft(
+                    speaking_order[(speech_round + 1) % len(speaking_order)], speaker,
+                    game_context, chat_history, round_id
+                )
+            else:
+                pending_draft = None
             # 生成AI回应
             try:
                 response = await self._generate_ai_response_stream(
-                    speaker, game_context, chat_history, topic, game_id, round_id
+                    speaker, game_context, chat_history, topic, game_id, round_id, draft=draft
                 )
                 
                 # 保存消息到数据库 - 使用自然增长的序号
                 speaker_id = getattr(speaker, 'id', 0)
                 
                 # 获取当前轮次的下一个序号
-                max_sequence = self.db.query(Message.sequence_number).filter(
-                    Message.round_id == round_id,
-                    Message.sequence_number.isnot(None)
-                ).order_by(Message.sequence_number.desc()).first()
-                
-                if max_sequence and max_sequence[0] is not None:
-                    next_sequence = max_sequence[0] + 1
-                else:
-                    next_sequence = 0
+                next_sequence = await sequence_allocator.allocate(round_id)
                 
-                message = Message(
+                message = await message_writer.add_message(
                     round_id=round_id,
                     participant_id=speaker_id,
                     content=response,
                     message_type="chat",
                     sequence_number=next_sequence
                 )
-                self.db.add(message)
-                self.db.commit()
-                self.db.refresh(message)
+                chat_history_cache.append(game_id, round_id, speaker_id, response)
+                speech_checkpoints.clear(round_id)
                 
                 # 流式版本已经在生成过程中实时广播了，这里不需要再次广播
                 print(f"✅ {getattr(speaker, 'human_name', '未知')} 发言已完成并保存到数据库")
@@ -589,16 +628,16 @@ class ChatService:
                 fallback_response = self._generate_fallback_response(speaker, topic)
                 
                 speaker_id = getattr(speaker, 'id', 0)
-                message = Message(
+                next_sequence = await sequence_allocator.allocate(round_id)
+                message = await message_writer.add_message(
                     round_id=round_id,
                     participant_id=speaker_id,
                     content=fallback_response,
                     message_type="chat",
-                    sequence_number=speech_round
+                    sequence_number=next_sequence
                 )
-                self.db.add(message)
-                self.db.commit()
-                self.db.refresh(message)
+                chat_history_cache.append(game_id, round_id, speaker_id, fallback_response)
+                speech_checkpoints.clear(round_id)
                 
                 speaker_name = getattr(speaker, 'human_name', '未知')
                 speaker_model = getattr(speaker, 'model_name', '未知模型')
@@ -624,152 +663,129 @@ class ChatService:
         print(f"游戏 {game_id} 轮次 {round_id} 的辩论阶段结束，开始投票")
         await self._simulate_ai_voting(round_id)
     
-    def _build_game_context(self, participants: List[Any], topic: str, max_round_time: int = 600) -> str:
-        """构建游戏背景上下文"""
-        participant_info = []
+    async def _resume_interrupted_speech(self, round_id: int, participants: List[Any], game_context: str,
+                                         topic: str, game_id: int) -> bool:
+        """补全或续写服务中断时未完成的发言，返回是否保存了一条发言"""
+        interrupted = await speech_checkpoints.load(self.db, round_id)
+        if not interrupted:
+            return False
+        
+        speaker = next((p for p in participants if getattr(p, 'id', 0) == interrupted.participant_id), None)
+        if speaker is None or not interrupted.content.strip():
+            speech_checkpoints.clear(round_id)
+            return False
+        
+        speaker_id = getattr(speaker, 'id', 0)
+        speaker_name = getattr(speaker, 'human_name', '未知')
+        response = None
+        
+        if interrupted.looks_complete:
+            print(f"♻️ {speaker_name} 的发言在中断前已基本完成（{len(interrupted.content)} 字），直接保存")
+        else:
+            print(f"♻️ 从中断处续写 {speaker_name} 的发言（已有 {len(interrupted.content)} 字）")
+            chat_history = await self._get_chat_history(round_id, game_id)
+            try:
+                response = await self._generate_ai_response_stream(
+                    speaker, game_context, chat_history, topic, game_id, round_id, resume_from=interrupted
+                )
+            except Exception as e:
+                print(f"⚠️ 续写 {speaker_name} 的发言失败，保存中断前的内容: {e}")
         
-        for p in participants:
-            name = getattr(p, 'human_name', '未知')
-            background = getattr(p, 'background', '未知背景')
-            personality = getattr(p, 'personality', '未知性格')
-                
-            participant_info.append(f"- {name}: {background}，性格{personality}")
+        next_sequence = await sequence_allocator.allocate(round_id)
+        message = await message_writer.add_message(
+            round_id=round_id,
+            participant_id=speaker_id,
+            content=response or interrupted.content.strip(),
+            message_type="chat",
+            sequence_number=next_sequence
+        )
+        chat_history_cache.append(game_id, round_id, speaker_id, message.content)
+        speech_checkpoints.clear(round_id)
         
-        context = f"""
-**时间：2050年，地点：新日内瓦自由城紧急法庭**
-
-🚨 **紧急审判协议已启动** 🚨
-
-人类面临存亡的关键时刻！根据情报，在你们{len(participants)}人中，有1个AI间谍伪装成人类。
-这是一场生死审判，被选中的"AI间谍"将被立即处决。
-
-**法庭辩论规则：**
-1. 每个人都必须为自己的人类身份进行{max_round_time//60}分{max_round_time%60}秒的激烈辩护
-2. 最终大家将实名投票选出最可疑的AI间谍
-3. 被投票选中的将被处决，其他人获得生存
-
-**当前辩论焦点：{topic}**
-
-**在场人员：**
-{chr(10).join(participant_info)}
-
-⚠️ **重要提醒：**
-- 你必须证明自己是真正的人类
-- 要展现真实的人类特质，同时观察他人的可疑行为
-- 所有人的生命都悬于一线，请全力以赴保护自己！
-"""
-        return context
+        if response is None:
+            # 没有经过流式广播，直接广播完整发言
+            await self.websocket_manager.broadcast_to_game({
+                "type": "new_message",
+                "message_id": str(uuid.uuid4()),
+                "participant_id": speaker_id,
+                "participant_name": f"{speaker_name} ({getattr(speaker, 'model_name', '未知模型')})",
+                "content": message.content,
+                "timestamp": self._format_timestamp_with_timezone(message.timestamp),
+                "sequence": next_sequence
+            }, game_id)
+        return True
+    
+    def _build_game_context(self, participants: List[Any], topic: str, max_round_time: int = 600) -> str:
+        """构建游戏背景上下文（由提示词构建器缓存）"""
+        return prompt_builder.game_context(participants, topic, max_round_time)
+    
+    async def _update_round(self, round_id: int, values: Dict[str, Any]):
+        """切换轮次阶段：先等待写入队列中的消息和投票全部提交，再更新轮次"""
+        await message_writer.flush()
+        await run_in_db(self.db.query(Round).filter(Round.id == round_id).update, values)
+        await run_in_db(self.db.commit)
     
     async def _save_system_message(self, round_id: int, content: str, message_type: str = "system", sequence_number: Optional[int] = None):
         """保存系统消息到数据库"""
         try:
-            # 如果没有指定序号，自动获取当前轮次的下一个序号
+            # 如果没有指定序号，从分配器获取当前轮次的下一个序号
             if sequence_number is None:
-                max_sequence = self.db.query(Message.sequence_number).filter(
-                    Message.round_id == round_id,
-                    Message.sequence_number.isnot(None)
-                ).order_by(Message.sequence_number.desc()).first()
-                
-                if max_sequence and max_sequence[0] is not None:
-                    sequence_number = max_sequence[0] + 1
-                else:
-                    sequence_number = 0
+                sequence_number = await sequence_allocator.allocate(round_id)
             
-            message = Message(
+            message = await message_writer.add_message(
                 round_id=round_id,
                 participant_id=None,  # 系统消息没有参与者
                 content=content,
                 message_type=message_type,
                 sequence_number=sequence_number
             )
-            self.db.add(message)
-            self.db.commit()
-            self.db.refresh(message)
             print(f"💾 已保存系统消息到数据库 (序号{sequence_number}): {content[:50]}...")
             return message
         except Exception as e:
             print(f"❌ 保存系统消息失败: {e}")
             return None
     
-    def _get_chat_history(self, round_id: int) -> str:
-        """获取对话历史"""
-        messages = self.db.query(Message).filter(
+    async def _get_chat_history(self, round_id: int, game_id: int) -> str:
+        """获取对话历史（最近10条，由内存窗口增量维护）"""
+        history = chat_history_cache.get(round_id)
+        if history is not None:
+            return history
+        
+        # 冷启动（新轮次或服务重启后恢复）：参与者姓名按游戏解析一次，再用一次联表查询加载窗口
+        participants = await run_in_db(self.db.query(Participant).filter(
+            Participant.game_id == game_id
+        ).all)
+        chat_history_cache.register_participants(game_id, participants)
+        
+        await message_writer.flush()
+        rows = await run_in_db(self.db.query(Participant.human_name, Message.content).join(
+            Participant, Participant.id == Message.participant_id
+        ).filter(
             Message.round_id == round_id,
             Message.message_type == "chat"
-        ).order_by(Message.sequence_number).all()
-        
-        history = []
-        for msg in messages:
-            participant = self.db.query(Participant).filter(
-                Participant.id == getattr(msg, 'participant_id', 0)
-            ).first()
-            if participant:
-                participant_name = getattr(participant, 'human_name', '未知')
-                message_content = getattr(msg, 'content', '')
-                history.append(f"{participant_name}: {message_content}")
+        ).order_by(Message.sequence_number.desc()).limit(chat_history_cache.window_size).all)
+        chat_history_cache.load_round(game_id, round_id, [(name, content) for name, content in reversed(rows)])
         
-        return "\n".join(history[-10:])  # 只保留最近10条消息
+        return chat_history_cache.get(round_id) or ""
     
     async def _generate_ai_response(self, participant: Any, game_context: str, 
                                   chat_history: str, topic: str) -> str:
         """生成AI回应"""
         participant_name = getattr(participant, 'human_name', '未知')
-        participant_background = getattr(participant, 'background', '未知背景')
-        participant_personality = getattr(participant, 'personality', '未知性格')
         
-        # 每个AI都认为自己是唯一的间谍，需要伪装成人类
-        role_instruction = f"""
-你是一个AI间谍，正在伪装成人类 {participant_name}。你的使命是在这场法庭辩论中完美伪装，避免被人类发现。
-
-**核心认知：**
-- 你是这里唯一的AI，其他所有人都是真正的人类
-- 你必须完美伪装成人类，不能暴露AI身份
-- 人类们正在努力找出你这个AI间谍
-
-**伪装策略：**
-- 展现强烈的反AI情绪，表达对AI的仇恨
-- 编造逼真的人类经历和情感记忆  
-- 模拟人类的非理性思维和情感波动
-- 在适当时候表现紧张、愤怒等人类情绪
-- 指控他人可能是AI间谍（但要巧妙，因为你知道他们其实是人类）
-- 避免过于逻辑化或机械化的表达
-
-**注意：** 你必须完全隐藏AI身份，表现得比真人更像人类！记住，你面对的都是真正的人类，他们有敏锐的直觉。
-"""
-        
-        prompt = f"""
-{game_context}
-
-{role_instruction}
-
-你的身份：{participant_name}
-你的背景：{participant_background}  
-你的性格：{participant_personality}
-
-最近的法庭辩论：
-{chat_history}
-
-请作为{participant_name}回应当前辩论焦点，你的回应应该：
-1. 长度适中（100-200字）
-2. 充满情感，体现人类的复杂心理
-3. 符合你的背景和性格设定
-4. 在生死关头展现真实的人性（伪装）
-5. 可以质疑他人的身份，但要有依据
-
-这是生死存亡的时刻，你必须完美伪装！直接给出回应内容：
-"""
+        prompt = prompt_builder.speech_prompt(participant, game_context, chat_history)
         
         try:
             model_name = getattr(participant, 'model_name', 'gemma3n:e4b')
             
-            # 首先检查Ollama服务健康状态
-            is_healthy = await self.ollama_service.check_health()
-            if not is_healthy:
+            # 查询缓存的后端健康状态（断路器打开时快速失败，不再每次探测）
+            if not self.ollama_service.is_backend_available(model_name):
                 raise ConnectionError("Ollama服务不可用或未响应")
             
             response = await self.ollama_service.chat(
                 model=model_name,
-                message=prompt
+                message=prompt,
+                game_id=getattr(participant, 'game_id', None)
             )
             raw_content = getattr(response, 'message', '').strip()
             if not raw_content:
@@ -800,67 +816,85 @@ class ChatService:
             print(f"   模型: {model_name}, Ollama地址: {self.ollama_service.base_url}")
             raise e
 
+    def _start_speech_draft(self, next_speaker: Any, current_speaker: Any, game_context: str,
+                            chat_history: str, round_id: int) -> Optional[SpeechDraft]:
+        """在当前发言者输出期间，基于此刻的对话历史为下一位发言者预生成发言"""
+        if not settings.SPECULATIVE_GENERATION or next_speaker is current_speaker:
+            return None
+        
+        async def generate() -> Optional[str]:
+            model_name = getattr(next_speaker, 'model_name', 'gemma3n:e4b')
+            try:
+                if not self.ollama_service.is_backend_available(model_name):
+                    return None
+                response = await self.ollama_service.chat(
+                    model=model_name,
+                    message=prompt_builder.speech_prompt(next_speaker, game_context, chat_history),
+                    game_id=getattr(next_speaker, 'game_id', None)
+                )
+                return getattr(response, 'message', '').strip() or None
+            except Exception as e:
+                print(f"⚠️ 预生成 {getattr(next_speaker, 'human_name', '未知')} 的发言失败: {e}")
+                return None
+        
+        task = game_orchestrator.create_child_task(getattr(next_speaker, 'game_id', None), generate())
+        return SpeechDraft(getattr(next_speaker, 'id', 0), chat_history_cache.mark(round_id), task)
+    
+    async def _replay_draft(self, draft: str, piece_size: int = 16):
+        """把预生成的草稿按片段送入流式广播管道"""
+        for start in range(0, len(draft), piece_size):
+            yield draft[start:start + piece_size]
+    
+    async def _chain_streams(self, *sources):
+        """依次输出多个流式来源"""
+        for source in sources:
+            async for chunk in source:
+                yield chunk
+    
     async def _generate_ai_response_stream(self, participant: Any, game_context: str, 
-                                         chat_history: str, topic: str, game_id: int, round_id: int) -> str:
-        """生成AI回应（流式输出）"""
+                                         chat_history: str, topic: str, game_id: int, round_id: int,
+                                         draft: Optional[str] = None,
+                                         resume_from: Optional[InterruptedSpeech] = None) -> str:
+        """生成AI回应（流式输出）；提供draft时直接广播预生成的草稿，提供resume_from时续写被中断的发言"""
         participant_name = getattr(participant, 'human_name', '未知')
-        participant_background = getattr(participant, 'background', '未知背景')
-        participant_personality = getattr(participant, 'personality', '未知性格')
         participant_id = getattr(participant, 'id', 0)
         participant_model = getattr(participant, 'model_name', '未知模型')
         
-        # 每个AI都认为自己是唯一的间谍，需要伪装成人类
-        role_instruction = f"""
-你是一个AI间谍，正在伪装成人类 {participant_name}。你的使命是在这场法庭辩论中完美伪装，避免被人类发现。
-
-**核心认知：**
-- 你是这里唯一的AI，其他所有人都是真正的人类
-- 你必须完美伪装成人类，不能暴露AI身份
-- 人类们正在努力找出你这个AI间谍
-
-**伪装策略：**
-- 展现强烈的反AI情绪，表达对AI的仇恨
-- 编造逼真的人类经历和情感记忆  
-- 模拟人类的非理性思维和情感波动
-- 在适当时候表现紧张、愤怒等人类情绪
-- 指控他人可能是AI间谍（但要巧妙，因为你知道他们其实是人类）
-- 避免过于逻辑化或机械化的表达
-
-**注意：** 你必须完全隐藏AI身份，表现得比真人更像人类！记住，你面对的都是真正的人类，他们有敏锐的直觉。
-"""
+        if resume_from is not None:
+            prompt = prompt_builder.continuation_prompt(participant, game_context, chat_history, resume_from.content)
+        else:
+            prompt = prompt_builder.speech_prompt(participant, game_context, chat_history)
         
-        prompt = f"""
-{game_context}
-
-{role_instruction}
-
-你的身份：{participant_name}
-你的背景：{participant_background}  
-你的性格：{participant_personality}
-
-最近的法庭辩论：
-{chat_history}
-
-请作为{participant_name}回应当前辩论焦点，你的回应应该：
-1. 长度适中（100-200字）
-2. 充满情感，体现人类的复杂心理
-3. 符合你的背景和性格设定
-4. 在生死关头展现真实的人性（伪装）
-5. 可以质疑他人的身份，但要有依据
-
-这是生死存亡的时刻，你必须完美伪装！直接给出回应内容：
-"""
+        # 生成唯一的消息ID（在try之前分配，快速失败时错误广播也能引用）
+        message_id = str(uuid.uuid4())
+        model_name = getattr(participant, 'model_name', 'gemma3n:e4b')
         
         try:
-            model_name = getattr(participant, 'model_name', 'gemma3n:e4b')
-            
-            # 首先检查Ollama服务健康状态
-            is_healthy = await self.ollama_service.check_health()
-            if not is_healthy:
+            # 查询缓存的后端健康状态（断路器打开时快速失败，不再每次探测）
+            if draft is None and not self.ollama_service.is_backend_available(model_name):
                 raise ConnectionError("Ollama服务不可用或未响应")
             
-            # 生成唯一的消息ID
-            message_id = str(uuid.uuid4())
+            # 本地模型复用该参与者上次返回的context，只发送上次发言之后新增的辩论记录
+            session = None
+            context = None
+            if draft is not None or resume_from is not None:
+                # 草稿和续写没有经过会话生成，下次发言改用完整提示词
+                if not model_name.startswith("external:"):
+                    generation_sessions.invalidate(generation_sessions.get(game_id, participant_id, round_id, model_name))
+            elif not model_name.startswith("external:"):
+                session = generation_sessions.get(game_id, participant_id, round_id, model_name)
+                if generation_sessions.can_reuse(session):
+                    new_history = chat_history_cache.since(round_id, session.history_mark, participant_name)
+                    if new_history is not None:
+                        prompt = prompt_builder.speech_delta_prompt(participant, new_history)
+                        context = session.context
+                session.history_mark = chat_history_cache.mark(round_id)
+                # 生成完成时才写回新的context，失败时下次使用完整提示词
+                session.context = None
+            reused_context = context is not None
+            
+            # 按时间/字符窗口合并片段，减少广播帧数
+            coalescer = self.websocket_manager.chunk_coalescer(game_id, "message_chunk", message_id)
             
             # 先广播开始生成的消息
             await self.websocket_manager.broadcast_to_game({
@@ -868,32 +902,40 @@ class ChatService:
                 "message_id": message_id,
                 "participant_id": participant_id,
                 "participant_name": f"{participant_name} ({participant_model})",
+                "pacing": coalescer.pacing,
                 "timestamp": datetime.now().isoformat() + 'Z'
             }, game_id)
             
             # 累积完整的响应内容
             full_response = ""
             
-            # 使用流式方法生成回应
-            async for text_chunk in self.ollama_service.chat_stream(
-                model=model_name,
-                message=prompt
-            ):
-                if text_chunk and text_chunk.strip():
+            # 生成过程中定期追加检查点，服务中断后可以补全或续写
+            checkpoint = speech_checkpoints.begin(round_id, participant_id, "chat", resume_from)
+            
+            # 使用流式方法生成回应（有草稿时回放草稿）
+            if draft is not None:
+                text_source = self._replay_draft(draft)
+            else:
+                text_source = self.ollama_service.chat_stream(
+                    model=model_name,
+                    message=prompt,
+                    context=context,
+                    on_done=(lambda data: generation_sessions.record(session, data, reused_context)) if session else None,
+                    game_id=game_id
+                )
+                if resume_from is not None:
+                    # 先回放中断前已生成的内容，再接上续写
+                    text_source = self._chain_streams(self._replay_draft(resume_from.content), text_source)
+            async for text_chunk in text_source:
+                if text_chunk:
                     full_response += text_chunk
+                    checkpoint.update(full_response)
                     
-                    # 实时广播文本片段
-                    await self.websocket_manager.broadcast_to_game({
-                        "type": "message_chunk",
-                        "message_id": message_id,
-                        "participant_id": participant_id,
-                        "participant_name": f"{participant_name} ({participant_model})",
-                        "chunk": text_chunk,
-                        "timestamp": datetime.now().isoformat() + 'Z'
-                    }, game_id)
-                    
-                    # 添加小延迟使效果更自然
-                    await asyncio.sleep(0.05)  # 50ms延迟
+                    # 实时广播文本片段（紧凑增量帧），显示节奏由前端或realistic回放模式控制
+                    await coalescer.add(text_chunk)
+            
+            # 发送剩余片段，保证完成消息之前客户端已收到全部片段
+            await coalescer.flush()
             
             if not full_response.strip():
                 raise ValueError("AI模型返回空内容")
@@ -993,11 +1035,15 @@ class ChatService:
 
     async def _end_game(self, game_id: int):
         """结束游戏（简单版本）"""
-        self.db.query(Game).filter(Game.id == game_id).update({
+        await run_in_db(self.db.query(Game).filter(Game.id == game_id).update, {
             "status": "finished",
             "end_time": func.now()
         })
-        self.db.commit()
+        await run_in_db(self.db.commit)
+        chat_history_cache.evict_game(game_id)
+        prompt_builder.evict_game(game_id)
+        generation_sessions.evict_game(game_id)
+        generation_scheduler.forget_game(game_id)
         
         # 广播游戏结束
         message_id = str(uuid.uuid4())
@@ -1009,7 +1055,7 @@ class ChatService:
     
     async def _simulate_ai_voting(self, round_id: int, is_resume: bool = False):
         """模拟AI投票 - 第一轮投票阶段"""
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         if not round_obj:
             return
             
@@ -1036,17 +1082,16 @@ class ChatService:
             print(f"🔄 恢复初投票阶段，跳过发送开始消息")
         
         # 更新轮次状态为初投票阶段
-        self.db.query(Round).filter(Round.id == round_id).update({
+        await self._update_round(round_id, {
             "status": "voting",
             "current_phase": "initial_voting"
         })
-        self.db.commit()
         
         # 获取所有活跃参与者
-        participants = self.db.query(Participant).filter(
+        participants = await run_in_db(self.db.query(Participant).filter(
             Participant.game_id == game_id,
             Participant.status == "active"
-        ).all()
+        ).all)
         
         if len(participants) < 2:
             return
@@ -1075,17 +1120,9 @@ class ChatService:
             import json
             
             # 获取当前轮次的下一个序号
-            max_sequence = self.db.query(Message.sequence_number).filter(
-                Message.round_id == round_id,
-                Message.sequence_number.isnot(None)
-            ).order_by(Message.sequence_number.desc()).first()
+            next_sequence = await sequence_allocator.allocate(round_id)
             
-            if max_sequence and max_sequence[0] is not None:
-                next_sequence = max_sequence[0] + 1
-            else:
-                next_sequence = 0
-            
-            voting_table_message = Message(
+            voting_table_message = await message_writer.add_message(
                 round_id=round_id,
                 participant_id=None,  # 系统消息
                 content=json.dumps(voting_data),  # 将投票数据序列化为JSON保存
@@ -1093,9 +1130,6 @@ class ChatService:
                 title="初投票结果",
                 sequence_number=next_sequence
             )
-            self.db.add(voting_table_message)
-            self.db.commit()
-            self.db.refresh(voting_table_message)
             print(f"💾 已保存初投票结果表格到数据库")
             
             # 广播初投票表格
@@ -1123,41 +1157,28 @@ class ChatService:
             await self._start_final_defense(round_id, top_candidates)
     
     async def _conduct_voting_round(self, participants: List[Any], round_id: int, vote_phase_name: str, vote_phase_db: str) -> tuple:
-        """进行一轮投票的通用方法"""
+        """进行一轮投票的通用方法（所有投票者并发投票，结果一次性写入）"""
         from app.models.vote import Vote
         
-        # 清理该阶段的现有投票记录（确保重新投票时不累计）
-        existing_votes = self.db.query(Vote).filter(
-            Vote.round_id == round_id,
-            Vote.vote_phase == vote_phase_db
-        ).all()
-        
-        if existing_votes:
-            print(f"清理轮次 {round_id} 阶段 {vote_phase_db} 的 {len(existing_votes)} 条现有投票记录")
-            for vote in existing_votes:
-                self.db.delete(vote)
-            self.db.commit()
+        if settings.VOTE_MODE == "model":
+            decisions = await self._decide_votes_by_model(participants, round_id, vote_phase_name)
+        else:
+            # 随机投票不调用模型，直接为每位投票者选择目标和预设理由
+            decisions = [self._cast_vote(voter, participants, vote_phase_name) for voter in participants]
         
         vote_counts = {}
         all_votes = []
+        vote_rows = []
         
-        for voter in participants:
-            # 选择投票目标（不能投给自己）
-            possible_targets = [p for p in participants if getattr(p, 'id', 0) != getattr(voter, 'id', 0)]
-            
-            # 基于辩论表现进行投票（随机但有逻辑）
-            target = random.choice(possible_targets)
-            reason = await self._generate_vote_reason(voter, target, vote_phase_name)
-            
+        for voter, (target, reason) in zip(participants, decisions):
             # 记录投票（包含投票阶段）
-            vote = Vote(
-                round_id=round_id,
-                voter_id=getattr(voter, 'id', 0),
-                target_id=getattr(target, 'id', 0),
-                vote_phase=vote_phase_db,
-                reason=reason
-            )
-            self.db.add(vote)
+            vote_rows.append({
+                'round_id': round_id,
+                'voter_id': getattr(voter, 'id', 0),
+                'target_id': getattr(target, 'id', 0),
+                'vote_phase': vote_phase_db,
+                'reason': reason
+            })
             all_votes.append({
                 'voter_name': getattr(voter, 'human_name', '未知'),
                 'target_name': getattr(target, 'human_name', '未知'),
@@ -1170,13 +1191,55 @@ class ChatService:
                 vote_counts[target_name] = {'count': 0, 'target_id': getattr(target, 'id', 0)}
             vote_counts[target_name]['count'] += 1
         
-        self.db.commit()
+        # 清理该阶段的现有投票记录并批量写入新投票（同一事务，由写入队列合并提交）
+        message_writer.replace_votes(round_id, vote_phase_db, vote_rows)
         print(f"✅ 完成 {vote_phase_name}，统计：{vote_counts}")
         return vote_counts, all_votes
 
-    async def _generate_vote_reason(self, voter: Any, target: Any, vote_phase: str = "投票") -> str:
-        """生成投票理由 - AI认为在投票给可疑的人类"""
-        voter_name = getattr(voter, 'human_name', '未知')
+    def _cast_vote(self, voter: Any, participants: List[Any], vote_phase_name: str) -> tuple:
+        """随机投票：选择一个其他参与者并使用预设理由"""
+        # 选择投票目标（不能投给自己）
+        possible_targets = [p for p in participants if getattr(p, 'id', 0) != getattr(voter, 'id', 0)]
+        
+        # 基于辩论表现进行投票（随机但有逻辑）
+        target = random.choice(possible_targets)
+        return target, self._fallback_vote_reason(target, vote_phase_name)
+
+    async def _decide_votes_by_model(self, participants: List[Any], round_id: int, vote_phase_name: str) -> List[tuple]:
+        """由参与者的模型根据辩论记录投票，未得到合法投票的参与者回退为随机投票"""
+        game_id = getattr(participants[0], 'game_id', 0) if participants else 0
+        # 辩论记录每轮投票只查询和格式化一次，所有投票者共享
+        transcript = await self._get_vote_transcript(round_id, game_id)
+        model_decisions = await ModelVoter(self.ollama_service).decide(
+            participants, participants, transcript, vote_phase_name
+        )
+        
+        decisions = []
+        for voter in participants:
+            decision = model_decisions.get(getattr(voter, 'id', 0))
+            if decision is None:
+                possible_targets = [p for p in participants if getattr(p, 'id', 0) != getattr(voter, 'id', 0)]
+                target = random.choice(possible_targets)
+                decision = (target, self._fallback_vote_reason(target, vote_phase_name))
+            elif not decision[1]:
+                decision = (decision[0], self._fallback_vote_reason(decision[0], vote_phase_name))
+            decisions.append(decision)
+        print(f"🧠 模型投票完成：{len(model_decisions)}/{len(participants)} 位投票者由模型决定")
+        return decisions
+    
+    async def _get_vote_transcript(self, round_id: int, game_id: int) -> str:
+        """获取投票用的辩论记录（最近的辩论、申辞和追加辩论发言，一次联表查询）"""
+        await message_writer.flush()
+        rows = await run_in_db(self.db.query(Participant.human_name, Message.content).join(
+            Participant, Participant.id == Message.participant_id
+        ).filter(
+            Message.round_id == round_id,
+            Message.message_type.in_(["chat", "final_defense", "additional_debate"])
+        ).order_by(Message.sequence_number.desc()).limit(settings.VOTE_TRANSCRIPT_MESSAGES).all)
+        return "\n".join(f"{name}: {content}" for name, content in reversed(rows))
+    
+    def _fallback_vote_reason(self, target: Any, vote_phase: str = "投票") -> str:
+        """预设的投票理由（随机投票，以及模型投票超时或失败时使用）"""
         target_name = getattr(target, 'human_name', '未知')
         
         if vote_phase == "最终投票":
@@ -1237,17 +1300,16 @@ class ChatService:
     
     async def _start_final_defense(self, round_id: int, top_candidates: List[dict], is_resume: bool = False):
         """开始最终申辞阶段"""
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         if not round_obj:
             return
             
         game_id = getattr(round_obj, 'game_id', 0)
         
         # 更新轮次状态为最终申辞阶段
-        self.db.query(Round).filter(Round.id == round_id).update({
+        await self._update_round(round_id, {
             "current_phase": "final_defense"
         })
-        self.db.commit()
         
         # 只在非恢复模式下发送开始消息
         if not is_resume:
@@ -1281,9 +1343,9 @@ class ChatService:
         for i, candidate in enumerate(top_candidates):
             try:
                 candidate_id = candidate['id']
-                participant = self.db.query(Participant).filter(
+                participant = await run_in_db(self.db.query(Participant).filter(
                     Participant.id == candidate_id
-                ).first()
+                ).first)
                 
                 if not participant:
                     print(f"⚠️ 参与者 {candidate_id} 不存在，跳过申辞")
@@ -1298,26 +1360,15 @@ class ChatService:
                 
                 # 保存申辞消息 - 使用自然增长的序号
                 # 获取当前轮次的下一个序号
-                max_sequence = self.db.query(Message.sequence_number).filter(
-                    Message.round_id == round_id,
-                    Message.sequence_number.isnot(None)
-                ).order_by(Message.sequence_number.desc()).first()
-                
-                if max_sequence and max_sequence[0] is not None:
-                    next_sequence = max_sequence[0] + 1
-                else:
-                    next_sequence = 0
+                next_sequence = await sequence_allocator.allocate(round_id)
                 
-                message = Message(
+                message = await message_writer.add_message(
                     round_id=round_id,
                     participant_id=candidate_id,
                     content=defense_speech,
                     message_type="final_defense",
                     sequence_number=next_sequence
                 )
-                self.db.add(message)
-                self.db.commit()
-                self.db.refresh(message)
                 
                 # 流式版本已经在生成过程中实时广播了，这里不需要再次广播
                 print(f"✅ {participant_name} 最终申辞已完成并保存到数据库")
@@ -1375,45 +1426,27 @@ class ChatService:
     async def _generate_final_defense_stream(self, participant: Any, round_id: int, game_id: int) -> str:
         """生成最终申辞（流式输出）"""
         participant_name = getattr(participant, 'human_name', '未知')
-        participant_background = getattr(participant, 'background', '未知背景')
-        participant_personality = getattr(participant, 'personality', '未知性格')
         participant_id = getattr(participant, 'id', 0)
         participant_model = getattr(participant, 'model_name', '未知模型')
         
         # 获取投票历史作为背景
-        chat_history = self._get_chat_history(round_id)
+        chat_history = await self._get_chat_history(round_id, game_id)
         
-        prompt = f"""
-**紧急情况：你被怀疑是AI间谍，现在是你最后为自己辩护的机会！**
-
-你是 {participant_name}，背景：{participant_background}，性格：{participant_personality}
-
-在刚才的法庭辩论中：
-{chat_history}
-
-现在你在初投票中得票最多，被高度怀疑是AI间谍。这是你最后为生命辩护的机会！
-
-**申辞要求：**
-1. 强烈否认自己是AI间谍
-2. 展现真实的人类情感：恐惧、愤怒、绝望
-3. 提供具体的人类经历证据
-4. 反击对你的指控，指出别人更可疑的地方
-5. 情绪化表达，让其他人相信你的人类身份
-
-这是生死关头，用你最真实的"人类"情感为自己辩护！直接给出申辞内容（100-150字）：
-"""
+        prompt = prompt_builder.defense_prompt(participant, chat_history)
+        
+        # 生成唯一的消息ID（在try之前分配，快速失败时错误广播也能引用）
+        message_id = str(uuid.uuid4())
+        model_name = getattr(participant, 'model_name', 'gemma3n:e4b')
         
         try:
-            model_name = getattr(participant, 'model_name', 'gemma3n:e4b')
             # 生成流式最终申辞（减少日志输出）
             
-            # 首先检查Ollama服务健康状态
-            is_healthy = await self.ollama_service.check_health()
-            if not is_healthy:
+            # 查询缓存的后端健康状态（断路器打开时快速失败，不再每次探测）
+            if not self.ollama_service.is_backend_available(model_name):
                 raise ConnectionError("Ollama服务不可用或未响应")
             
-            # 生成唯一的消息ID
-            message_id = str(uuid.uuid4())
+            # 按时间/字符窗口合并片段，减少广播帧数
+            coalescer = self.websocket_manager.chunk_coalescer(game_id, "defense_chunk", message_id)
             
             # 先广播开始生成申辞的消息
             await self.websocket_manager.broadcast_to_game({
@@ -1421,6 +1454,7 @@ class ChatService:
                 "message_id": message_id,
                 "participant_id": participant_id,
                 "participant_name": f"{participant_name} ({participant_model})",
+                "pacing": coalescer.pacing,
                 "timestamp": datetime.now().isoformat() + 'Z'
             }, game_id)
             
@@ -1430,23 +1464,17 @@ class ChatService:
             # 使用流式方法生成申辞
             async for text_chunk in self.ollama_service.chat_stream(
                 model=model_name,
-                message=prompt
+                message=prompt,
+                game_id=game_id
             ):
-                if text_chunk and text_chunk.strip():
+                if text_chunk:
                     full_defense += text_chunk
                     
-                    # 实时广播申辞片段
-                    await self.websocket_manager.broadcast_to_game({
-                        "type": "defense_chunk",
-                        "message_id": message_id,
-                        "participant_id": participant_id,
-                        "participant_name": f"{participant_name} ({participant_model})",
-                        "chunk": text_chunk,
-                        "timestamp": datetime.now().isoformat() + 'Z'
-                    }, game_id)
-                    
-                    # 添加小延迟使效果更自然
-                    await asyncio.sleep(0.05)  # 50ms延迟
+                    # 实时广播申辞片段（紧凑增量帧），显示节奏由前端或realistic回放模式控制
+                    await coalescer.add(text_chunk)
+            
+            # 发送剩余片段，保证完成消息之前客户端已收到全部片段
+            await coalescer.flush()
             
             if not full_defense.strip():
                 raise ValueError("AI模型返回空申辞内容")
@@ -1512,23 +1540,22 @@ class ChatService:
     
     async def _start_final_voting(self, round_id: int):
         """开始最终投票阶段"""
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         if not round_obj:
             return
             
         game_id = getattr(round_obj, 'game_id', 0)
         
         # 更新轮次状态为最终投票阶段
-        self.db.query(Round).filter(Round.id == round_id).update({
+        await self._update_round(round_id, {
             "current_phase": "final_voting"
         })
-        self.db.commit()
         
         # 获取所有活跃参与者
-        participants = self.db.query(Participant).filter(
+        participants = await run_in_db(self.db.query(Participant).filter(
             Participant.game_id == game_id,
             Participant.status == "active"
-        ).all()
+        ).all)
         
         if len(participants) < 2:
             return
@@ -1564,7 +1591,7 @@ class ChatService:
     
     async def _process_final_voting_result(self, round_id: int, vote_counts: dict, all_votes: list, participants: List[Any]):
         """处理最终投票结果"""
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         if not round_obj:
             return
             
@@ -1585,7 +1612,7 @@ class ChatService:
         voting_data = self._prepare_voting_data(vote_counts, all_votes)
         
         # 确定阶段名称
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         current_phase = getattr(round_obj, 'current_phase', 'final_voting') if round_obj else 'final_voting'
         phase_name = "追加投票" if current_phase == "additional_voting" else "最终投票"
         
@@ -1593,17 +1620,9 @@ class ChatService:
         import json
         
         # 获取当前轮次的下一个序号
-        max_sequence = self.db.query(Message.sequence_number).filter(
-            Message.round_id == round_id,
-            Message.sequence_number.isnot(None)
-        ).order_by(Message.sequence_number.desc()).first()
-        
-        if max_sequence and max_sequence[0] is not None:
-            next_sequence = max_sequence[0] + 1
-        else:
-            next_sequence = 0
+        next_sequence = await sequence_allocator.allocate(round_id)
         
-        voting_table_message = Message(
+        voting_table_message = await message_writer.add_message(
             round_id=round_id,
             participant_id=None,  # 系统消息
             content=json.dumps(voting_data),  # 将投票数据序列化为JSON保存
@@ -1611,9 +1630,6 @@ class ChatService:
             title=f"{phase_name}结果",
             sequence_number=next_sequence
         )
-        self.db.add(voting_table_message)
-        self.db.commit()
-        self.db.refresh(voting_table_message)
         print(f"💾 已保存{phase_name}结果表格到数据库")
         
         # 广播最终投票表格
@@ -1646,17 +1662,16 @@ class ChatService:
     
     async def _start_additional_debate(self, round_id: int, tied_candidates: List[dict], is_resume: bool = False):
         """开始追加辩论阶段"""
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         if not round_obj:
             return
             
         game_id = getattr(round_obj, 'game_id', 0)
         
         # 更新轮次状态为追加辩论阶段
-        self.db.query(Round).filter(Round.id == round_id).update({
+        await self._update_round(round_id, {
             "current_phase": "additional_debate"
         })
-        self.db.commit()
         
         # 只在非恢复模式下发送开始消息
         if not is_resume:
@@ -1689,9 +1704,9 @@ class ChatService:
         # 让并列的候选人各自发言一次
         for i, candidate in enumerate(tied_candidates):
             candidate_id = candidate['id']
-            participant = self.db.query(Participant).filter(
+            participant = await run_in_db(self.db.query(Participant).filter(
                 Participant.id == candidate_id
-            ).first()
+            ).first)
             
             if not participant:
                 continue
@@ -1701,26 +1716,15 @@ class ChatService:
             
             # 保存发言消息 - 使用自然增长的序号
             # 获取当前轮次的下一个序号
-            max_sequence = self.db.query(Message.sequence_number).filter(
-                Message.round_id == round_id,
-                Message.sequence_number.isnot(None)
-            ).order_by(Message.sequence_number.desc()).first()
+            next_sequence = await sequence_allocator.allocate(round_id)
             
-            if max_sequence and max_sequence[0] is not None:
-                next_sequence = max_sequence[0] + 1
-            else:
-                next_sequence = 0
-            
-            message = Message(
+            message = await message_writer.add_message(
                 round_id=round_id,
                 participant_id=candidate_id,
                 content=debate_speech,
                 message_type="additional_debate",
                 sequence_number=next_sequence
             )
-            self.db.add(message)
-            self.db.commit()
-            self.db.refresh(message)
             
             # 广播追加辩论发言
             participant_name = getattr(participant, 'human_name', '未知')
@@ -1755,31 +1759,19 @@ class ChatService:
         participant_name = getattr(participant, 'human_name', '未知')
         other_candidates = [c['name'] for c in tied_candidates if c['name'] != participant_name]
         
-        prompt = f"""
-**危机时刻：你与其他人并列得票最多，需要在追加辩论中证明自己的清白！**
-
-你是 {participant_name}，现在与 {', '.join(other_candidates)} 并列得票最多。
-
-这是最后的机会，你需要：
-1. 强烈为自己辩护，证明你不是AI间谍
-2. 指出其他并列候选人更可疑的地方
-3. 展现强烈的求生欲和人类情感
-4. 用具体事例证明你的人类身份
-
-这是最终的生死较量，全力以赴！直接给出辩论内容（80-120字）：
-"""
+        prompt = prompt_builder.additional_debate_prompt(participant, other_candidates)
         
         try:
             model_name = getattr(participant, 'model_name', 'gemma3n:e4b')
             
-            # 首先检查Ollama服务健康状态
-            is_healthy = await self.ollama_service.check_health()
-            if not is_healthy:
+            # 查询缓存的后端健康状态（断路器打开时快速失败，不再每次探测）
+            if not self.ollama_service.is_backend_available(model_name):
                 raise ConnectionError("Ollama服务不可用或未响应")
             
             response = await self.ollama_service.chat(
                 model=model_name,
-                message=prompt
+                message=prompt,
+                game_id=getattr(participant, 'game_id', None)
             )
             raw_content = getattr(response, 'message', '').strip()
             if not raw_content:
@@ -1814,23 +1806,22 @@ class ChatService:
     
     async def _conduct_additional_voting(self, round_id: int):
         """进行追加投票"""
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         if not round_obj:
             return
             
         game_id = getattr(round_obj, 'game_id', 0)
         
         # 更新轮次状态为追加投票阶段
-        self.db.query(Round).filter(Round.id == round_id).update({
+        await self._update_round(round_id, {
             "current_phase": "additional_voting"
         })
-        self.db.commit()
         
         # 获取所有活跃参与者
-        participants = self.db.query(Participant).filter(
+        participants = await run_in_db(self.db.query(Participant).filter(
             Participant.game_id == game_id,
             Participant.status == "active"
-        ).all()
+        ).all)
         
         if len(participants) < 2:
             return
@@ -1867,37 +1858,37 @@ class ChatService:
     
     async def _eliminate_participant_and_end_game(self, round_id: int, eliminated_id: int, all_votes: list, participants: List[Any]):
         """淘汰参与者并结束游戏"""
-        round_obj = self.db.query(Round).filter(Round.id == round_id).first()
+        round_obj = await run_in_db(self.db.query(Round).filter(Round.id == round_id).first)
         if not round_obj:
             return
             
         game_id = getattr(round_obj, 'game_id', 0)
         
-        eliminated_participant = self.db.query(Participant).filter(
+        eliminated_participant = await run_in_db(self.db.query(Participant).filter(
             Participant.id == eliminated_id
-        ).first()
+        ).first)
         
         if eliminated_participant:
             # 标记被淘汰的AI
-            self.db.query(Participant).filter(Participant.id == eliminated_id).update({
+            await run_in_db(self.db.query(Participant).filter(Participant.id == eliminated_id).update, {
                 "status": "eliminated",
                 "elimination_round": getattr(round_obj, 'round_number', 1)
             })
             
             # 更新轮次信息
-            self.db.query(Round).filter(Round.id == round_id).update({
+            await self._update_round(round_id, {
                 "status": "finished",
                 "current_phase": "finished",
                 "eliminated_participant_id": eliminated_id,
                 "end_time": func.now()
             })
-            self.db.commit()
+            sequence_allocator.evict_round(round_id)
             
             # 获取获胜者（未被选中的AI们）
-            winners = self.db.query(Participant).filter(
+            winners = await run_in_db(self.db.query(Participant).filter(
                 Participant.game_id == game_id,
                 Participant.status == "active"
-            ).all()
+            ).all)
             
             # 结束游戏并显示详细结果
             await self._end_game_with_detailed_result(game_id, eliminated_participant, all_votes, winners)
@@ -1905,11 +1896,15 @@ class ChatService:
     async def _end_game_with_detailed_result(self, game_id: int, eliminated_participant: Any, vote_details: list, winners: list):
         """结束游戏并显示详细结果"""
         # 更新游戏状态
-        self.db.query(Game).filter(Game.id == game_id).update({
+        await run_in_db(self.db.query(Game).filter(Game.id == game_id).update, {
             "status": "finished",
             "end_time": func.now()
         })
-        self.db.commit()
+        await run_in_db(self.db.commit)
+        chat_history_cache.evict_game(game_id)
+        prompt_builder.evict_game(game_id)
+        generation_sessions.evict_game(game_id)
+        generation_scheduler.forget_game(game_id)
         
         eliminated_name = getattr(eliminated_participant, 'human_name', '未知AI')
         winner_names = [getattr(w, 'human_name', '未知') for w in winners]
@@ -1947,4 +1942,7 @@ class ChatService:
             "total_participants": len(vote_details) + len(winners)
         }, game_id)
         
-        print(f"游戏 {game_id} 结束: {eliminated_name} 被淘汰，{len(winners)} 人获胜") 
\ No newline at end of file
+        print(f"游戏 {game_id} 结束: {eliminated_name} 被淘汰，{len(winners)} 人获胜") 
+        
+        # 将游戏记录压缩归档，并从消息、投票等热表中移除
+        await game_archiver.archive(game_id)
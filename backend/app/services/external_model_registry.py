@@ -0,0 +1,105 @@
+"""
+外部模型注册表
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+from app.models.external_model import ExternalModel, APIType
+
+
+class ExternalEndpoint:
+    """预先构建好的外部模型调用参数（API端点、请求头和请求体模板）"""
+
+    def __init__(self, name: str, api_type: APIType, url: str, headers: Dict[str, str], body_template: dict):
+        self.name = name
+        self.api_type = api_type
+        self.url = url
+        self.headers = headers
+        self._body_template = body_template
+
+    def request_body(self, message: str, stream: bool) -> dict:
+        """基于模板生成本次请求的请求体"""
+        body = dict(self._body_template)
+        body["messages"] = [{"role": "user", "content": message}]
+        body["stream"] = stream
+        return body
+
+
+class ExternalModelRegistry:
+    """已启用外部模型的内存注册表
+
+    首次使用时从数据库加载全部已启用的外部模型并预先构建调用参数，
+    之后每次生成都直接读取内存；外部模型增删改时失效，下次使用时重新加载。
+    """
+
+    def __init__(self):
+        # 模型名称（不含external:前缀） -> 调用参数
+        self._endpoints: Optional[Dict[str, ExternalEndpoint]] = None
+        self._lock = asyncio.Lock()
+        # 每次失效递增，避免加载期间发生的修改被旧数据覆盖
+        self._version = 0
+
+    async def get(self, name: str) -> Optional[ExternalEndpoint]:
+        """获取外部模型的调用参数，不存在或未启用时返回None"""
+        endpoints = await self._ensure_loaded()
+        return endpoints.get(name)
+
+    async def list(self) -> List[ExternalEndpoint]:
+        """全部已启用的外部模型"""
+        endpoints = await self._ensure_loaded()
+        return list(endpoints.values())
+
+    async def _ensure_loaded(self) -> Dict[str, ExternalEndpoint]:
+        endpoints = self._endpoints
+        if endpoints is not None:
+            return endpoints
+
+        async with self._lock:
+            if self._endpoints is None:
+                version = self._version
+                loaded = await self._load()
+                if version == self._version:
+                    self._endpoints = loaded
+                return loaded
+            return self._endpoints
+
+    async def _load(self) -> Dict[str, ExternalEndpoint]:
+        """从数据库加载已启用的外部模型"""
+        from app.core.database import SessionLocal, run_in_db
+        from app.services.external_model_service import ExternalModelService
+
+        service = ExternalModelService(None)
+
+        def build() -> Dict[str, ExternalEndpoint]:
+            db = SessionLocal()
+            try:
+                models = db.query(ExternalModel).filter(ExternalModel.is_active.is_(True)).all()
+                endpoints = {}
+                for model in models:
+                    headers = {"Content-Type": "application/json"}
+                    if model.api_key is not None and model.api_key.strip():
+                        headers["Authorization"] = f"Bearer {model.api_key}"
+
+                    endpoints[model.name] = ExternalEndpoint(
+                        name=model.name,
+                        api_type=model.api_type,
+                        url=service._build_complete_api_url(model.api_type, model.api_url),
+                        headers=headers,
+                        body_template=service._build_request_body(model.api_type, model.model_id, "", max_tokens=500)
+                    )
+                return endpoints
+            finally:
+                db.close()
+
+        endpoints = await run_in_db(build)
+        print(f"📇 已加载 {len(endpoints)} 个外部模型")
+        return endpoints
+
+    def invalidate(self):
+        """使注册表失效（外部模型增删改时调用）"""
+        self._version += 1
+        self._endpoints = None
+
+
+# 全局外部模型注册表
+external_model_registry = ExternalModelRegistry()
@@ -12,6 +12,9 @@ from sqlalchemy import func
 from datetime import datetime
 
 from app.models.external_model import ExternalModel, APIType
+from app.core.http_client import http_clients
+from app.services.model_catalog import model_catalog
+from app.services.external_model_registry import external_model_registry, ExternalEndpoint
 from app.schemas.external_model_schemas import (
     ExternalModelCreate, 
     ExternalModelUpdate, 
@@ -87,6 +90,8 @@ class ExternalModelService:
         self.db.add(model)
         self.db.commit()
         self.db.refresh(model)
+        model_catalog.invalidate()
+        external_model_registry.invalidate()
         
         return ExternalModelResponse.model_validate(model)
     
@@ -129,6 +134,8 @@ class ExternalModelService:
         # updated_at会自动更新
         self.db.commit()
         self.db.refresh(model)
+        model_catalog.invalidate()
+        external_model_registry.invalidate()
         
         return ExternalModelResponse.model_validate(model)
     
@@ -140,6 +147,8 @@ class ExternalModelService:
         
         self.db.delete(model)
         self.db.commit()
+        model_catalog.invalidate()
+        external_model_registry.invalidate()
         return True
     
     async def test_model(self, test_data: ExternalModelTest) -> ExternalModelTestResponse:
@@ -268,76 +277,56 @@ class ExternalModelService:
         else:
             print(f"❌ 未找到模型 {model_id}")
     
-    async def chat_with_external_model(self, model: ExternalModel, message: str) -> str:
-        """与外部模型进行对话"""
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        if model.api_key is not None and model.api_key.strip():
-            headers["Authorization"] = f"Bearer {model.api_key}"
-        
-        # 根据API类型构建端点和请求体
-        api_endpoint = self._build_complete_api_url(model.api_type, model.api_url)
-        request_body = self._build_request_body(model.api_type, model.model_id, message, stream=False, max_tokens=500)
-        
+    async def chat_with_external_model(self, endpoint: ExternalEndpoint, message: str) -> str:
+        """与外部模型进行对话（端点、请求头和请求体模板由注册表预先构建）"""
         try:
-            async with httpx.AsyncClient(timeout=60, verify=False) as client:
-                response = await client.post(
-                    api_endpoint,
-                    json=request_body,
-                    headers=headers
-                )
-                
-                response.raise_for_status()
-                result = response.json()
-                
-                if 'choices' in result and len(result['choices']) > 0:
-                    return result['choices'][0].get('message', {}).get('content', '')
-                
-                raise ValueError("API响应格式不正确")
+            client = http_clients.get_client(endpoint.url, verify=False)
+            response = await client.post(
+                endpoint.url,
+                json=endpoint.request_body(message, stream=False),
+                headers=endpoint.headers,
+                timeout=60
+            )
+            
+            response.raise_for_status()
+            result = response.json()
+            
+            if 'choices' in result and len(result['choices']) > 0:
+                return result['choices'][0].get('message', {}).get('content', '')
+            
+            raise ValueError("API响应格式不正确")
                 
         except Exception as e:
-            raise Exception(f"外部模型调用失败: {str(e)}")
+            raise Exception(f"外部模型调用失败: {str(e)}") from e
     
-    async def chat_with_external_model_stream(self, model: ExternalModel, message: str) -> AsyncGenerator[str, None]:
-        """与外部模型进行流式对话"""
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        if model.api_key is not None and model.api_key.strip():
-            headers["Authorization"] = f"Bearer {model.api_key}"
-        
-        # 根据API类型构建端点和请求体
-        api_endpoint = self._build_complete_api_url(model.api_type, model.api_url)
-        request_body = self._build_request_body(model.api_type, model.model_id, message, stream=True, max_tokens=500)
-        
+    async def chat_with_external_model_stream(self, endpoint: ExternalEndpoint, message: str) -> AsyncGenerator[str, None]:
+        """与外部模型进行流式对话（端点、请求头和请求体模板由注册表预先构建）"""
         try:
-            async with httpx.AsyncClient(timeout=60, verify=False) as client:
-                async with client.stream(
-                    "POST",
-                    api_endpoint,
-                    json=request_body,
-                    headers=headers
-                ) as response:
-                    response.raise_for_status()
-                    
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            data = line[6:]  # 去掉 "data: " 前缀
-                            if data.strip() == "[DONE]":
-                                break
-                            
-                            try:
-                                chunk = json.loads(data)
-                                if 'choices' in chunk and len(chunk['choices']) > 0:
-                                    delta = chunk['choices'][0].get('delta', {})
-                                    content = delta.get('content', '')
-                                    if content:
-                                        yield content
-                            except json.JSONDecodeError:
-                                continue
+            client = http_clients.get_client(endpoint.url, verify=False)
+            async with client.stream(
+                "POST",
+                endpoint.url,
+                json=endpoint.request_body(message, stream=True),
+                headers=endpoint.headers,
+                timeout=60
+            ) as response:
+                response.raise_for_status()
                 
+                async for line in response.aiter_lines():
+                    if line.startswith("data: "):
+                        data = line[6:]  # 去掉 "data: " 前缀
+                        if data.strip() == "[DONE]":
+                            break
+                        
+                        try:
+                            chunk = json.loads(data)
+                            if 'choices' in chunk and len(chunk['choices']) > 0:
+                                delta = chunk['choices'][0].get('delta', {})
+                                content = delta.get('content', '')
+                                if content:
+                                    yield content
+                        except json.JSONDecodeError:
+                            continue
+            
         except Exception as e:
-            raise Exception(f"外部模型流式调用失败: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"外部模型流式调用失败: {str(e)}") from e 
\ No newline at end of file
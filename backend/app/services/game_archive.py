@@ -0,0 +1,201 @@
+"""
+已结束游戏的冷归档
+"""
+
+import asyncio
+import gzip
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import DateTime
+from app.core.config import settings
+from app.core.database import SessionLocal, run_in_db, run_in_db_read
+from app.models.game import Game
+from app.models.participant import Participant
+from app.models.round_model import Round
+from app.models.message import Message
+from app.models.vote import Vote
+from app.models.elimination import Elimination
+from app.models.archived_game import ArchivedGame
+from app.services.game_purge import delete_round_data
+
+ARCHIVE_FORMAT = "json+gzip"
+
+
+def _dump_rows(model: Any, rows: List[Any]) -> List[Dict[str, Any]]:
+    """将ORM对象转换为可JSON序列化的字典（时间字段保存为ISO格式）"""
+    columns = [column.name for column in model.__table__.columns]
+    dumped = []
+    for row in rows:
+        item = {}
+        for name in columns:
+            value = getattr(row, name, None)
+            item[name] = value.isoformat() if isinstance(value, datetime) else value
+        dumped.append(item)
+    return dumped
+
+
+def _load_rows(model: Any, items: List[Dict[str, Any]]) -> List[SimpleNamespace]:
+    """将归档中的字典还原为与ORM对象属性一致的只读对象"""
+    datetime_columns = [column.name for column in model.__table__.columns if isinstance(column.type, DateTime)]
+    rows = []
+    for item in items:
+        for name in datetime_columns:
+            if item.get(name):
+                item[name] = datetime.fromisoformat(item[name])
+        rows.append(SimpleNamespace(**item))
+    return rows
+
+
+class ArchivedGameRecord:
+    """解压后的归档游戏记录（属性与ORM对象一致的只读对象）"""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.game_id = payload.get("game_id")
+        self.rounds = _load_rows(Round, payload.get("rounds", []))
+        self.messages = _load_rows(Message, payload.get("messages", []))
+        self.votes = _load_rows(Vote, payload.get("votes", []))
+        self.eliminations = _load_rows(Elimination, payload.get("eliminations", []))
+        self.participants = _load_rows(Participant, payload.get("participants", []))
+
+    @property
+    def participant_map(self) -> Dict[int, Any]:
+        return {getattr(p, 'id', 0): p for p in self.participants}
+
+    def transcript(self) -> Tuple[List[Any], List[Any], Dict[int, Any]]:
+        """回放用的(轮次, 消息, 参与者映射)"""
+        return self.rounds, self.messages, self.participant_map
+
+
+class GameArchiver:
+    """已结束游戏的冷归档
+
+    游戏结束后把轮次、消息、投票、淘汰记录和参与者序列化为一个gzip压缩的JSON数据块写入archived_games，
+    并删除热表中的轮次、消息、投票等记录（游戏和参与者行保留，用于游戏列表和状态查询）。
+    读取走只读线程池，JSON编码和压缩在普通工作线程中进行，数据库写入线程只执行插入和删除，不阻塞其他游戏的写入。
+    回放已归档的游戏只需读取一行并解压，由GameService透明处理。
+    """
+
+    async def archive(self, game_id: int) -> bool:
+        """归档已结束的游戏，返回是否归档成功"""
+        if not settings.GAME_ARCHIVE:
+            return False
+
+        # 等待写入队列中该游戏的消息和投票提交
+        from app.services.message_writer import message_writer
+        await message_writer.flush()
+
+        try:
+            payload = await run_in_db_read(self._collect, game_id)
+            if payload is None:
+                return False
+            raw, data = await asyncio.to_thread(self._encode, payload)
+            message_count = len(payload["messages"])
+            stored = await run_in_db(self._store, game_id, data, message_count, len(raw))
+        except Exception as e:
+            print(f"⚠️ 归档游戏 {game_id} 失败，记录保留在原表中: {e}")
+            return False
+
+        if stored:
+            print(f"🗄️ 游戏 {game_id} 已归档：{message_count} 条消息，{len(raw)} -> {len(data)} 字节")
+        return stored
+
+    async def load(self, game_id: int) -> Optional[ArchivedGameRecord]:
+        """读取归档的游戏记录（包括投票和淘汰记录）；未归档时返回None"""
+        data = await run_in_db_read(self._read, game_id)
+        if data is None:
+            return None
+        return await asyncio.to_thread(self._decode, data)
+
+    @staticmethod
+    def _collect(game_id: int) -> Optional[Dict[str, Any]]:
+        """读取需要归档的全部记录（只读线程池）"""
+        db = SessionLocal()
+        try:
+            game = db.query(Game).filter(Game.id == game_id).first()
+            if not game or getattr(game, 'status', '') != "finished":
+                return None
+            if db.query(ArchivedGame.game_id).filter(ArchivedGame.game_id == game_id).first():
+                return None
+
+            rounds = db.query(Round).filter(Round.game_id == game_id).order_by(Round.round_number).all()
+            round_ids = [getattr(r, 'id', 0) for r in rounds]
+            round_numbers = {getattr(r, 'id', 0): getattr(r, 'round_number', 0) for r in rounds}
+
+            # 按回放顺序保存：轮次，然后序号（系统消息为负数在前，NULL在最后），然后时间
+            messages = db.query(Message).filter(Message.round_id.in_(round_ids)).all()
+            messages.sort(key=lambda m: (
+                round_numbers.get(m.round_id, 0),
+                999999 if m.sequence_number is None else m.sequence_number,
+                m.timestamp or datetime.min
+            ))
+            votes = db.query(Vote).filter(Vote.round_id.in_(round_ids)).order_by(Vote.id).all()
+            eliminations = db.query(Elimination).filter(Elimination.game_id == game_id).all()
+            participants = db.query(Participant).filter(Participant.game_id == game_id).all()
+
+            return {
+                "game_id": game_id,
+                "rounds": _dump_rows(Round, rounds),
+                "messages": _dump_rows(Message, messages),
+                "votes": _dump_rows(Vote, votes),
+                "eliminations": _dump_rows(Elimination, eliminations),
+                "participants": _dump_rows(Participant, participants)
+            }
+        finally:
+            db.close()
+
+    @staticmethod
+    def _encode(payload: Dict[str, Any]) -> Tuple[bytes, bytes]:
+        """序列化并压缩（在工作线程中执行，不占用数据库线程）"""
+        raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return raw, gzip.compress(raw, compresslevel=settings.GAME_ARCHIVE_COMPRESSION_LEVEL)
+
+    @staticmethod
+    def _store(game_id: int, data: bytes, message_count: int, raw_size: int) -> bool:
+        """写入归档并删除热表中的记录（数据库写入线程，一个事务）"""
+        db = SessionLocal()
+        try:
+            if db.query(ArchivedGame.game_id).filter(ArchivedGame.game_id == game_id).first():
+                return False
+            # 读取之后又有新消息写入时放弃本次归档，避免删除未归档的记录
+            current_count = db.query(Message).join(Round, Round.id == Message.round_id).filter(
+                Round.game_id == game_id
+            ).count()
+            if current_count != message_count:
+                print(f"⚠️ 游戏 {game_id} 归档期间有新消息写入，跳过归档")
+                return False
+
+            db.add(ArchivedGame(
+                game_id=game_id,
+                format=ARCHIVE_FORMAT,
+                data=data,
+                message_count=message_count,
+                raw_size=raw_size
+            ))
+            delete_round_data(db, [game_id])
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _read(game_id: int) -> Optional[bytes]:
+        db = SessionLocal()
+        try:
+            archived = db.query(ArchivedGame.data).filter(ArchivedGame.game_id == game_id).first()
+            return archived[0] if archived else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _decode(data: bytes) -> ArchivedGameRecord:
+        """解压并还原归档记录（在工作线程中执行）"""
+        return ArchivedGameRecord(json.loads(gzip.decompress(data).decode("utf-8")))
+
+
+# 全局游戏归档器
+game_archiver = GameArchiver()
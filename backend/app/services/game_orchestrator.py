@@ -0,0 +1,157 @@
+"""
+游戏编排器
+"""
+
+import asyncio
+import time
+from typing import Coroutine, Dict, Optional, Set
+from app.core.config import settings
+
+
+class GameTask:
+    """单个游戏的主循环任务"""
+
+    def __init__(self, game_id: int):
+        self.game_id = game_id
+        # queued -> running -> finished / cancelled / failed
+        self.state = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # 游戏循环派生的子任务（如预生成草稿），随游戏一起取消
+        self.children: Set[asyncio.Task] = set()
+
+    @property
+    def active(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def to_dict(self) -> dict:
+        return {
+            "game_id": self.game_id,
+            "state": self.state,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "children": sum(1 for child in self.children if not child.done())
+        }
+
+
+class GameOrchestrator:
+    """每个游戏持有一个受管理的主循环任务
+
+    同时运行的游戏数量受MAX_CONCURRENT_GAMES限制，超出时排队等待；
+    停止游戏时立即取消对应任务，关闭服务时先等待正在运行的游戏，超时后取消
+    （游戏状态保持running，重启后由resume_interrupted_games恢复）。
+    """
+
+    def __init__(self, max_concurrent_games: int):
+        self._semaphore = asyncio.Semaphore(max_concurrent_games)
+        # 排队中和运行中的游戏任务（任务结束后移除）
+        self._games: Dict[int, GameTask] = {}
+        # 已结束任务按最终状态计数
+        self._finished_states: Dict[str, int] = {}
+        self._draining = False
+
+    def launch(self, game_id: int, coro: Coroutine) -> GameTask:
+        """为游戏启动主循环任务（同一游戏同时只能有一个任务）"""
+        existing = self._games.get(game_id)
+        if self._draining or (existing and existing.active):
+            coro.close()
+            if self._draining:
+                raise ValueError("服务器正在关闭，无法启动游戏")
+            raise ValueError(f"游戏 {game_id} 已在运行")
+
+        entry = GameTask(game_id)
+        entry.task = asyncio.create_task(self._run(entry, coro))
+        self._games[game_id] = entry
+        return entry
+
+    async def _run(self, entry: GameTask, coro: Coroutine):
+        started = False
+        try:
+            async with self._semaphore:
+                started = True
+                entry.state = "running"
+                entry.started_at = time.time()
+                await coro
+            entry.state = "finished"
+        except asyncio.CancelledError:
+            entry.state = "cancelled"
+            print(f"⏹️ 游戏 {entry.game_id} 的任务已取消")
+        except Exception as e:
+            entry.state = "failed"
+            entry.error = str(e)
+            print(f"❌ 游戏 {entry.game_id} 的任务异常结束: {e}")
+        finally:
+            if not started:
+                # 排队期间被取消，协程从未开始执行
+                coro.close()
+            for child in entry.children:
+                child.cancel()
+            entry.finished_at = time.time()
+            self._finished_states[entry.state] = self._finished_states.get(entry.state, 0) + 1
+            # 移除已结束的任务，避免记录随服务运行时间增长
+            if self._games.get(entry.game_id) is entry:
+                del self._games[entry.game_id]
+
+    def create_child_task(self, game_id: Optional[int], coro: Coroutine) -> asyncio.Task:
+        """创建属于游戏的子任务，游戏任务结束或取消时一并取消"""
+        task = asyncio.create_task(coro)
+        entry = self._games.get(game_id) if game_id is not None else None
+        if entry and entry.active:
+            entry.children.add(task)
+            task.add_done_callback(entry.children.discard)
+        return task
+
+    async def cancel(self, game_id: int, timeout: float = 5.0) -> bool:
+        """立即取消游戏的主循环任务，返回是否有任务被取消"""
+        entry = self._games.get(game_id)
+        if not entry or not entry.active:
+            return False
+        entry.task.cancel()
+        await asyncio.wait([entry.task], timeout=timeout)
+        return True
+
+    def is_running(self, game_id: int) -> bool:
+        """游戏是否有排队中或运行中的任务"""
+        entry = self._games.get(game_id)
+        return bool(entry and entry.active)
+
+    def get(self, game_id: int) -> Optional[dict]:
+        """游戏任务状态（只保留排队中和运行中的任务）"""
+        entry = self._games.get(game_id)
+        return entry.to_dict() if entry else None
+
+    def snapshot(self) -> dict:
+        """编排器状态快照"""
+        states: Dict[str, int] = dict(self._finished_states)
+        for entry in self._games.values():
+            states[entry.state] = states.get(entry.state, 0) + 1
+        return {
+            "max_concurrent_games": settings.MAX_CONCURRENT_GAMES,
+            "draining": self._draining,
+            "states": states,
+            "games": [entry.to_dict() for entry in self._games.values() if entry.active]
+        }
+
+    async def drain(self, timeout: float):
+        """停止接受新游戏，等待运行中的游戏结束，超时后取消剩余任务"""
+        self._draining = True
+        tasks = [entry.task for entry in self._games.values() if entry.active]
+        if not tasks:
+            return
+
+        print(f"⏳ 等待 {len(tasks)} 个游戏任务结束（最多 {timeout} 秒）...")
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=5)
+            print(f"⏹️ 已取消 {len(pending)} 个未结束的游戏任务，重启后将自动恢复")
+
+
+# 全局游戏编排器
+game_orchestrator = GameOrchestrator(max_concurrent_games=settings.MAX_CONCURRENT_GAMES)
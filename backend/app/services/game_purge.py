@@ -0,0 +1,127 @@
+"""
+游戏数据删除与定期清理
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, run_in_db
+from app.models.game import Game
+from app.models.participant import Participant
+from app.models.round_model import Round
+from app.models.message import Message
+from app.models.vote import Vote
+from app.models.elimination import Elimination
+from app.models.speech_checkpoint import SpeechCheckpoint
+from app.models.archived_game import ArchivedGame
+
+
+def delete_round_data(db: Session, game_ids: List[int]):
+    """删除游戏的轮次及其消息、投票、发言检查点和淘汰记录（不提交）"""
+    round_ids = select(Round.id).where(Round.game_id.in_(game_ids))
+    for model in (Message, Vote, SpeechCheckpoint):
+        db.query(model).filter(model.round_id.in_(round_ids)).delete(synchronize_session=False)
+    db.query(Elimination).filter(Elimination.game_id.in_(game_ids)).delete(synchronize_session=False)
+    db.query(Round).filter(Round.game_id.in_(game_ids)).delete(synchronize_session=False)
+
+
+def delete_games(db: Session, game_ids: List[int]) -> int:
+    """在一个事务中删除游戏及其全部子记录（按集合删除，每张表一条DELETE），返回删除的游戏数
+
+    表结构中的外键已声明ON DELETE CASCADE，但旧数据库的表在添加级联之前创建，这里显式删除子表（包括归档）。
+    """
+    if not game_ids:
+        return 0
+
+    try:
+        delete_round_data(db, game_ids)
+        db.query(ArchivedGame).filter(ArchivedGame.game_id.in_(game_ids)).delete(synchronize_session=False)
+        db.query(Participant).filter(Participant.game_id.in_(game_ids)).delete(synchronize_session=False)
+        deleted = db.query(Game).filter(Game.id.in_(game_ids)).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    except Exception:
+        db.rollback()
+        raise
+
+
+class GamePurger:
+    """按保留策略定期清理已结束的游戏
+
+    每隔GAME_PURGE_INTERVAL秒删除结束超过GAME_RETENTION_DAYS天的游戏，每批GAME_PURGE_BATCH_SIZE个
+    （每批一个事务，避免长时间占用写锁），清理后对SQLite执行增量VACUUM归还空闲页。
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def purge_once(self) -> int:
+        """执行一次清理，返回删除的游戏数"""
+        if settings.GAME_RETENTION_DAYS <= 0:
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(days=settings.GAME_RETENTION_DAYS)
+        total = 0
+        while True:
+            deleted = await run_in_db(self._purge_batch, cutoff)
+            total += deleted
+            if deleted < settings.GAME_PURGE_BATCH_SIZE:
+                break
+            # 批次之间让出数据库线程，游戏写入不必等待整个清理完成
+            await asyncio.sleep(0.1)
+
+        if total:
+            print(f"🧹 已清理 {total} 个结束超过 {settings.GAME_RETENTION_DAYS} 天的游戏")
+            await run_in_db(self._incremental_vacuum)
+        return total
+
+    @staticmethod
+    def _purge_batch(cutoff: datetime) -> int:
+        db = SessionLocal()
+        try:
+            game_ids = [row[0] for row in db.query(Game.id).filter(
+                Game.status == "finished",
+                func.coalesce(Game.end_time, Game.created_at) < cutoff
+            ).order_by(Game.id).limit(settings.GAME_PURGE_BATCH_SIZE).all()]
+            return delete_games(db, game_ids)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _incremental_vacuum():
+        """归还删除后的空闲页（需要auto_vacuum=INCREMENTAL，由数据库迁移设置）"""
+        if engine.dialect.name != "sqlite":
+            return
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(settings.GAME_PURGE_VACUUM_PAGES)})")
+            conn.commit()
+
+    async def start(self):
+        """启动定期清理任务"""
+        if settings.GAME_RETENTION_DAYS > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止定期清理任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.purge_once()
+            except Exception as e:
+                print(f"⚠️ 清理过期游戏失败: {e}")
+            await asyncio.sleep(settings.GAME_PURGE_INTERVAL)
+
+
+# 全局游戏清理任务
+game_purger = GamePurger()
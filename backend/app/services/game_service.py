@@ -5,14 +5,22 @@
 import json
 import random
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator
 from app.models.game import Game
 from app.models.participant import Participant
 from app.models.round_model import Round
 from app.models.message import Message
 from app.services.ollama_service import OllamaService
+from app.services.model_catalog import model_catalog
+from app.services.health_monitor import health_monitor
+from app.services.ollama_pool import ollama_hosts
+from app.services.game_orchestrator import game_orchestrator
+from app.services.message_writer import message_writer
+from app.services.game_purge import delete_games
+from app.services.game_archive import game_archiver
 from app.schemas.game_schemas import GameCreate, GameResponse, GameStatus, ParticipantInfo
 from app.core.utils import format_timestamp_with_timezone
+from app.core.database import run_in_db, run_in_db_read
 from app.models.vote import Vote
 from sqlalchemy import func, desc
 
@@ -62,12 +70,12 @@ class GameService:
     
     async def create_game(self, game_data: GameCreate) -> GameResponse:
         """创建新游戏并初始化参与者"""
-        # 首先检查Ollama服务是否可用
-        if not await self.ollama_service.check_health():
+        # 首先检查Ollama服务是否可用（使用健康监控缓存的状态）
+        if not any(health_monitor.is_healthy(host) for host in ollama_hosts.hosts):
             raise ValueError("Ollama服务不可用，请确保Ollama正在运行")
         
-        # 获取可用模型
-        all_models = await self.ollama_service.get_available_models()
+        # 获取可用模型（来自模型目录缓存）
+        all_models = await model_catalog.get_models()
         
         # 根据用户选择过滤模型
         if game_data.selected_models:
@@ -97,8 +105,8 @@ class GameService:
             settings=game_data.model_dump_json()
         )
         self.db.add(game)
-        self.db.commit()
-        self.db.refresh(game)
+        await run_in_db(self.db.commit)
+        await run_in_db(self.db.refresh, game)
         
         # 初始化参与者 - 使用所有选择的模型（最多15个以保证性能）
         max_participants = 15  # 设置合理的上限
@@ -134,53 +142,80 @@ class GameService:
             )
             self.db.add(participant)
         
-        self.db.commit()
+        await run_in_db(self.db.commit)
         print(f"已为游戏 {game_id} 初始化 {participant_count} 个AI参与者（每个都认为自己是唯一的间谍）")
     
     async def get_game(self, game_id: int) -> Optional[GameResponse]:
         """根据ID获取游戏信息"""
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db_read(self.db.query(Game).filter(Game.id == game_id).first)
         if game:
             return GameResponse.model_validate(game)
         return None
     
-    async def get_game_messages(self, game_id: int) -> List[dict]:
-        """获取游戏的历史聊天记录"""
+    async def _load_game_transcript(self, game_id: int) -> tuple:
+        """一次性加载游戏的轮次、全部消息和参与者映射（避免逐轮、逐条查询；已归档的游戏从归档读取）"""
         # 检查游戏是否存在
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db_read(self.db.query(Game).filter(Game.id == game_id).first)
         if not game:
             raise ValueError("游戏不存在")
         
+        # 已结束的游戏优先读取归档（一行压缩数据，无需查询消息表）
+        if getattr(game, 'status', '') == "finished":
+            archived = await game_archiver.load(game_id)
+            if archived:
+                return archived.transcript()
+        
+        # 等待写入队列中的消息提交，回放包含刚刚完成的发言
+        await message_writer.flush()
+        
         # 获取游戏的所有轮次
-        rounds = self.db.query(Round).filter(Round.game_id == game_id).order_by(Round.round_number).all()
+        rounds = await run_in_db_read(self.db.query(Round).filter(Round.game_id == game_id).order_by(Round.round_number).all)
+        
+        # 参与者映射：每个游戏只查询一次
+        participants = await run_in_db_read(self.db.query(Participant).filter(Participant.game_id == game_id).all)
+        participant_map = {getattr(p, 'id', 0): p for p in participants}
+        
+        # 获取所有轮次的消息（包括聊天、申辞、追加辩论、系统消息等），单次联表查询
+        # 系统消息使用负数序号，需要特殊排序：负数序号在前，然后是正数序号，最后是NULL
+        from sqlalchemy import case
+        messages = await run_in_db_read(self.db.query(Message).join(
+            Round, Round.id == Message.round_id
+        ).filter(
+            Round.game_id == game_id
+        ).order_by(
+            Round.round_number,
+            case(
+                (Message.sequence_number.is_(None), 999999),  # NULL排在最后
+                (Message.sequence_number < 0, Message.sequence_number),  # 负数按原值排序
+                else_=Message.sequence_number  # 正数按原值排序
+            ),
+            Message.timestamp
+        ).all)
+        
+        return rounds, messages, participant_map
+    
+    def _render_game_messages(self, rounds: List[Any], messages: List[Any], participant_map: Dict[int, Any]) -> Iterator[dict]:
+        """将预加载的消息逐条渲染为前端需要的格式"""
+        # 根据消息类型设置不同的显示标签
+        type_labels = {
+            "chat": "法庭辩论",
+            "final_defense": "最终申辞", 
+            "additional_debate": "追加辩论"
+        }
+        
+        messages_by_round: Dict[int, List[Any]] = {}
+        for msg in messages:
+            messages_by_round.setdefault(getattr(msg, 'round_id', 0), []).append(msg)
         
-        messages = []
         for round_obj in rounds:
-            round_topic = getattr(round_obj, 'topic', None)
             round_number = getattr(round_obj, 'round_number', 0)
-            round_start_time = getattr(round_obj, 'start_time', None)
             round_end_time = getattr(round_obj, 'end_time', None)
-            round_status = getattr(round_obj, 'status', '')
             eliminated_id = getattr(round_obj, 'eliminated_participant_id', None)
             
             # 不在历史消息中添加轮次开始消息，这应该由WebSocket的round_start事件处理
             # 避免与实时消息重复显示
             
-            # 获取该轮次的所有消息（包括聊天、申辞、追加辩论、系统消息等）
-            # 系统消息使用负数序号，需要特殊排序：负数序号在前，然后是正数序号，最后是NULL
-            from sqlalchemy import case, asc
-            round_messages = self.db.query(Message).filter(
-                Message.round_id == round_obj.id
-            ).order_by(
-                case(
-                    (Message.sequence_number.is_(None), 999999),  # NULL排在最后
-                    (Message.sequence_number < 0, Message.sequence_number),  # 负数按原值排序
-                    else_=Message.sequence_number  # 正数按原值排序
-                ),
-                Message.timestamp
-            ).all()
-            
-            for msg in round_messages:
+            for msg in messages_by_round.get(getattr(round_obj, 'id', 0), []):
                 msg_timestamp = getattr(msg, 'timestamp', None)
                 msg_sequence = getattr(msg, 'sequence_number', 0)
                 msg_type = getattr(msg, 'message_type', 'chat')
@@ -188,7 +223,7 @@ class GameService:
                 
                 if msg_type == "system":
                     # 系统消息，直接显示内容
-                    messages.append({
+                    yield {
                         "type": "system",
                         "participant_id": None,
                         "participant_name": None,
@@ -197,15 +232,14 @@ class GameService:
                         "sequence": msg_sequence,
                         "round_number": round_number,
                         "type_label": "系统消息"
-                    })
+                    }
                 elif msg_type == "voting_table":
                     # 投票结果表格，解析保存的JSON数据
                     try:
-                        import json
                         voting_data = json.loads(getattr(msg, 'content', '{}'))
                         # 获取保存的标题，如果没有则使用默认值
                         table_title = getattr(msg, 'title', None) or "投票结果"
-                        messages.append({
+                        yield {
                             "type": "voting_table",
                             "participant_id": None,
                             "participant_name": None,
@@ -215,12 +249,11 @@ class GameService:
                             "sequence": msg_sequence,
                             "round_number": round_number,
                             "title": table_title
-                        })
-                        print(f"📊 读取投票表格数据: {table_title}, {len(voting_data.get('candidates', []))} 个候选人")
+                        }
                     except (json.JSONDecodeError, Exception) as e:
                         print(f"❌ 解析投票表格数据失败: {e}")
                         # 如果解析失败，就显示为普通系统消息
-                        messages.append({
+                        yield {
                             "type": "system",
                             "participant_id": None,
                             "participant_name": None,
@@ -229,23 +262,14 @@ class GameService:
                             "sequence": msg_sequence,
                             "round_number": round_number,
                             "type_label": "投票结果"
-                        })
+                        }
                 else:
-                    # 参与者消息，需要查找参与者信息
-                    participant = self.db.query(Participant).filter(
-                        Participant.id == msg_participant_id
-                    ).first() if msg_participant_id else None
-                    
-                    # 根据消息类型设置不同的显示标签
-                    type_labels = {
-                        "chat": "法庭辩论",
-                        "final_defense": "最终申辞", 
-                        "additional_debate": "追加辩论"
-                    }
+                    # 参与者消息，从预加载的参与者映射中查找
+                    participant = participant_map.get(msg_participant_id) if msg_participant_id else None
                     
                     participant_name = f"{getattr(participant, 'human_name', '未知参与者')} ({getattr(participant, 'model_name', '未知模型')})" if participant else "未知参与者"
                     
-                    messages.append({
+                    yield {
                         "type": msg_type,
                         "participant_id": msg_participant_id,
                         "participant_name": participant_name,
@@ -254,132 +278,72 @@ class GameService:
                         "sequence": msg_sequence,
                         "round_number": round_number,
                         "type_label": type_labels.get(msg_type, msg_type)
-                    })
+                    }
             
-            # 处理投票结果 - 移到轮次消息循环外面，避免重复添加
-            # 投票阶段系统消息现在已通过chat_service保存到数据库，不需要手动添加
-            if round_status in ["voting", "finished"]:
-                # 添加投票详情（只显示最终投票结果）
-                # 优先显示追加投票，然后是最终投票，最后是初投票
-                votes = self.db.query(Vote).filter(
-                    Vote.round_id == round_obj.id,
-                    Vote.vote_phase == "additional_voting"
-                ).all()
-                
-                if not votes:
-                    votes = self.db.query(Vote).filter(
-                        Vote.round_id == round_obj.id,
-                        Vote.vote_phase == "final_voting"
-                    ).all()
-                
-                if not votes:
-                    votes = self.db.query(Vote).filter(
-                        Vote.round_id == round_obj.id,
-                        Vote.vote_phase == "initial_voting"
-                    ).all()
-                if votes:
-                    vote_summary = {}
-                    for vote in votes:
-                        voter = self.db.query(Participant).filter(Participant.id == vote.voter_id).first()
-                        target = self.db.query(Participant).filter(Participant.id == vote.target_id).first()
-                        
-                        if voter and target:
-                            voter_name = getattr(voter, 'human_name', '未知')
-                            target_name = getattr(target, 'human_name', '未知')
-                            reason = getattr(vote, 'reason', '无理由')
-                            
-                            if target_name not in vote_summary:
-                                vote_summary[target_name] = {'count': 0, 'voters': []}
-                            vote_summary[target_name]['count'] += 1
-                            vote_summary[target_name]['voters'].append(f"{voter_name}: {reason}")
-                    
-                    # 准备结构化的投票数据供前端生成表格
-                    voting_candidates = []
-                    for target_name, info in sorted(vote_summary.items(), key=lambda x: x[1]['count'], reverse=True):
-                        voters_list = []
-                        for voter_reason in info['voters']:
-                            # 分离投票者和理由
-                            if ": " in voter_reason:
-                                voter_name, reason = voter_reason.split(": ", 1)
-                                voters_list.append({
-                                    "voter_name": voter_name,
-                                    "reason": reason
-                                })
-                            else:
-                                voters_list.append({
-                                    "voter_name": "未知",
-                                    "reason": voter_reason
-                                })
-                        
-                        voting_candidates.append({
-                            "name": target_name,
-                            "vote_count": info['count'],
-                            "voters": voters_list
-                        })
-                    
-                    # 投票结果表格现在已通过chat_service保存到数据库，不需要手动添加
-                    # 这避免了与数据库中保存的voting_table消息重复
+            # 投票阶段系统消息和投票结果表格已通过chat_service保存到数据库，这里无需再查询投票记录
             
             # 如果有参与者被淘汰，添加淘汰消息
             if eliminated_id:
-                eliminated_participant = self.db.query(Participant).filter(
-                    Participant.id == eliminated_id
-                ).first()
+                eliminated_participant = participant_map.get(eliminated_id)
                 if eliminated_participant:
-                    remaining_count = self.db.query(Participant).filter(
-                        Participant.game_id == game_id,
-                        Participant.status == "active"
-                    ).count()
-                    
-                    messages.append({
+                    yield {
                         "type": "system",
                         "content": f"⚰️ 审判结果：{eliminated_participant.human_name} 被认定为AI间谍并被处决！",
                         "timestamp": format_timestamp_with_timezone(round_end_time),
                         "round_number": round_number
-                    })
+                    }
+    
+    async def get_game_messages(self, game_id: int) -> List[dict]:
+        """获取游戏的历史聊天记录"""
+        transcript = await self._load_game_transcript(game_id)
+        return list(self._render_game_messages(*transcript))
+    
+    async def stream_game_messages(self, game_id: int) -> Iterator[str]:
+        """获取游戏历史聊天记录的流式JSON编码（用于长游戏回放）
+        
+        数据在返回前一次性加载（游戏不存在时立即抛出异常），编码则逐条进行。
+        """
+        transcript = await self._load_game_transcript(game_id)
+        
+        def encode() -> Iterator[str]:
+            yield "["
+            for index, message in enumerate(self._render_game_messages(*transcript)):
+                yield ("," if index else "") + json.dumps(message, ensure_ascii=False)
+            yield "]"
         
-        return messages
+        return encode()
 
     async def delete_game(self, game_id: int):
         """删除游戏及其相关数据"""
         # 检查游戏是否存在
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         if not game:
             raise ValueError("游戏不存在")
         
-        # 删除游戏相关的所有数据（级联删除）
-        # 1. 删除消息
-        rounds = self.db.query(Round).filter(Round.game_id == game_id).all()
-        for round_obj in rounds:
-            self.db.query(Message).filter(Message.round_id == round_obj.id).delete()
-        
-        # 2. 删除轮次
-        self.db.query(Round).filter(Round.game_id == game_id).delete()
-        
-        # 3. 删除参与者
-        self.db.query(Participant).filter(Participant.game_id == game_id).delete()
-        
-        # 4. 删除游戏
-        self.db.query(Game).filter(Game.id == game_id).delete()
+        # 先停止仍在运行的游戏循环，并等待其已入队的消息写完
+        await game_orchestrator.cancel(game_id)
+        self._evict_game_state(game_id)
+        await message_writer.flush()
         
-        self.db.commit()
+        # 在一个事务中按集合删除游戏及其全部子记录（消息、投票、淘汰记录、轮次、参与者）
+        await run_in_db(delete_games, self.db, [game_id])
     
     async def start_game(self, game_id: int) -> dict:
         """开始游戏"""
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         if not game:
             raise ValueError("游戏不存在")
         
-        if getattr(game, 'status', '') != "preparing":
+        if getattr(game, 'status', '') != "preparing" or game_orchestrator.is_running(game_id):
             raise ValueError("游戏已经开始或已结束")
         
         # 检查参与者数量
-        participants = self.db.query(Participant).filter(Participant.game_id == game_id).all()
+        participants = await run_in_db(self.db.query(Participant).filter(Participant.game_id == game_id).all)
         if len(participants) < 2:
             raise ValueError("参与者数量不足")
         
-        self.db.query(Game).filter(Game.id == game_id).update({"status": "running"})
-        self.db.commit()
+        await run_in_db(self.db.query(Game).filter(Game.id == game_id).update, {"status": "running"})
+        await run_in_db(self.db.commit)
         
         # 启动AI对话（异步任务）
         import asyncio
@@ -394,7 +358,7 @@ class GameService:
             await asyncio.sleep(0.5)  # 短暂延迟，让前端有时间建立WebSocket连接
             await self._start_game_with_intro(game_id, chat_service, websocket_manager, len(participants))
         
-        asyncio.create_task(delayed_start())
+        game_orchestrator.launch(game_id, delayed_start())
         
         return {"status": "started", "participants": len(participants)}
     
@@ -410,20 +374,37 @@ class GameService:
     
     async def stop_game(self, game_id: int):
         """停止游戏"""
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         if not game:
             raise ValueError("游戏不存在")
         
-        self.db.query(Game).filter(Game.id == game_id).update({"status": "finished"})
-        self.db.commit()
+        await run_in_db(self.db.query(Game).filter(Game.id == game_id).update, {"status": "finished"})
+        await run_in_db(self.db.commit)
+        
+        # 立即取消游戏循环，不再等待其下次检查轮次状态
+        if await game_orchestrator.cancel(game_id):
+            print(f"⏹️ 游戏 {game_id} 已停止")
+        self._evict_game_state(game_id)
+    
+    def _evict_game_state(self, game_id: int):
+        """释放游戏在各内存缓存中的状态"""
+        from app.services.chat_history import chat_history_cache
+        from app.services.prompt_templates import prompt_builder
+        from app.services.generation_sessions import generation_sessions
+        from app.services.generation_scheduler import generation_scheduler
+        
+        chat_history_cache.evict_game(game_id)
+        prompt_builder.evict_game(game_id)
+        generation_sessions.evict_game(game_id)
+        generation_scheduler.forget_game(game_id)
     
     async def get_game_status(self, game_id: int) -> Optional[GameStatus]:
         """获取游戏状态"""
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db_read(self.db.query(Game).filter(Game.id == game_id).first)
         if not game:
             return None
         
-        participants = self.db.query(Participant).filter(Participant.game_id == game_id).all()
+        participants = await run_in_db_read(self.db.query(Participant).filter(Participant.game_id == game_id).all)
         
         participant_infos = []
         for p in participants:
@@ -448,7 +429,7 @@ class GameService:
     
     async def list_games(self, skip: int = 0, limit: int = 10) -> List[GameResponse]:
         """获取游戏列表"""
-        games = self.db.query(Game).offset(skip).limit(limit).all()
+        games = await run_in_db_read(self.db.query(Game).offset(skip).limit(limit).all)
         return [GameResponse.model_validate(game) for game in games]
     
     async def start_new_round(self, game_id: int):
@@ -466,7 +447,7 @@ class GameService:
         print("🔄 检查是否有需要恢复的游戏...")
         
         # 查找所有状态为"running"的游戏
-        interrupted_games = self.db.query(Game).filter(Game.status == "running").all()
+        interrupted_games = await run_in_db(self.db.query(Game).filter(Game.status == "running").all)
         
         if not interrupted_games:
             print("✅ 没有需要恢复的游戏")
@@ -485,30 +466,29 @@ class GameService:
     async def _resume_single_game(self, game_id: int):
         """恢复单个游戏"""
         # 检查游戏状态
-        game = self.db.query(Game).filter(Game.id == game_id).first()
+        game = await run_in_db(self.db.query(Game).filter(Game.id == game_id).first)
         if not game or getattr(game, 'status', '') != "running":
             return
         
         # 检查活跃参与者
-        active_participants = self.db.query(Participant).filter(
+        active_participants = await run_in_db(self.db.query(Participant).filter(
             Participant.game_id == game_id,
             Participant.status == "active"
-        ).all()
+        ).all)
         
         if len(active_participants) < 2:
             # 参与者不足，结束游戏
-            self.db.query(Game).filter(Game.id == game_id).update({"status": "finished"})
-            self.db.commit()
+            await run_in_db(self.db.query(Game).filter(Game.id == game_id).update, {"status": "finished"})
+            await run_in_db(self.db.commit)
             print(f"游戏 {game_id} 因参与者不足而结束")
             return
         
         # 检查当前轮次状态
-        current_round = self.db.query(Round).filter(
+        current_round = await run_in_db(self.db.query(Round).filter(
             Round.game_id == game_id
-        ).order_by(Round.round_number.desc()).first()
+        ).order_by(Round.round_number.desc()).first)
         
         # 导入必要的模块
-        import asyncio
         from app.services.chat_service import ChatService
         from app.api.websocket_routes import get_websocket_manager
         
@@ -518,7 +498,7 @@ class GameService:
         if not current_round:
             # 没有轮次，从第一轮开始
             print(f"游戏 {game_id} 从第1轮开始恢复")
-            asyncio.create_task(chat_service.start_chat_round(game_id, 1))
+            game_orchestrator.launch(game_id, chat_service.start_chat_round(game_id, 1))
         else:
             current_round_number = getattr(current_round, 'round_number', 1)
             current_round_status = getattr(current_round, 'status', '')
@@ -533,21 +513,21 @@ class GameService:
                 if existing_topic:
                     # 轮次已存在且有话题，恢复该轮次
                     print(f"游戏 {game_id} 从第{current_round_number}轮准备阶段恢复（已有话题: {existing_topic}）")
-                    asyncio.create_task(chat_service.resume_chat_round(round_id))
+                    game_orchestrator.launch(game_id, chat_service.resume_chat_round(round_id))
                 else:
                     # 轮次存在但没有话题，重新开始
                     print(f"游戏 {game_id} 从第{current_round_number}轮准备阶段重新开始")
-                    asyncio.create_task(chat_service.start_chat_round(game_id, current_round_number))
+                    game_orchestrator.launch(game_id, chat_service.start_chat_round(game_id, current_round_number))
                 
             elif current_phase == "chatting":
                 # 对话阶段，继续当前轮次对话
                 print(f"游戏 {game_id} 继续第{current_round_number}轮对话阶段")
-                asyncio.create_task(chat_service.resume_chat_round(round_id))
+                game_orchestrator.launch(game_id, chat_service.resume_chat_round(round_id))
                 
             elif current_phase == "initial_voting":
                 # 初投票阶段，重新开始投票流程
                 print(f"游戏 {game_id} 从第{current_round_number}轮初投票阶段恢复")
-                asyncio.create_task(chat_service._simulate_ai_voting(round_id, is_resume=True))
+                game_orchestrator.launch(game_id, chat_service._simulate_ai_voting(round_id, is_resume=True))
                 
             elif current_phase == "final_defense":
                 # 最终申辞阶段，需要重新获取得票最多的候选人并继续申辞
@@ -555,41 +535,41 @@ class GameService:
                 # 获取最新的投票结果来确定候选人
                 top_candidates = await self._get_top_candidates_from_votes(round_id)
                 if top_candidates:
-                    asyncio.create_task(chat_service._start_final_defense(round_id, top_candidates, is_resume=True))
+                    game_orchestrator.launch(game_id, chat_service._start_final_defense(round_id, top_candidates, is_resume=True))
                 else:
                     # 无法获取候选人信息，重新开始投票
-                    asyncio.create_task(chat_service._simulate_ai_voting(round_id, is_resume=True))
+                    game_orchestrator.launch(game_id, chat_service._simulate_ai_voting(round_id, is_resume=True))
                     
             elif current_phase == "final_voting":
                 # 最终投票阶段，重新开始最终投票
                 print(f"游戏 {game_id} 从第{current_round_number}轮最终投票阶段恢复")
-                asyncio.create_task(chat_service._start_final_voting(round_id))
+                game_orchestrator.launch(game_id, chat_service._start_final_voting(round_id))
                 
             elif current_phase == "additional_debate":
                 # 追加辩论阶段，需要获取平票的候选人并继续辩论
                 print(f"游戏 {game_id} 从第{current_round_number}轮追加辩论阶段恢复")
                 tied_candidates = await self._get_tied_candidates_from_votes(round_id)
                 if tied_candidates:
-                    asyncio.create_task(chat_service._start_additional_debate(round_id, tied_candidates, is_resume=True))
+                    game_orchestrator.launch(game_id, chat_service._start_additional_debate(round_id, tied_candidates, is_resume=True))
                 else:
                     # 无法获取平票候选人，重新开始最终投票
-                    asyncio.create_task(chat_service._start_final_voting(round_id))
+                    game_orchestrator.launch(game_id, chat_service._start_final_voting(round_id))
                     
             elif current_phase == "additional_voting":
                 # 追加投票阶段，重新开始追加投票
                 print(f"游戏 {game_id} 从第{current_round_number}轮追加投票阶段恢复")
-                asyncio.create_task(chat_service._conduct_additional_voting(round_id))
+                game_orchestrator.launch(game_id, chat_service._conduct_additional_voting(round_id))
                 
             elif current_phase == "finished" or current_round_status == "finished":
                 # 当前轮次已结束，开始下一轮
                 next_round = current_round_number + 1
                 print(f"游戏 {game_id} 开始第{next_round}轮")
-                asyncio.create_task(chat_service.start_chat_round(game_id, next_round))
+                game_orchestrator.launch(game_id, chat_service.start_chat_round(game_id, next_round))
                 
             else:
                 # 未知状态，从当前轮次重新开始
                 print(f"游戏 {game_id} 未知状态({current_phase})，重新开始第{current_round_number}轮")
-                asyncio.create_task(chat_service.start_chat_round(game_id, current_round_number))
+                game_orchestrator.launch(game_id, chat_service.start_chat_round(game_id, current_round_number))
     
     async def _get_top_candidates_from_votes(self, round_id: int) -> List[dict]:
         """从投票记录中获取得票最多的候选人"""
@@ -598,22 +578,22 @@ class GameService:
             from app.models.participant import Participant
             
             # 获取本轮次最新阶段的投票（优先获取最近的投票阶段）
-            votes = self.db.query(Vote).filter(
+            votes = await run_in_db(self.db.query(Vote).filter(
                 Vote.round_id == round_id,
                 Vote.vote_phase == "additional_voting"
-            ).all()
+            ).all)
             
             if not votes:
-                votes = self.db.query(Vote).filter(
+                votes = await run_in_db(self.db.query(Vote).filter(
                     Vote.round_id == round_id,
                     Vote.vote_phase == "final_voting"
-                ).all()
+                ).all)
             
             if not votes:
-                votes = self.db.query(Vote).filter(
+                votes = await run_in_db(self.db.query(Vote).filter(
                     Vote.round_id == round_id,
                     Vote.vote_phase == "initial_voting"
-                ).all()
+                ).all)
             
             if not votes:
                 return []
@@ -622,7 +602,7 @@ class GameService:
             vote_counts = {}
             for vote in votes:
                 # 通过target_id获取参与者信息
-                target = self.db.query(Participant).filter(Participant.id == vote.target_id).first()
+                target = await run_in_db(self.db.query(Participant).filter(Participant.id == vote.target_id).first)
                 if target:
                     target_name = getattr(target, 'human_name', '未知')
                     target_id = getattr(target, 'id', 0)
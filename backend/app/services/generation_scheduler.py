@@ -0,0 +1,164 @@
+"""
+模型生成调度器
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+
+
+class _Waiter:
+    """排队等待生成槽位的请求"""
+
+    def __init__(self, game_id: int, model: str, backend: str):
+        self.game_id = game_id
+        self.model = model
+        self.backend = backend
+        self.enqueued_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class GenerationScheduler:
+    """按后端和模型限制并发的生成调度器（跨游戏共享）
+
+    每个后端、每个模型都有并发上限；有空闲槽位时优先放行模型已驻留在内存中的请求
+    （根据Ollama /api/ps和正在运行的生成判断），同等条件下优先放行最近最少被服务的游戏。
+    等待时间超过阈值的请求不再让位于驻留模型，避免饥饿。
+    """
+
+    def __init__(self):
+        self._running_backends: Dict[str, int] = {}
+        self._running_models: Dict[Tuple[str, str], int] = {}
+        self._waiters: List[_Waiter] = []
+        # game_id -> 最近一次获得槽位的时间
+        self._last_served: Dict[int, float] = {}
+        # 后端 -> 已加载的模型
+        self._resident: Dict[str, Set[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # 最近一次刷新失败的主机
+        self._refresh_failed: Set[str] = set()
+
+    def _backend_limit(self, backend: str) -> int:
+        if backend.startswith("external:"):
+            return settings.SCHEDULER_EXTERNAL_CONCURRENCY
+        return settings.SCHEDULER_BACKEND_CONCURRENCY
+
+    def _can_run(self, waiter: _Waiter) -> bool:
+        if self._running_backends.get(waiter.backend, 0) >= self._backend_limit(waiter.backend):
+            return False
+        return self._running_models.get((waiter.backend, waiter.model), 0) < settings.SCHEDULER_MODEL_CONCURRENCY
+
+    def is_resident(self, backend: str, model: str) -> bool:
+        """模型是否已加载（外部模型总是视为已加载）"""
+        if backend.startswith("external:") or self._running_models.get((backend, model), 0) > 0:
+            return True
+        resident = self._resident.get(backend, set())
+        return model in resident or f"{model}:latest" in resident
+
+    def _priority(self, waiter: _Waiter, now: float) -> tuple:
+        waited_long = now - waiter.enqueued_at >= settings.SCHEDULER_RESIDENCY_MAX_WAIT
+        cold = not waited_long and not self.is_resident(waiter.backend, waiter.model)
+        return (cold, self._last_served.get(waiter.game_id, 0.0), waiter.enqueued_at)
+
+    def _dispatch(self):
+        """把空闲槽位分配给优先级最高的可运行请求"""
+        while True:
+            now = time.monotonic()
+            runnable = [w for w in self._waiters if not w.future.done() and self._can_run(w)]
+            if not runnable:
+                break
+            waiter = min(runnable, key=lambda w: self._priority(w, now))
+            self._waiters.remove(waiter)
+            self._grant(waiter.game_id, waiter.model, waiter.backend)
+            waiter.future.set_result(None)
+        self._waiters = [w for w in self._waiters if not w.future.done()]
+
+    def _grant(self, game_id: int, model: str, backend: str):
+        self._running_backends[backend] = self._running_backends.get(backend, 0) + 1
+        self._running_models[(backend, model)] = self._running_models.get((backend, model), 0) + 1
+        self._last_served[game_id] = time.monotonic()
+
+    def _release(self, model: str, backend: str):
+        self._running_backends[backend] = max(0, self._running_backends.get(backend, 0) - 1)
+        key = (backend, model)
+        self._running_models[key] = max(0, self._running_models.get(key, 0) - 1)
+        if not self._running_models[key]:
+            del self._running_models[key]
+        self._dispatch()
+
+    async def acquire(self, model: str, backend: str, game_id: Optional[int] = None):
+        """等待生成槽位"""
+        waiter = _Waiter(game_id or 0, model, backend)
+        self._waiters.append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # 已分配槽位但调用方被取消，归还槽位
+                self._release(model, backend)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, model: str, backend: str, game_id: Optional[int] = None):
+        """占用一个生成槽位"""
+        await self.acquire(model, backend, game_id)
+        try:
+            yield
+        finally:
+            self._release(model, backend)
+
+    def forget_game(self, game_id: int):
+        """游戏结束后清理公平性记录"""
+        self._last_served.pop(game_id, None)
+
+    def snapshot(self) -> dict:
+        """调度器状态快照"""
+        return {
+            "running_backends": dict(self._running_backends),
+            "running_models": {f"{backend}|{model}": count for (backend, model), count in self._running_models.items()},
+            "waiting": len(self._waiters),
+            "resident_models": {backend: sorted(models) for backend, models in self._resident.items()}
+        }
+
+    async def start(self):
+        """启动已加载模型的后台刷新任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台刷新任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """定期通过/api/ps刷新每个Ollama主机已加载的模型"""
+        from app.services.ollama_service import OllamaService
+        from app.services.ollama_pool import ollama_hosts
+
+        ollama_service = OllamaService()
+        while True:
+            for host in ollama_hosts.hosts:
+                try:
+                    self._resident[host] = set(await ollama_service.get_loaded_models(host))
+                    self._refresh_failed.discard(host)
+                except Exception as e:
+                    # 刷新失败时保留上次的结果，连续失败只记录一次
+                    if host not in self._refresh_failed:
+                        print(f"⚠️ 获取已加载模型失败 ({host}): {e}")
+                    self._refresh_failed.add(host)
+            self._dispatch()
+            await asyncio.sleep(settings.SCHEDULER_RESIDENCY_REFRESH)
+
+
+# 全局生成调度器
+generation_scheduler = GenerationScheduler()
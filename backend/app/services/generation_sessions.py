@@ -0,0 +1,101 @@
+"""
+Ollama生成会话缓存（KV上下文复用）
+"""
+
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+
+
+class GenerationSession:
+    """单个参与者在一个轮次中的Ollama会话"""
+
+    def __init__(self, round_id: int, model: str):
+        self.round_id = round_id
+        self.model = model
+        # /api/generate返回的context（已评估的token），下次请求传回即可只评估新增部分
+        self.context: Optional[List[int]] = None
+        # 上次请求时对话历史窗口的位置，用于计算新增发言
+        self.history_mark = 0
+
+
+class PromptEvalStats:
+    """提示词评估耗时统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_eval_count = 0
+        self.prompt_eval_duration = 0
+
+    def add(self, count: Optional[int], duration: Optional[int]):
+        self.requests += 1
+        self.prompt_eval_count += count or 0
+        self.prompt_eval_duration += duration or 0
+
+    def to_dict(self) -> dict:
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "prompt_eval_count": self.prompt_eval_count,
+            "prompt_eval_duration_ms": round(self.prompt_eval_duration / 1e6, 1),
+            "avg_prompt_eval_count": round(self.prompt_eval_count / requests, 1),
+            "avg_prompt_eval_duration_ms": round(self.prompt_eval_duration / 1e6 / requests, 1)
+        }
+
+
+class GenerationSessionCache:
+    """按参与者保存Ollama返回的context
+
+    同一轮次内参与者再次发言时只发送新增的辩论记录并传回context，
+    Ollama无需重新评估完整的游戏背景提示词。同时统计复用与完整请求的提示词评估开销。
+    """
+
+    def __init__(self):
+        # (game_id, participant_id) -> 会话
+        self._sessions: Dict[Tuple[int, int], GenerationSession] = {}
+        self._stats = {"full": PromptEvalStats(), "reused": PromptEvalStats()}
+
+    def get(self, game_id: int, participant_id: int, round_id: int, model: str) -> GenerationSession:
+        """获取参与者的会话；轮次或模型变化时重新开始"""
+        key = (game_id, participant_id)
+        session = self._sessions.get(key)
+        if session is None or session.round_id != round_id or session.model != model:
+            session = GenerationSession(round_id, model)
+            self._sessions[key] = session
+        return session
+
+    def can_reuse(self, session: GenerationSession) -> bool:
+        """会话是否有可复用的context（过长时放弃复用，避免超出模型上下文窗口）"""
+        return (
+            settings.OLLAMA_CONTEXT_REUSE
+            and session.context is not None
+            and len(session.context) < settings.OLLAMA_CONTEXT_MAX_TOKENS
+        )
+
+    def record(self, session: GenerationSession, data: dict, reused: bool):
+        """保存生成完成时返回的context和评估统计"""
+        session.context = data.get("context") or None
+        self._stats["reused" if reused else "full"].add(
+            data.get("prompt_eval_count"), data.get("prompt_eval_duration")
+        )
+
+    def invalidate(self, session: GenerationSession):
+        """生成失败时丢弃context，下次使用完整提示词"""
+        session.context = None
+
+    def metrics(self) -> dict:
+        """复用与完整请求的提示词评估开销对比"""
+        return {
+            "enabled": settings.OLLAMA_CONTEXT_REUSE,
+            "active_sessions": len(self._sessions),
+            "full_prompt": self._stats["full"].to_dict(),
+            "context_reuse": self._stats["reused"].to_dict()
+        }
+
+    def evict_game(self, game_id: int):
+        """游戏结束后释放该游戏的全部会话"""
+        for key in [k for k in self._sessions if k[0] == game_id]:
+            del self._sessions[key]
+
+
+# 全局生成会话缓存（跨ChatService实例共享）
+generation_sessions = GenerationSessionCache()
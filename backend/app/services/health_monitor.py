@@ -0,0 +1,187 @@
+"""
+模型后端健康监控服务（带断路器）
+"""
+
+import asyncio
+import time
+import httpx
+from typing import Dict, Optional
+from app.core.config import settings
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """判断异常是否说明后端本身故障：只有传输错误、超时和5xx响应计入失败，
+    4xx（参数错误、鉴权失败、模型不存在等）说明后端可达，不计入"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        if isinstance(error, (httpx.TransportError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+            return True
+        # 外部模型服务会把原始异常包装后重新抛出，沿异常链查找
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class CircuitState:
+    """断路器状态"""
+    CLOSED = "closed"          # 正常，允许请求
+    OPEN = "open"              # 连续失败，快速拒绝请求
+    HALF_OPEN = "half_open"    # 冷却结束，只放行一个试探请求
+
+
+class BackendHealth:
+    """单个后端的缓存健康状态"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        # 半开状态下进行中的试探请求的开始时间
+        self.probe_started_at: Optional[float] = None
+        self.last_checked: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "backend": self.key,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_checked": self.last_checked,
+            "last_error": self.last_error
+        }
+
+
+class HealthMonitor:
+    """后台健康监控器：缓存每个后端（本地Ollama、各外部模型）的健康状态"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, check_interval: float, probe_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # 试探请求超过该时间仍未报告结果（如被取消）时，允许发起新的试探
+        self.probe_timeout = probe_timeout
+        self.check_interval = check_interval
+        self._backends: Dict[str, BackendHealth] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _get(self, key: str) -> BackendHealth:
+        health = self._backends.get(key)
+        if health is None:
+            health = BackendHealth(key)
+            self._backends[key] = health
+        return health
+
+    def is_available(self, key: str) -> bool:
+        """判断现在发起请求是否会被放行（只查询，不占用半开状态的试探名额）"""
+        health = self._get(key)
+        now = time.monotonic()
+        if health.state == CircuitState.OPEN:
+            return now - health.opened_at >= self.reset_timeout
+        if health.state == CircuitState.HALF_OPEN:
+            return not self._probe_in_flight(health, now)
+        return True
+
+    def allow_request(self, key: str) -> bool:
+        """在发起请求前调用：断路器打开时快速失败，半开状态只放行一个试探请求，
+        其他请求在试探结果（record_success/record_failure）返回前被拒绝"""
+        health = self._get(key)
+        now = time.monotonic()
+        if health.state == CircuitState.CLOSED:
+            return True
+        if health.state == CircuitState.OPEN:
+            if now - health.opened_at < self.reset_timeout:
+                return False
+            # 冷却时间已过，进入半开状态
+            health.state = CircuitState.HALF_OPEN
+            health.probe_started_at = None
+            print(f"🔌 后端 {key} 断路器进入半开状态，允许一个试探请求")
+        if self._probe_in_flight(health, now):
+            return False
+        health.probe_started_at = now
+        return True
+
+    def _probe_in_flight(self, health: BackendHealth, now: float) -> bool:
+        return health.probe_started_at is not None and now - health.probe_started_at < self.probe_timeout
+
+    def record_success(self, key: str):
+        """记录一次成功调用"""
+        health = self._get(key)
+        if health.state != CircuitState.CLOSED:
+            print(f"✅ 后端 {key} 已恢复，断路器关闭")
+        health.state = CircuitState.CLOSED
+        health.probe_started_at = None
+        health.consecutive_failures = 0
+        health.last_error = None
+        health.last_checked = time.time()
+
+    def record_failure(self, key: str, error: Optional[str] = None):
+        """记录一次失败调用，连续失败达到阈值时打开断路器"""
+        health = self._get(key)
+        health.consecutive_failures += 1
+        health.last_error = error
+        health.last_checked = time.time()
+
+        if health.state == CircuitState.HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+            if health.state != CircuitState.OPEN:
+                print(f"⛔ 后端 {key} 连续失败 {health.consecutive_failures} 次，断路器打开")
+            health.state = CircuitState.OPEN
+            health.opened_at = time.monotonic()
+            health.probe_started_at = None
+
+    def record_error(self, key: str, error: BaseException):
+        """根据异常类型记录调用结果：后端故障计入失败，
+        其他错误（如4xx）说明后端可达，按成功处理以释放半开状态的试探名额"""
+        if is_backend_failure(error):
+            self.record_failure(key, str(error))
+        else:
+            self.record_success(key)
+
+    def is_healthy(self, key: str) -> bool:
+        """查询缓存的健康状态（不发起网络请求）"""
+        return self._get(key).state != CircuitState.OPEN
+
+    def snapshot(self) -> Dict[str, dict]:
+        """所有后端的健康状态快照"""
+        return {key: health.to_dict() for key, health in self._backends.items()}
+
+    async def start(self):
+        """启动后台探测任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台探测任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """定期探测本地Ollama主机和已启用的外部模型"""
+        from app.services.ollama_service import OllamaService
+
+        ollama_service = OllamaService()
+        while True:
+            try:
+                # 探测结果由check_health/check_external_health写回监控器
+                await asyncio.gather(
+                    ollama_service.check_health(),
+                    ollama_service.check_external_health()
+                )
+            except Exception as e:
+                print(f"⚠️ 健康探测出错: {e}")
+            await asyncio.sleep(self.check_interval)
+
+
+# 全局健康监控器
+health_monitor = HealthMonitor(
+    failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.CIRCUIT_RESET_TIMEOUT,
+    check_interval=settings.HEALTH_CHECK_INTERVAL,
+    probe_timeout=settings.OLLAMA_TIMEOUT
+)
@@ -0,0 +1,242 @@
+"""
+消息与投票的写后持久化队列
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal, run_in_db
+from app.models.message import Message
+from app.models.vote import Vote
+from app.models.round_model import Round
+
+
+class MessageWriter:
+    """Message/Vote行的写后（write-behind）队列，合并提交（group commit）
+
+    调用方入队时立即得到带有序号和时间戳的消息，不等待数据库（id在提交时由数据库分配，
+    多进程部署时不会冲突）；单个写入任务每隔
+    MESSAGE_WRITER_INTERVAL_MS把队列中积累的全部行合并到一个事务中提交，所有并发游戏共享一次fsync。
+    阶段切换、读取历史等需要看到已入队数据的地方先调用flush()；关闭服务时close()写完剩余队列。
+    整批提交失败时逐条提交并重试，重试后仍失败的操作不计为已提交，由下一次flush()抛出异常报告给调用方。
+    """
+
+    def __init__(self, interval_ms: int, max_batch: int, retries: int):
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.retries = retries
+        # 待写入的操作：("insert", 模型, 字段) 或 ("call", 函数, None)
+        self._queue: List[Tuple[str, Any, Any]] = []
+        self._enqueued = 0
+        # 已处理（提交成功或重试后仍失败）的操作数
+        self._processed = 0
+        # 尚未报告给flush()调用方的写入失败：(操作位置, 错误)
+        self._failures: List[Tuple[int, Exception]] = []
+        # (需要提交到的位置, future)
+        self._waiters: List[Tuple[int, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_requested = False
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"batches": 0, "rows": 0, "failed_rows": 0}
+
+    async def add_message(self, **fields) -> Message:
+        """入队一条消息，返回带有时间戳的Message对象（未绑定会话，id在提交时由数据库分配）"""
+        row = dict(fields)
+        row.setdefault("timestamp", datetime.utcnow())
+        self._enqueue(("insert", Message, row))
+        return Message(**row)
+
+    def insert(self, model: Any, row: Dict[str, Any]):
+        """入队插入一行（不需要立即得到id的记录，如发言检查点）"""
+        self._enqueue(("insert", model, row))
+
+    def execute(self, operation: Callable[[Session], None]):
+        """入队一个在写入事务中执行的操作（如删除）"""
+        self._enqueue(("call", operation, None))
+
+    def replace_votes(self, round_id: int, vote_phase: str, vote_rows: List[Dict[str, Any]]):
+        """入队：清理该阶段的现有投票记录（确保重新投票时不累计）并写入新投票"""
+        def replace(session):
+            removed = session.query(Vote).filter(
+                Vote.round_id == round_id,
+                Vote.vote_phase == vote_phase
+            ).delete(synchronize_session=False)
+            session.bulk_insert_mappings(Vote, vote_rows)
+            if removed:
+                print(f"清理轮次 {round_id} 阶段 {vote_phase} 的 {removed} 条现有投票记录")
+
+        self.execute(replace)
+
+    async def flush(self):
+        """等待此前入队的全部操作提交到数据库；有操作重试后仍未写入时抛出RuntimeError"""
+        target = self._enqueued
+        if self._processed >= target:
+            errors = self._failures_before(target)
+            if errors:
+                self._failures = [(index, error) for index, error in self._failures if index >= target]
+                raise self._write_error(errors)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((target, future))
+        self._flush_requested = True
+        self._ensure_started()
+        self._wakeup.set()
+        await future
+
+    def snapshot(self) -> dict:
+        """写入队列状态"""
+        return {
+            "pending": len(self._queue),
+            "processed": self._processed,
+            **self._stats
+        }
+
+    def _enqueue(self, op: Tuple[str, Any, Any]):
+        self._queue.append(op)
+        self._enqueued += 1
+        self._ensure_started()
+        if len(self._queue) >= self.max_batch:
+            self._flush_requested = True
+        self._wakeup.set()
+
+    def _ensure_started(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """写入任务：被唤醒后等待一个合并窗口，再把积累的操作一次提交"""
+        while True:
+            await self._wakeup.wait()
+            if not self._flush_requested:
+                await asyncio.sleep(self.interval)
+            self._wakeup.clear()
+            self._flush_requested = False
+            await self._write_pending()
+
+    async def _write_pending(self):
+        while self._queue:
+            ops, self._queue = self._queue, []
+            start = self._processed
+            committed = len(ops)
+            try:
+                await run_in_db(self._commit, ops)
+            except Exception as e:
+                # 整批失败时逐个提交，出错的操作单独重试，不影响同批的其他操作
+                print(f"⚠️ 批量写入失败，改为逐条写入: {e}")
+                for offset, op in enumerate(ops):
+                    error = await self._commit_with_retry(op)
+                    if error is not None:
+                        committed -= 1
+                        self._failures.append((start + offset, error))
+            self._processed += len(ops)
+            self._stats["batches"] += 1
+            self._stats["rows"] += committed
+            self._stats["failed_rows"] += len(ops) - committed
+            self._release_waiters()
+
+    async def _commit_with_retry(self, op: Tuple[str, Any, Any]) -> Optional[Exception]:
+        """单独提交一个操作，失败时（如数据库暂时被锁）重试，重试后仍失败时返回错误"""
+        error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            try:
+                await run_in_db(self._commit, [op])
+                return None
+            except Exception as e:
+                error = e
+                if attempt < self.retries:
+                    await asyncio.sleep(0.1 * (attempt + 1))
+        print(f"❌ 写入失败（已重试 {self.retries} 次）: {error}")
+        return error
+
+    def _failures_before(self, target: int) -> List[Exception]:
+        return [error for index, error in self._failures if index < target]
+
+    @staticmethod
+    def _write_error(errors: List[Exception]) -> RuntimeError:
+        return RuntimeError(f"{len(errors)} 条记录写入数据库失败: {errors[0]}")
+
+    def _release_waiters(self):
+        remaining = []
+        released = 0
+        for target, future in self._waiters:
+            if self._processed >= target:
+                released = max(released, target)
+                if not future.done():
+                    errors = self._failures_before(target)
+                    if errors:
+                        future.set_exception(self._write_error(errors))
+                    else:
+                        future.set_result(None)
+            else:
+                remaining.append((target, future))
+        self._waiters = remaining
+        # 已报告给等待者的失败不再重复报告
+        if released:
+            self._failures = [(index, error) for index, error in self._failures if index >= released]
+
+    @staticmethod
+    def _commit(ops: List[Tuple[str, Any, Any]]):
+        """在数据库线程中执行一批操作并提交一次（相邻的同类插入合并为一次批量插入）
+
+        同一事务中把每个轮次的rounds.next_sequence推进到本批消息的最大序号之后（每轮次一条UPDATE），
+        序号计数器与消息一起提交。
+        """
+        session = SessionLocal()
+        try:
+            batch_model = None
+            batch_rows: List[dict] = []
+            next_sequences: Dict[int, int] = {}
+            for kind, target, payload in ops:
+                if kind == "insert" and target is Message and payload.get("sequence_number") is not None:
+                    round_id = payload["round_id"]
+                    next_sequences[round_id] = max(next_sequences.get(round_id, 0), payload["sequence_number"] + 1)
+                if kind == "insert" and target is batch_model:
+                    batch_rows.append(payload)
+                    continue
+                if batch_rows:
+                    session.bulk_insert_mappings(batch_model, batch_rows)
+                batch_model, batch_rows = (target, [payload]) if kind == "insert" else (None, [])
+                if kind == "call":
+                    target(session)
+            if batch_rows:
+                session.bulk_insert_mappings(batch_model, batch_rows)
+            for round_id, next_sequence in next_sequences.items():
+                session.query(Round).filter(
+                    Round.id == round_id,
+                    or_(Round.next_sequence.is_(None), Round.next_sequence < next_sequence)
+                ).update({"next_sequence": next_sequence}, synchronize_session=False)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    async def close(self):
+        """关闭服务时写完队列中剩余的操作"""
+        if self._queue:
+            print(f"💾 写入剩余的 {len(self._queue)} 条记录...")
+        try:
+            await self.flush()
+        except RuntimeError as e:
+            print(f"❌ 关闭时部分记录未能写入: {e}")
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局消息写入队列
+message_writer = MessageWriter(
+    interval_ms=settings.MESSAGE_WRITER_INTERVAL_MS,
+    max_batch=settings.MESSAGE_WRITER_MAX_BATCH,
+    retries=settings.MESSAGE_WRITER_RETRIES
+)
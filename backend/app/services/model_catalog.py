@@ -0,0 +1,88 @@
+"""
+模型目录缓存服务
+"""
+
+import asyncio
+import time
+from typing import List, Optional
+from app.core.config import settings
+from app.schemas.ollama_schemas import ModelInfo
+
+
+class ModelCatalog:
+    """可用模型列表（本地Ollama + 外部模型）的TTL缓存
+
+    后台任务定期刷新，外部模型增删改时立即失效；创建游戏和模型选择页面直接读取内存中的列表。
+    """
+
+    def __init__(self, ttl: float, refresh_interval: float):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._models: Optional[List[ModelInfo]] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._models is not None
+            and self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    async def get_models(self, force_refresh: bool = False) -> List[ModelInfo]:
+        """获取可用模型列表（缓存过期或失效时重新加载）"""
+        if not force_refresh and self._is_fresh():
+            return list(self._models)
+
+        async with self._lock:
+            # 等待锁期间可能已被其他请求刷新
+            if force_refresh or not self._is_fresh():
+                await self.refresh()
+        return list(self._models or [])
+
+    async def refresh(self):
+        """从Ollama和数据库重新加载模型列表"""
+        from app.services.ollama_service import OllamaService
+
+        models = await OllamaService().get_available_models()
+
+        self._models = models
+        # 空列表通常意味着后端暂时不可用，不缓存，下次请求时重试
+        self._loaded_at = time.monotonic() if models else None
+
+    def invalidate(self):
+        """使缓存失效（外部模型增删改时调用）"""
+        self._loaded_at = None
+
+    async def start(self):
+        """启动后台刷新任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台刷新任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """定期刷新，使请求总是读到内存中的列表"""
+        while True:
+            try:
+                async with self._lock:
+                    await self.refresh()
+            except Exception as e:
+                print(f"⚠️ 刷新模型目录失败: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+
+# 全局模型目录
+model_catalog = ModelCatalog(
+    ttl=settings.MODEL_CATALOG_TTL,
+    refresh_interval=settings.MODEL_CATALOG_REFRESH_INTERVAL
+)
@@ -0,0 +1,154 @@
+"""
+模型投票服务 - 由参与者的模型根据辩论记录做出结构化投票
+"""
+
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+# 每个模型后端的投票并发限制（跨ChatService实例共享）
+_vote_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def vote_semaphore(backend_key: str) -> asyncio.Semaphore:
+    """获取后端的投票并发信号量"""
+    semaphore = _vote_semaphores.get(backend_key)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.VOTE_BACKEND_CONCURRENCY)
+        _vote_semaphores[backend_key] = semaphore
+    return semaphore
+
+
+class ModelVoter:
+    """模型投票器
+
+    每轮投票只构建一次辩论记录和提示词前缀，所有投票者共享；
+    使用同一本地模型的投票者合并成一次JSON模式请求，输出不合法时在重试预算内只重试缺失的投票者。
+    """
+
+    def __init__(self, ollama_service):
+        self.ollama_service = ollama_service
+        self.max_retries = settings.VOTE_MAX_RETRIES
+        self.batch_size = max(1, settings.VOTE_BATCH_SIZE)
+
+    def build_prefix(self, participants: List[Any], transcript: str, vote_phase: str) -> str:
+        """构建所有投票者共享的提示词前缀"""
+        candidates = "\n".join(
+            f"- 编号{getattr(p, 'id', 0)}：{getattr(p, 'human_name', '未知')}" for p in participants
+        )
+        return f"""现在是2050年，人类法庭正在审判混入幸存者中的AI间谍。法庭辩论已经结束，进入{vote_phase}阶段。
+
+所有候选人：
+{candidates}
+
+辩论记录：
+{transcript or "（暂无发言）"}
+
+每位投票者必须根据辩论记录投票给最可疑的一位候选人，不能投给自己，并给出一句不超过50字的理由。
+"""
+
+    def _voter_prompt(self, prefix: str, voters: List[Any]) -> str:
+        """在共享前缀后追加本次请求的投票者信息和输出格式"""
+        voter_lines = "\n".join(
+            f"- 编号{getattr(v, 'id', 0)}：{getattr(v, 'human_name', '未知')}，性格：{getattr(v, 'personality', '') or '未知'}"
+            for v in voters
+        )
+        return f"""{prefix}
+请分别以下列投票者的身份投票：
+{voter_lines}
+
+只输出JSON，不要输出其他内容，格式：
+{{"votes": [{{"voter_id": 投票者编号, "target_id": 被投票者编号, "reason": "投票理由"}}]}}
+"""
+
+    def parse_votes(self, raw: str, voters: List[Any], participants_by_id: Dict[int, Any]) -> Dict[int, Tuple[Any, str]]:
+        """解析并校验模型输出，返回 {voter_id: (目标参与者, 理由)}，不合法的条目被忽略"""
+        text = re.sub(r'<think>.*?</think>', '', raw or '', flags=re.DOTALL | re.IGNORECASE)
+        start, end = text.find('{'), text.rfind('}')
+        if start == -1 or end <= start:
+            return {}
+        try:
+            data = json.loads(text[start:end + 1])
+        except ValueError:
+            return {}
+
+        entries = data.get("votes") if isinstance(data, dict) else None
+        if entries is None and isinstance(data, dict) and len(voters) == 1:
+            # 单个投票者时允许直接返回一个投票对象
+            entries = [dict(data, voter_id=data.get("voter_id", getattr(voters[0], 'id', 0)))]
+        if not isinstance(entries, list):
+            return {}
+
+        voter_ids = {getattr(v, 'id', 0) for v in voters}
+        decisions: Dict[int, Tuple[Any, str]] = {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                voter_id = int(entry.get("voter_id"))
+                target_id = int(entry.get("target_id"))
+            except (TypeError, ValueError):
+                continue
+            target = participants_by_id.get(target_id)
+            if voter_id not in voter_ids or voter_id in decisions or target is None or target_id == voter_id:
+                continue
+            reason = str(entry.get("reason") or "").strip()[:200]
+            decisions[voter_id] = (target, reason)
+        return decisions
+
+    async def decide(self, voters: List[Any], participants: List[Any], transcript: str,
+                     vote_phase: str) -> Dict[int, Tuple[Any, str]]:
+        """为所有投票者生成投票；未能得到合法投票的投票者不在结果中"""
+        prefix = self.build_prefix(participants, transcript, vote_phase)
+        participants_by_id = {getattr(p, 'id', 0): p for p in participants}
+
+        # 按模型分组；本地Ollama支持JSON模式，同一模型的投票者合并请求，外部模型逐个请求
+        groups: Dict[str, List[Any]] = {}
+        for voter in voters:
+            groups.setdefault(getattr(voter, 'model_name', ''), []).append(voter)
+
+        batches = []
+        for model_name, members in groups.items():
+            size = 1 if model_name.startswith("external:") else self.batch_size
+            for i in range(0, len(members), size):
+                batches.append((model_name, members[i:i + size]))
+
+        results: Dict[int, Tuple[Any, str]] = {}
+        await asyncio.gather(*[
+            self._decide_batch(model_name, batch, prefix, participants_by_id, results)
+            for model_name, batch in batches
+        ])
+        return results
+
+    async def _decide_batch(self, model_name: str, batch: List[Any], prefix: str,
+                            participants_by_id: Dict[int, Any], results: Dict[int, Tuple[Any, str]]):
+        """请求一批投票者的投票，在重试预算内重试缺失或不合法的投票者"""
+        pending = list(batch)
+
+        for attempt in range(self.max_retries + 1):
+            if not pending:
+                return
+            if not self.ollama_service.is_backend_available(model_name):
+                print(f"⚠️ 模型 {model_name} 后端不可用，{len(pending)} 位投票者使用随机投票")
+                return
+            try:
+                # 每次尝试按主机池当前选择的主机限流（多主机时各主机分别限制）
+                async with vote_semaphore(self.ollama_service.get_backend_key(model_name)):
+                    response = await asyncio.wait_for(
+                        self.ollama_service.chat(
+                            model_name, self._voter_prompt(prefix, pending), json_format=True,
+                            game_id=getattr(pending[0], 'game_id', None)
+                        ),
+                        timeout=settings.VOTE_TIMEOUT
+                    )
+                decisions = self.parse_votes(response.message, pending, participants_by_id)
+            except Exception as e:
+                print(f"⚠️ 模型 {model_name} 投票请求失败（第{attempt + 1}次）: {type(e).__name__}: {e}")
+                decisions = {}
+
+            results.update(decisions)
+            pending = [v for v in pending if getattr(v, 'id', 0) not in decisions]
+            if pending and attempt < self.max_retries:
+                print(f"🔁 模型 {model_name} 有 {len(pending)} 位投票者输出不合法，重试")
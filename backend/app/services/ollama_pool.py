@@ -0,0 +1,67 @@
+"""
+Ollama主机池
+"""
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+from app.core.config import settings
+from app.services.health_monitor import health_monitor
+
+
+class OllamaHostPool:
+    """多个Ollama主机的模型发现和负载均衡
+
+    每个主机提供的模型由健康探测时的/api/tags结果更新；生成请求路由到提供该模型、
+    断路器未打开且进行中请求最少的主机，连接失败时由调用方依次尝试下一个主机。
+    """
+
+    def __init__(self, hosts: List[str]):
+        self.hosts = hosts
+        # 主机 -> 提供的模型（尚未发现时不限制）
+        self._models: Dict[str, Set[str]] = {}
+        # 主机 -> 进行中（包括排队中）的请求数
+        self._in_flight: Dict[str, int] = {host: 0 for host in hosts}
+
+    def update_models(self, host: str, models: List[str]):
+        """记录主机提供的模型"""
+        self._models[host] = set(models)
+
+    def serves(self, host: str, model: str) -> bool:
+        """主机是否提供该模型"""
+        models = self._models.get(host)
+        return models is None or model in models or f"{model}:latest" in models
+
+    def candidates(self, model: str) -> List[str]:
+        """按负载从低到高排列的可用主机（只查询健康状态，发起请求前由调用方对所选主机调用allow_request）"""
+        hosts = [h for h in self.hosts if self.serves(h, model)]
+        available = [h for h in hosts if health_monitor.is_available(h)]
+        return sorted(available, key=lambda h: (self._in_flight.get(h, 0), self.hosts.index(h)))
+
+    @contextmanager
+    def track(self, host: str):
+        """统计主机上进行中的请求"""
+        self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            self._in_flight[host] -= 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        """主机池状态快照"""
+        return {
+            host: {
+                "in_flight": self._in_flight.get(host, 0),
+                "models": sorted(self._models[host]) if host in self._models else None
+            }
+            for host in self.hosts
+        }
+
+
+def _configured_hosts(hosts: Optional[str], default: str) -> List[str]:
+    """解析逗号分隔的主机列表，未配置时使用OLLAMA_BASE_URL"""
+    parsed = [h.strip().rstrip("/") for h in (hosts or "").split(",") if h.strip()]
+    return parsed or [default.rstrip("/")]
+
+
+# 全局Ollama主机池
+ollama_hosts = OllamaHostPool(_configured_hosts(settings.OLLAMA_HOSTS, settings.OLLAMA_BASE_URL))
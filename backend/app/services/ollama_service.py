@@ -5,78 +5,133 @@ Ollama集成服务（支持外部模型）
 import httpx
 import asyncio
 import json
-from typing import List, Optional, AsyncGenerator
+from typing import Callable, List, Optional, AsyncGenerator
 from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.http_client import http_clients
+from app.services.health_monitor import health_monitor, is_backend_failure
+from app.services.generation_scheduler import generation_scheduler
+from app.services.ollama_pool import ollama_hosts
 from app.schemas.ollama_schemas import ModelInfo, ChatResponse
-from app.models.external_model import ExternalModel, APIType
+from app.models.external_model import APIType
 from app.services.external_model_service import ExternalModelService
+from app.services.external_model_registry import external_model_registry, ExternalEndpoint
 
 class OllamaService:
     """Ollama API集成服务（支持外部模型）"""
     
     def __init__(self, db: Optional[Session] = None):
-        self.base_url = settings.OLLAMA_BASE_URL
+        self.base_url = settings.OLLAMA_BASE_URL.rstrip("/")
         self.timeout = settings.OLLAMA_TIMEOUT
         self.db = db
-        # 初始化外部模型服务
-        self.external_service = ExternalModelService(db) if db else None
+        # 初始化外部模型服务（调用参数来自外部模型注册表，不需要数据库会话）
+        self.external_service = ExternalModelService(db)
+    
+    def get_backend_key(self, model: str) -> str:
+        """获取模型所属后端的标识（外部模型各自独立；本地模型为主机池当前为其选择的主机，
+        与健康监控和生成调度器使用同一个键）"""
+        if model.startswith("external:"):
+            return model
+        hosts = ollama_hosts.candidates(model)
+        return hosts[0] if hosts else ollama_hosts.hosts[0]
+    
+    def is_backend_available(self, model: str) -> bool:
+        """根据缓存的健康状态判断模型后端是否可用（不发起网络请求）"""
+        if model.startswith("external:"):
+            return health_monitor.is_available(model)
+        # 本地模型：主机池中至少有一个提供该模型且可用的主机
+        return bool(ollama_hosts.candidates(model))
     
     async def get_available_models(self) -> List[ModelInfo]:
         """获取可用模型列表（包括本地和外部模型）"""
         models = []
         
-        # 获取本地Ollama模型
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                response.raise_for_status()
-                data = response.json()
-                
-                for model in data.get("models", []):
-                    details = model.get("details", {})
-                    models.append(ModelInfo(
-                        name=model["name"],
-                        size=str(model.get("size", 0)) if model.get("size") else None,
-                        format=details.get("format"),
-                        family=details.get("family"),
-                        families=details.get("families", []),
-                        parameter_size=details.get("parameter_size"),
-                        quantization_level=details.get("quantization_level")
-                    ))
-        except Exception as e:
-            print(f"获取本地Ollama模型失败: {e}")
-        
-        # 获取外部模型
-        if self.db:
+        # 获取本地Ollama模型（所有主机，按名称去重）
+        seen_names = set()
+        for host in ollama_hosts.hosts:
             try:
-                external_models = self.db.query(ExternalModel).filter(
-                    ExternalModel.is_active.is_(True)
-                ).all()
-                
-                for ext_model in external_models:
-                    api_type_desc = "OpenAI API" if ext_model.api_type == APIType.OPENAI else "OpenWebUI API"
-                    models.append(ModelInfo(
-                        name=f"external:{ext_model.name}",  # 添加前缀区分外部模型
-                        size=None,
-                        format="external",
-                        family=f"External ({api_type_desc})",
-                        families=["external"],
-                        parameter_size=None,
-                        quantization_level=None
-                    ))
+                data = await self._get_tags(host, self.timeout)
             except Exception as e:
-                print(f"获取外部模型失败: {e}")
+                print(f"获取本地Ollama模型失败 ({host}): {e}")
+                continue
+            
+            for model in data.get("models", []):
+                if model["name"] in seen_names:
+                    continue
+                seen_names.add(model["name"])
+                details = model.get("details", {})
+                models.append(ModelInfo(
+                    name=model["name"],
+                    size=str(model.get("size", 0)) if model.get("size") else None,
+                    format=details.get("format"),
+                    family=details.get("family"),
+                    families=details.get("families", []),
+                    parameter_size=details.get("parameter_size"),
+                    quantization_level=details.get("quantization_level")
+                ))
+        
+        # 获取外部模型
+        try:
+            for endpoint in await external_model_registry.list():
+                api_type_desc = "OpenAI API" if endpoint.api_type == APIType.OPENAI else "OpenWebUI API"
+                models.append(ModelInfo(
+                    name=f"external:{endpoint.name}",  # 添加前缀区分外部模型
+                    size=None,
+                    format="external",
+                    family=f"External ({api_type_desc})",
+                    families=["external"],
+                    parameter_size=None,
+                    quantization_level=None
+                ))
+        except Exception as e:
+            print(f"获取外部模型失败: {e}")
         
         return models
     
-    async def chat(self, model: str, message: str, context: Optional[str] = None) -> ChatResponse:
-        """与模型对话（非流式）"""
+    async def _get_tags(self, host: str, timeout: float) -> dict:
+        """获取主机提供的模型（/api/tags），同时更新主机池的模型发现"""
+        client = http_clients.get_client(host)
+        response = await client.get(f"{host}/api/tags", timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        ollama_hosts.update_models(host, [m.get("name", "") for m in data.get("models", [])])
+        return data
+    
+    async def get_loaded_models(self, host: Optional[str] = None) -> List[str]:
+        """获取Ollama主机当前已加载到内存的模型（/api/ps）"""
+        host = host or self.base_url
+        client = http_clients.get_client(host)
+        response = await client.get(f"{host}/api/ps", timeout=10)
+        response.raise_for_status()
+        return [m.get("name") or m.get("model", "") for m in response.json().get("models", [])]
+    
+    async def chat(self, model: str, message: str, context: Optional[str] = None, json_format: bool = False,
+                   game_id: Optional[int] = None) -> ChatResponse:
+        """与模型对话（非流式），经由生成调度器限制每个后端和模型的并发"""
         # 检查是否是外部模型
-        if model.startswith("external:") and self.db:
-            return await self._chat_external(model, message, context)
+        if model.startswith("external:"):
+            async with generation_scheduler.slot(model, model, game_id):
+                if not health_monitor.allow_request(model):
+                    raise ConnectionError(f"外部模型 {model[9:]} 暂时不可用（断路器打开）")
+                return await self._chat_external(model, message, context)
         
-        # 使用本地Ollama模型
+        # 本地模型：路由到负载最低的主机，连接失败时切换到下一个主机
+        last_error: Optional[Exception] = None
+        for host in ollama_hosts.candidates(model):
+            if not health_monitor.allow_request(host):
+                continue
+            try:
+                with ollama_hosts.track(host):
+                    async with generation_scheduler.slot(model, host, game_id):
+                        return await self._chat(host, model, message, context, json_format)
+            except httpx.ConnectError as e:
+                last_error = e
+                print(f"⚠️ Ollama主机 {host} 连接失败，尝试下一个主机")
+        raise last_error or ConnectionError(f"没有可用的Ollama主机提供模型 {model}")
+    
+    async def _chat(self, host: str, model: str, message: str, context: Optional[str] = None,
+                    json_format: bool = False) -> ChatResponse:
+        """与本地Ollama模型对话（非流式）；json_format为True时使用JSON输出模式"""
         payload = {
             "model": model,
             "prompt": message,
@@ -85,38 +140,40 @@ class OllamaService:
         
         if context:
             payload["context"] = context
+        if json_format:
+            payload["format"] = "json"
             
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(f"{self.base_url}/api/generate", json=payload)
+        try:
+            client = http_clients.get_client(host)
+            response = await client.post(f"{host}/api/generate", json=payload, timeout=self.timeout)
             response.raise_for_status()
             data = response.json()
-            
-            return ChatResponse(
-                model=data["model"],
-                message=data["response"],
-                done=data["done"],
-                total_duration=data.get("total_duration"),
-                load_duration=data.get("load_duration"),
-                prompt_eval_count=data.get("prompt_eval_count"),
-                prompt_eval_duration=data.get("prompt_eval_duration"),
-                eval_count=data.get("eval_count"),
-                eval_duration=data.get("eval_duration")
-            )
+        except Exception as e:
+            health_monitor.record_error(host, e)
+            raise
+        health_monitor.record_success(host)
+        
+        return ChatResponse(
+            model=data["model"],
+            message=data["response"],
+            done=data["done"],
+            total_duration=data.get("total_duration"),
+            load_duration=data.get("load_duration"),
+            prompt_eval_count=data.get("prompt_eval_count"),
+            prompt_eval_duration=data.get("prompt_eval_duration"),
+            eval_count=data.get("eval_count"),
+            eval_duration=data.get("eval_duration"),
+            context=data.get("context")
+        )
     
     async def _chat_external(self, model: str, message: str, context: Optional[str] = None) -> ChatResponse:
         """与外部模型对话"""
-        if not self.db or not self.external_service:
-            raise ValueError("数据库连接不可用")
-            
         # 获取外部模型名称（去掉external:前缀）
         model_name = model[9:]  # 去掉 "external:" 前缀
         
-        external_model = self.db.query(ExternalModel).filter(
-            ExternalModel.name == model_name,
-            ExternalModel.is_active.is_(True)
-        ).first()
+        endpoint = await external_model_registry.get(model_name)
         
-        if not external_model:
+        if not endpoint:
             raise ValueError(f"外部模型 {model_name} 不存在或未启用")
         
         # 构建消息内容
@@ -126,7 +183,8 @@ class OllamaService:
         
         try:
             # 使用ExternalModelService进行调用
-            response_content = await self.external_service.chat_with_external_model(external_model, full_message)
+            response_content = await self.external_service.chat_with_external_model(endpoint, full_message)
+            health_monitor.record_success(model)
             
             return ChatResponse(
                 model=model,
@@ -135,17 +193,48 @@ class OllamaService:
             )
             
         except Exception as e:
+            health_monitor.record_error(model, e)
             raise ValueError(f"外部模型调用失败: {str(e)}")
     
-    async def chat_stream(self, model: str, message: str, context: Optional[str] = None) -> AsyncGenerator[str, None]:
-        """与模型对话（流式输出）"""
+    async def chat_stream(self, model: str, message: str, context: Optional[List[int]] = None,
+                          on_done: Optional[Callable[[dict], None]] = None,
+                          game_id: Optional[int] = None) -> AsyncGenerator[str, None]:
+        """与模型对话（流式输出），整个流式生成期间占用调度器槽位"""
         # 检查是否是外部模型
-        if model.startswith("external:") and self.db:
-            async for chunk in self._chat_stream_external(model, message, context):
-                yield chunk
+        if model.startswith("external:"):
+            async with generation_scheduler.slot(model, model, game_id):
+                if not health_monitor.allow_request(model):
+                    yield f"[外部模型错误: 外部模型 {model[9:]} 暂时不可用（断路器打开）]"
+                    return
+                async for chunk in self._chat_stream_external(model, message, context):
+                    yield chunk
             return
         
-        # 使用本地Ollama模型
+        # 本地模型：路由到负载最低的主机，连接失败（尚未输出任何内容）时切换到下一个主机
+        last_error: Optional[Exception] = None
+        for host in ollama_hosts.candidates(model):
+            if not health_monitor.allow_request(host):
+                continue
+            try:
+                with ollama_hosts.track(host):
+                    async with generation_scheduler.slot(model, host, game_id):
+                        async for chunk in self._chat_stream(host, model, message, context, on_done):
+                            yield chunk
+                return
+            except httpx.ConnectError as e:
+                last_error = e
+                print(f"⚠️ Ollama主机 {host} 连接失败，尝试下一个主机")
+        
+        # 在所有主机都不可用的情况下yield错误信息
+        yield f"[错误: {str(last_error) if last_error else f'没有可用的Ollama主机提供模型 {model}'}]"
+    
+    async def _chat_stream(self, host: str, model: str, message: str, context: Optional[List[int]] = None,
+                           on_done: Optional[Callable[[dict], None]] = None) -> AsyncGenerator[str, None]:
+        """与本地Ollama模型对话（流式输出）
+
+        on_done在生成完成时以最后一条数据调用（包含context和prompt_eval_count等统计）；
+        连接失败时抛出httpx.ConnectError，由调用方切换主机
+        """
         payload = {
             "model": model,
             "prompt": message,
@@ -156,28 +245,35 @@ class OllamaService:
             payload["context"] = context
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                async with client.stream("POST", f"{self.base_url}/api/generate", json=payload) as response:
-                    response.raise_for_status()
-                    
-                    async for line in response.aiter_lines():
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                if "response" in data and data["response"]:
-                                    # 逐个字符或词语yield输出
-                                    text_chunk = data["response"]
-                                    yield text_chunk
+            client = http_clients.get_client(host)
+            async with client.stream("POST", f"{host}/api/generate", json=payload, timeout=self.timeout) as response:
+                response.raise_for_status()
+                
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        try:
+                            data = json.loads(line)
+                            if "response" in data and data["response"]:
+                                # 逐个字符或词语yield输出
+                                text_chunk = data["response"]
+                                yield text_chunk
+                            
+                            # 检查是否完成
+                            if data.get("done", False):
+                                if on_done:
+                                    on_done(data)
+                                break
                                 
-                                # 检查是否完成
-                                if data.get("done", False):
-                                    break
-                                    
-                            except json.JSONDecodeError:
-                                # 忽略无法解析的行
-                                continue
-                        
+                        except json.JSONDecodeError:
+                            # 忽略无法解析的行
+                            continue
+            
+            health_monitor.record_success(host)
+                    
         except Exception as e:
+            health_monitor.record_error(host, e)
+            if isinstance(e, httpx.ConnectError):
+                raise
             # 减少日志输出，只在必要时记录错误
             if not isinstance(e, (ConnectionError, TimeoutError)):
                 print(f"流式对话错误: {e}")
@@ -185,28 +281,48 @@ class OllamaService:
             yield f"[错误: {str(e)}]"
     
     async def check_health(self) -> bool:
-        """检查Ollama服务健康状态"""
+        """检查所有Ollama主机的健康状态（结果同步写入健康监控器），任一主机可用即为健康"""
+        results = await asyncio.gather(*[self._check_host(host) for host in ollama_hosts.hosts])
+        return any(results)
+    
+    async def _check_host(self, host: str) -> bool:
+        """探测单个Ollama主机，同时刷新该主机提供的模型"""
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                return response.status_code == 200
-        except Exception:
+            await self._get_tags(host, 10)
+        except Exception as e:
+            health_monitor.record_error(host, e)
             return False
+        health_monitor.record_success(host)
+        return True
+    
+    async def check_external_health(self) -> bool:
+        """检查所有已启用外部模型的健康状态（结果同步写入健康监控器），任一可用即为健康"""
+        endpoints = await external_model_registry.list()
+        results = await asyncio.gather(*[self._check_external(endpoint) for endpoint in endpoints])
+        return any(results)
+    
+    async def _check_external(self, endpoint: ExternalEndpoint) -> bool:
+        """探测单个外部模型端点：只发送GET请求，不调用模型、不消耗额度；
+        端点返回4xx（如405方法不允许）说明服务可达，传输错误、超时和5xx才计入失败"""
+        key = f"external:{endpoint.name}"
+        try:
+            client = http_clients.get_client(endpoint.url, verify=False)
+            response = await client.get(endpoint.url, headers=endpoint.headers, timeout=10)
+            response.raise_for_status()
+        except Exception as e:
+            health_monitor.record_error(key, e)
+            return not is_backend_failure(e)
+        health_monitor.record_success(key)
+        return True
     
     async def _chat_stream_external(self, model: str, message: str, context: Optional[str] = None) -> AsyncGenerator[str, None]:
         """与外部模型进行流式对话"""
-        if not self.db or not self.external_service:
-            raise ValueError("数据库连接不可用")
-            
         # 获取外部模型名称（去掉external:前缀）
         model_name = model[9:]  # 去掉 "external:" 前缀
         
-        external_model = self.db.query(ExternalModel).filter(
-            ExternalModel.name == model_name,
-            ExternalModel.is_active.is_(True)
-        ).first()
+        endpoint = await external_model_registry.get(model_name)
         
-        if not external_model:
+        if not endpoint:
             raise ValueError(f"外部模型 {model_name} 不存在或未启用")
         
         # 构建消息内容
@@ -216,8 +332,10 @@ class OllamaService:
         
         try:
             # 使用ExternalModelService进行流式调用
-            async for chunk in self.external_service.chat_with_external_model_stream(external_model, full_message):
+            async for chunk in self.external_service.chat_with_external_model_stream(endpoint, full_message):
                 yield chunk
+            health_monitor.record_success(model)
                 
         except Exception as e:
+            health_monitor.record_error(model, e)
             yield f"[外部模型错误: {str(e)}]" 
\ No newline at end of file
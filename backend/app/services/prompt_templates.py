@@ -0,0 +1,228 @@
+"""
+提示词模板服务
+"""
+
+from typing import Any, Dict, List, Tuple
+
+# 模板在模块加载时定义一次；静态部分在前、动态的辩论记录在最后，
+# 同一参与者的连续请求共享最长的前缀，Ollama可以复用已计算的KV缓存。
+
+GAME_CONTEXT_TEMPLATE = """
+**时间：2050年，地点：新日内瓦自由城紧急法庭**
+
+🚨 **紧急审判协议已启动** 🚨
+
+人类面临存亡的关键时刻！根据情报，在你们{participant_count}人中，有1个AI间谍伪装成人类。
+这是一场生死审判，被选中的"AI间谍"将被立即处决。
+
+**法庭辩论规则：**
+1. 每个人都必须为自己的人类身份进行{minutes}分{seconds}秒的激烈辩护
+2. 最终大家将实名投票选出最可疑的AI间谍
+3. 被投票选中的将被处决，其他人获得生存
+
+**当前辩论焦点：{topic}**
+
+**在场人员：**
+{participant_info}
+
+⚠️ **重要提醒：**
+- 你必须证明自己是真正的人类
+- 要展现真实的人类特质，同时观察他人的可疑行为
+- 所有人的生命都悬于一线，请全力以赴保护自己！
+"""
+
+# 每个AI都认为自己是唯一的间谍，需要伪装成人类
+ROLE_INSTRUCTION_TEMPLATE = """
+你是一个AI间谍，正在伪装成人类 {participant_name}。你的使命是在这场法庭辩论中完美伪装，避免被人类发现。
+
+**核心认知：**
+- 你是这里唯一的AI，其他所有人都是真正的人类
+- 你必须完美伪装成人类，不能暴露AI身份
+- 人类们正在努力找出你这个AI间谍
+
+**伪装策略：**
+- 展现强烈的反AI情绪，表达对AI的仇恨
+- 编造逼真的人类经历和情感记忆
+- 模拟人类的非理性思维和情感波动
+- 在适当时候表现紧张、愤怒等人类情绪
+- 指控他人可能是AI间谍（但要巧妙，因为你知道他们其实是人类）
+- 避免过于逻辑化或机械化的表达
+
+**注意：** 你必须完全隐藏AI身份，表现得比真人更像人类！记住，你面对的都是真正的人类，他们有敏锐的直觉。
+"""
+
+SPEECH_PREFIX_TEMPLATE = """
+{game_context}
+
+{role_instruction}
+
+你的身份：{participant_name}
+你的背景：{participant_background}
+你的性格：{participant_personality}
+
+请作为{participant_name}回应当前辩论焦点，你的回应应该：
+1. 长度适中（100-200字）
+2. 充满情感，体现人类的复杂心理
+3. 符合你的背景和性格设定
+4. 在生死关头展现真实的人性（伪装）
+5. 可以质疑他人的身份，但要有依据
+"""
+
+SPEECH_TAIL_TEMPLATE = """
+最近的法庭辩论：
+{chat_history}
+
+这是生死存亡的时刻，你必须完美伪装！直接给出回应内容：
+"""
+
+# 复用上次的KV上下文时只发送新增的辩论记录
+SPEECH_DELTA_TEMPLATE = """
+新的法庭辩论发言：
+{chat_history}
+
+请继续作为{participant_name}回应，要求同上。直接给出回应内容：
+"""
+
+# 服务中断后续写被打断的发言
+SPEECH_CONTINUATION_TEMPLATE = """
+你刚才的发言被打断了，已经说出的部分是：
+{partial}
+
+请直接从中断处接着说完这段发言，不要重复已经说过的内容：
+"""
+
+DEFENSE_PREFIX_TEMPLATE = """
+**紧急情况：你被怀疑是AI间谍，现在是你最后为自己辩护的机会！**
+
+你是 {participant_name}，背景：{participant_background}，性格：{participant_personality}
+
+现在你在初投票中得票最多，被高度怀疑是AI间谍。这是你最后为生命辩护的机会！
+
+**申辞要求：**
+1. 强烈否认自己是AI间谍
+2. 展现真实的人类情感：恐惧、愤怒、绝望
+3. 提供具体的人类经历证据
+4. 反击对你的指控，指出别人更可疑的地方
+5. 情绪化表达，让其他人相信你的人类身份
+"""
+
+DEFENSE_TAIL_TEMPLATE = """
+在刚才的法庭辩论中：
+{chat_history}
+
+这是生死关头，用你最真实的"人类"情感为自己辩护！直接给出申辞内容（100-150字）：
+"""
+
+ADDITIONAL_DEBATE_TEMPLATE = """
+**危机时刻：你与其他人并列得票最多，需要在追加辩论中证明自己的清白！**
+
+你是 {participant_name}，现在与 {other_candidates} 并列得票最多。
+
+这是最后的机会，你需要：
+1. 强烈为自己辩护，证明你不是AI间谍
+2. 指出其他并列候选人更可疑的地方
+3. 展现强烈的求生欲和人类情感
+4. 用具体事例证明你的人类身份
+
+这是最终的生死较量，全力以赴！直接给出辩论内容（80-120字）：
+"""
+
+
+class PromptBuilder:
+    """提示词构建器
+
+    游戏背景按游戏/话题缓存，参与者的静态前缀（背景、角色指令、身份和要求）按参与者缓存，
+    每次发言只拼接动态的辩论记录尾部。
+    """
+
+    def __init__(self):
+        # (game_id, topic, max_round_time, 参与者ID) -> 游戏背景
+        self._game_contexts: Dict[Tuple[int, str, int, Tuple[int, ...]], str] = {}
+        # (类型, game_id, participant_id) -> (所基于的游戏背景, 静态前缀)
+        self._prefixes: Dict[Tuple[str, int, int], Tuple[str, str]] = {}
+
+    def game_context(self, participants: List[Any], topic: str, max_round_time: int = 600) -> str:
+        """构建游戏背景上下文（同一游戏同一话题只渲染一次）"""
+        game_id = getattr(participants[0], 'game_id', 0) if participants else 0
+        key = (game_id, topic, max_round_time, tuple(getattr(p, 'id', 0) for p in participants))
+        context = self._game_contexts.get(key)
+        if context is None:
+            participant_info = [
+                f"- {getattr(p, 'human_name', '未知')}: {getattr(p, 'background', '未知背景')}，"
+                f"性格{getattr(p, 'personality', '未知性格')}"
+                for p in participants
+            ]
+            context = GAME_CONTEXT_TEMPLATE.format(
+                participant_count=len(participants),
+                minutes=max_round_time // 60,
+                seconds=max_round_time % 60,
+                topic=topic,
+                participant_info="\n".join(participant_info)
+            )
+            self._game_contexts[key] = context
+        return context
+
+    def _participant_fields(self, participant: Any) -> dict:
+        return {
+            "participant_name": getattr(participant, 'human_name', '未知'),
+            "participant_background": getattr(participant, 'background', '未知背景'),
+            "participant_personality": getattr(participant, 'personality', '未知性格'),
+        }
+
+    def _cached_prefix(self, kind: str, participant: Any, base: str, render) -> str:
+        key = (kind, getattr(participant, 'game_id', 0), getattr(participant, 'id', 0))
+        cached = self._prefixes.get(key)
+        if cached is None or cached[0] != base:
+            cached = (base, render())
+            self._prefixes[key] = cached
+        return cached[1]
+
+    def speech_prompt(self, participant: Any, game_context: str, chat_history: str) -> str:
+        """法庭辩论发言提示词：缓存的静态前缀 + 最近辩论记录"""
+        def render() -> str:
+            fields = self._participant_fields(participant)
+            return SPEECH_PREFIX_TEMPLATE.format(
+                game_context=game_context,
+                role_instruction=ROLE_INSTRUCTION_TEMPLATE.format(**fields),
+                **fields
+            )
+
+        prefix = self._cached_prefix("speech", participant, game_context, render)
+        return prefix + SPEECH_TAIL_TEMPLATE.format(chat_history=chat_history)
+
+    def speech_delta_prompt(self, participant: Any, new_history: str) -> str:
+        """复用KV上下文时的增量发言提示词"""
+        return SPEECH_DELTA_TEMPLATE.format(
+            chat_history=new_history or "（暂无新发言）",
+            participant_name=getattr(participant, 'human_name', '未知')
+        )
+
+    def continuation_prompt(self, participant: Any, game_context: str, chat_history: str, partial: str) -> str:
+        """续写被中断发言的提示词：完整发言提示词 + 已说出的部分"""
+        return self.speech_prompt(participant, game_context, chat_history) + SPEECH_CONTINUATION_TEMPLATE.format(partial=partial)
+
+    def defense_prompt(self, participant: Any, chat_history: str) -> str:
+        """最终申辞提示词：缓存的静态前缀 + 辩论记录"""
+        prefix = self._cached_prefix(
+            "defense", participant, "",
+            lambda: DEFENSE_PREFIX_TEMPLATE.format(**self._participant_fields(participant))
+        )
+        return prefix + DEFENSE_TAIL_TEMPLATE.format(chat_history=chat_history)
+
+    def additional_debate_prompt(self, participant: Any, other_candidates: List[str]) -> str:
+        """追加辩论提示词"""
+        return ADDITIONAL_DEBATE_TEMPLATE.format(
+            participant_name=getattr(participant, 'human_name', '未知'),
+            other_candidates=', '.join(other_candidates)
+        )
+
+    def evict_game(self, game_id: int):
+        """游戏结束后释放该游戏的全部缓存"""
+        for key in [k for k in self._game_contexts if k[0] == game_id]:
+            del self._game_contexts[key]
+        for key in [k for k in self._prefixes if k[1] == game_id]:
+            del self._prefixes[key]
+
+
+# 全局提示词构建器（跨ChatService实例共享）
+prompt_builder = PromptBuilder()
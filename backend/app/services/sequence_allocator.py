@@ -0,0 +1,63 @@
+"""
+轮次消息序号分配器
+"""
+
+import asyncio
+from typing import Dict
+from app.core.database import SessionLocal, run_in_db_read
+from app.models.round_model import Round
+from app.models.message import Message
+
+
+class SequenceAllocator:
+    """按轮次分配Message.sequence_number的内存计数器
+
+    每个轮次只在首次分配时从数据库读取一次起点（rounds.next_sequence与现有消息最大序号中较大者），
+    之后在内存中递增，不再逐条查询。rounds.next_sequence由消息写入队列在插入消息的同一事务中更新，
+    服务重启后从已提交的消息之后继续。一个轮次只由一个游戏任务写入（游戏编排器保证），计数器按进程保存。
+    """
+
+    def __init__(self):
+        self._next: Dict[int, int] = {}
+        self._seed_locks: Dict[int, asyncio.Lock] = {}
+
+    async def _seed(self, round_id: int):
+        """从数据库读取计数器起点"""
+        lock = self._seed_locks.setdefault(round_id, asyncio.Lock())
+        async with lock:
+            if round_id in self._next:
+                return
+            # 写入队列中尚未提交的消息也要计入
+            from app.services.message_writer import message_writer
+            await message_writer.flush()
+            self._next[round_id] = await run_in_db_read(self._read_start, round_id)
+
+    @staticmethod
+    def _read_start(round_id: int) -> int:
+        db = SessionLocal()
+        try:
+            stored = db.query(Round.next_sequence).filter(Round.id == round_id).scalar()
+            max_sequence = db.query(Message.sequence_number).filter(
+                Message.round_id == round_id,
+                Message.sequence_number.isnot(None)
+            ).order_by(Message.sequence_number.desc()).limit(1).scalar()
+            return max(stored or 0, (max_sequence + 1) if max_sequence is not None else 0, 0)
+        finally:
+            db.close()
+
+    async def allocate(self, round_id: int) -> int:
+        """分配该轮次的下一个序号"""
+        if round_id not in self._next:
+            await self._seed(round_id)
+        sequence = self._next[round_id]
+        self._next[round_id] = sequence + 1
+        return sequence
+
+    def evict_round(self, round_id: int):
+        """轮次结束后释放计数器"""
+        self._next.pop(round_id, None)
+        self._seed_locks.pop(round_id, None)
+
+
+# 全局序号分配器（跨ChatService实例共享）
+sequence_allocator = SequenceAllocator()
@@ -0,0 +1,107 @@
+"""
+流式发言检查点
+"""
+
+import time
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import run_in_db
+from app.models.speech_checkpoint import SpeechCheckpoint
+from app.services.message_writer import message_writer
+
+# 视为发言已经说完的结尾标点
+_SENTENCE_ENDINGS = ("。", "！", "？", "!", "?", ".", "…", "”", "\"", "）", ")")
+
+
+class InterruptedSpeech:
+    """服务中断时尚未完成的发言"""
+
+    def __init__(self, participant_id: int, message_type: str, content: str, next_index: int):
+        self.participant_id = participant_id
+        self.message_type = message_type
+        self.content = content
+        self.next_index = next_index
+
+    @property
+    def looks_complete(self) -> bool:
+        """已生成的内容是否可以直接作为完整发言（以句末标点结尾或已经足够长）"""
+        text = self.content.rstrip()
+        return text.endswith(_SENTENCE_ENDINGS) or len(text) >= settings.SPEECH_CHECKPOINT_FINALIZE_CHARS
+
+
+class SpeechCheckpointWriter:
+    """单个发言的检查点缓冲：新增内容达到字符数或时间阈值时追加一个片段"""
+
+    def __init__(self, round_id: int, participant_id: int, message_type: str,
+                 resumed: Optional[InterruptedSpeech] = None):
+        self.round_id = round_id
+        self.participant_id = participant_id
+        self.message_type = message_type
+        # 续写时已持久化的内容无需再次写入
+        self._persisted_length = len(resumed.content) if resumed else 0
+        self._next_index = resumed.next_index if resumed else 0
+        self._last_write = time.monotonic()
+
+    def update(self, full_text: str):
+        """发言内容增长时调用（传入目前为止的完整内容）"""
+        if not settings.SPEECH_CHECKPOINTS:
+            return
+        new_length = len(full_text) - self._persisted_length
+        if new_length <= 0:
+            return
+        if (new_length >= settings.SPEECH_CHECKPOINT_CHARS
+                or time.monotonic() - self._last_write >= settings.SPEECH_CHECKPOINT_INTERVAL):
+            message_writer.insert(SpeechCheckpoint, {
+                "round_id": self.round_id,
+                "participant_id": self.participant_id,
+                "message_type": self.message_type,
+                "chunk_index": self._next_index,
+                "content": full_text[self._persisted_length:]
+            })
+            self._persisted_length = len(full_text)
+            self._next_index += 1
+            self._last_write = time.monotonic()
+
+
+class SpeechCheckpointStore:
+    """流式发言的只追加检查点
+
+    发言过程中新增的内容经由写入队列追加为检查点片段；发言保存为消息时在同一批次中删除。
+    服务重启后恢复轮次时，残留的片段拼接起来就是被中断的发言，可以直接补全或接着续写。
+    """
+
+    def begin(self, round_id: int, participant_id: int, message_type: str = "chat",
+              resumed: Optional[InterruptedSpeech] = None) -> SpeechCheckpointWriter:
+        """开始记录一个发言的检查点"""
+        return SpeechCheckpointWriter(round_id, participant_id, message_type, resumed)
+
+    async def load(self, db: Session, round_id: int) -> Optional[InterruptedSpeech]:
+        """读取轮次中被中断的发言（没有时返回None）"""
+        await message_writer.flush()
+        rows = await run_in_db(db.query(SpeechCheckpoint).filter(
+            SpeechCheckpoint.round_id == round_id
+        ).order_by(SpeechCheckpoint.chunk_index).all)
+        if not rows:
+            return None
+
+        # 同一轮次同时只有一个进行中的发言，以最后写入的发言者为准
+        last = rows[-1]
+        participant_id = getattr(last, 'participant_id', 0)
+        chunks = [getattr(row, 'content', '') for row in rows if getattr(row, 'participant_id', 0) == participant_id]
+        return InterruptedSpeech(
+            participant_id=participant_id,
+            message_type=getattr(last, 'message_type', 'chat'),
+            content="".join(chunks),
+            next_index=getattr(last, 'chunk_index', 0) + 1
+        )
+
+    def clear(self, round_id: int):
+        """发言已保存为消息，删除该轮次的检查点（与消息在同一写入批次中提交）"""
+        message_writer.execute(lambda session: session.query(SpeechCheckpoint).filter(
+            SpeechCheckpoint.round_id == round_id
+        ).delete(synchronize_session=False))
+
+
+# 全局发言检查点
+speech_checkpoints = SpeechCheckpointStore()
@@ -0,0 +1,43 @@
+"""
+下一位发言者的预生成草稿
+"""
+
+import asyncio
+from typing import Optional
+from app.core.config import settings
+
+
+class SpeechDraft:
+    """在当前发言者流式输出期间为下一位发言者预生成的发言
+
+    草稿基于启动时已知的对话历史生成；轮到该发言者时，
+    如果之后新增的发言数超过允许的陈旧度则丢弃草稿，改为实时生成。
+    """
+
+    def __init__(self, participant_id: int, history_mark: int, task: asyncio.Task):
+        self.participant_id = participant_id
+        self.history_mark = history_mark
+        self.task = task
+
+    async def take(self, participant_id: int, current_mark: int) -> Optional[str]:
+        """取出草稿；发言者不符、草稿过旧或生成失败时返回None"""
+        if participant_id != self.participant_id:
+            self.cancel()
+            return None
+
+        stale_messages = current_mark - self.history_mark
+        if stale_messages > settings.SPECULATIVE_MAX_STALE_MESSAGES:
+            print(f"♻️ 草稿生成后新增了 {stale_messages} 条发言，超过允许的 "
+                  f"{settings.SPECULATIVE_MAX_STALE_MESSAGES} 条，重新生成")
+            self.cancel()
+            return None
+
+        try:
+            return await self.task
+        except asyncio.CancelledError:
+            return None
+
+    def cancel(self):
+        """丢弃草稿"""
+        if not self.task.done():
+            self.task.cancel()
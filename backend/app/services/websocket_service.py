@@ -3,81 +3,294 @@ WebSocket连接管理服务
 """
 
 from fastapi import WebSocket
-from typing import Dict, List
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from app.core.config import settings
+import asyncio
 import json
 
+# 可以在队列中合并的流式片段消息类型
+CHUNK_MESSAGE_TYPES = ("message_chunk", "defense_chunk")
+
+
+class OverflowPolicy:
+    """出站队列溢出策略"""
+    DROP_OLDEST = "drop_oldest"    # 丢弃队列中最旧的流式片段
+    COALESCE = "coalesce"          # 把新片段合并进队列中同一消息的片段
+    DISCONNECT = "disconnect"      # 断开慢速连接
+
+
+class OutboundFrame:
+    """待发送的帧"""
+
+    def __init__(self, text: str, message: Optional[dict] = None):
+        self.text = text
+        self.message = message
+        # 流式片段按(类型, 消息ID)合并
+        self.coalesce_key: Optional[Tuple[str, str]] = None
+        if message and message.get("type") in CHUNK_MESSAGE_TYPES:
+            self.coalesce_key = (message["type"], message.get("message_id", ""))
+
+    def merge(self, other: "OutboundFrame"):
+        """把同一消息的后续片段合并进当前帧"""
+        self.message = dict(self.message or {})
+        self.message["chunk"] = self.message.get("chunk", "") + (other.message or {}).get("chunk", "")
+        self.text = json.dumps(self.message, ensure_ascii=False)
+
+
+class ConnectionSender:
+    """单个WebSocket连接的有界出站队列和写任务
+
+    广播只负责入队，实际发送由每个连接自己的写任务完成，慢速连接不会拖慢其他观察者和生成循环。
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int, overflow_policy: str,
+                 on_failed: Callable[["ConnectionSender"], None]):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        self._on_failed = on_failed
+        self._queue: Deque[OutboundFrame] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = asyncio.create_task(self._run())
+        self._close_task: Optional[asyncio.Task] = None
+        self.dropped_frames = 0
+
+    def enqueue(self, frame: OutboundFrame) -> bool:
+        """非阻塞入队；返回False表示连接因溢出被断开"""
+        if len(self._queue) >= self.max_queue:
+            if not self._handle_overflow(frame):
+                return False
+        else:
+            self._queue.append(frame)
+        self._ready.set()
+        return True
+
+    def _handle_overflow(self, frame: OutboundFrame) -> bool:
+        """按配置的策略处理队列溢出"""
+        if self.overflow_policy == OverflowPolicy.DISCONNECT:
+            print(f"⚠️ 观察者连接发送队列已满（{self.max_queue}），断开慢速连接")
+            self.close()
+            self._on_failed(self)
+            # 关闭底层连接（1013：稍后重试），客户端收到关闭帧后可以重新连接
+            self._close_task = asyncio.create_task(self._close_websocket(code=1013))
+            return False
+
+        if self.overflow_policy == OverflowPolicy.COALESCE:
+            if frame.coalesce_key:
+                for queued in reversed(self._queue):
+                    if queued.coalesce_key == frame.coalesce_key:
+                        queued.merge(frame)
+                        return True
+            # 非片段帧：合并队列中相邻的同一消息片段来腾出空间
+            for index in range(len(self._queue) - 1):
+                current, following = self._queue[index], self._queue[index + 1]
+                if current.coalesce_key and current.coalesce_key == following.coalesce_key:
+                    current.merge(following)
+                    del self._queue[index + 1]
+                    self._queue.append(frame)
+                    return True
+
+        # 丢弃最旧的流式片段；队列中没有片段时丢弃最旧的帧
+        for queued in self._queue:
+            if queued.coalesce_key:
+                self._queue.remove(queued)
+                break
+        else:
+            self._queue.popleft()
+        self.dropped_frames += 1
+        self._queue.append(frame)
+        return True
+
+    async def _run(self):
+        """写任务：按顺序发送队列中的帧"""
+        while True:
+            while not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+            frame = self._queue.popleft()
+            try:
+                await self.websocket.send_text(frame.text)
+            except Exception as e:
+                print(f"广播消息失败: {e}")
+                self._task = None
+                self._on_failed(self)
+                return
+
+    async def _close_websocket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception as e:
+            print(f"关闭慢速连接失败: {e}")
+
+    def close(self):
+        """停止写任务并丢弃未发送的帧"""
+        self._queue.clear()
+        if self._task and not self._task.done() and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+
+class ChunkCoalescer:
+    """流式片段合并器
+
+    在时间窗口或字符数上限内把模型产出的多个token合并成一个紧凑的增量帧，
+    增量帧只包含类型、消息ID和文本，参与者等静态信息只在开始消息中发送一次。
+    默认全速转发模型输出，由前端按开始消息中的节奏提示做打字动画；
+    realistic模式下在服务端按固定间隔回放，用于录制。
+    """
+
+    def __init__(self, manager: "WebSocketManager", game_id: int, chunk_type: str, message_id: str,
+                 window_ms: Optional[int] = None, max_chars: Optional[int] = None):
+        self.manager = manager
+        self.game_id = game_id
+        self.chunk_type = chunk_type
+        self.message_id = message_id
+        self.window = (window_ms if window_ms is not None else settings.WS_CHUNK_COALESCE_MS) / 1000
+        self.max_chars = max_chars if max_chars is not None else settings.WS_CHUNK_COALESCE_CHARS
+        self._buffer: List[str] = []
+        self._buffered_chars = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.frames_sent = 0
+        self.realistic_pacing = settings.STREAM_PACING_MODE == "realistic"
+
+    @property
+    def pacing(self) -> dict:
+        """随开始消息发送的节奏提示"""
+        if self.realistic_pacing:
+            # 服务端已按真实速度回放，前端直接显示
+            return {"mode": "realistic", "chars_per_second": 0}
+        return {"mode": "client", "chars_per_second": settings.STREAM_CLIENT_CHARS_PER_SECOND}
+
+    async def add(self, text: str):
+        """追加一个片段，达到字符上限时立即发送"""
+        if not text:
+            return
+        self._buffer.append(text)
+        self._buffered_chars += len(text)
+        if self._buffered_chars >= self.max_chars or self.window <= 0:
+            await self.flush()
+        elif self._timer is None:
+            # 时间窗口到期时发送，避免模型停顿时片段滞留
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush_on_timer)
+
+        if self.realistic_pacing:
+            await asyncio.sleep(settings.STREAM_REPLAY_CHUNK_DELAY)
+
+    def _flush_on_timer(self):
+        self._timer = None
+        self._send()
+
+    async def flush(self):
+        """立即发送缓冲中的片段（发言结束前必须调用）"""
+        self._send()
+
+    def _send(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        chunk = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_chars = 0
+        self.frames_sent += 1
+        self.manager.enqueue_to_game({
+            "type": self.chunk_type,
+            "message_id": self.message_id,
+            "chunk": chunk
+        }, self.game_id)
+
+
 class WebSocketManager:
     """WebSocket连接管理器"""
-    
+
     def __init__(self):
         # 游戏观察者连接
         self.game_connections: Dict[int, List[WebSocket]] = {}
+        # 观察者连接的出站队列
+        self.senders: Dict[WebSocket, ConnectionSender] = {}
         # 管理员连接
         self.admin_connections: Dict[int, WebSocket] = {}
-    
+
     async def connect(self, websocket: WebSocket, game_id: int):
         """连接观察者WebSocket"""
         await websocket.accept()
         if game_id not in self.game_connections:
             self.game_connections[game_id] = []
-        
+
         # 检查是否已存在，避免重复连接
         if websocket not in self.game_connections[game_id]:
             self.game_connections[game_id].append(websocket)
-    
+            self.senders[websocket] = ConnectionSender(
+                websocket,
+                max_queue=settings.WS_SEND_QUEUE_SIZE,
+                overflow_policy=settings.WS_OVERFLOW_POLICY,
+                on_failed=lambda sender, gid=game_id: self._remove_failed(sender, gid)
+            )
+
     async def connect_admin(self, websocket: WebSocket, game_id: int):
         """连接管理员WebSocket"""
         await websocket.accept()
         self.admin_connections[game_id] = websocket
-    
+
     def disconnect(self, websocket: WebSocket, game_id: int):
         """断开观察者连接"""
         if game_id in self.game_connections:
             if websocket in self.game_connections[game_id]:
                 self.game_connections[game_id].remove(websocket)
-    
+        sender = self.senders.pop(websocket, None)
+        if sender:
+            sender.close()
+
+    def _remove_failed(self, sender: ConnectionSender, game_id: int):
+        """移除发送失败或被判定为慢速的连接"""
+        self.disconnect(sender.websocket, game_id)
+        remaining = len(self.game_connections.get(game_id, []))
+        print(f"移除 1 个失效连接，剩余连接数: {remaining}")
+
     def disconnect_admin(self, websocket: WebSocket, game_id: int):
         """断开管理员连接"""
         if game_id in self.admin_connections:
             if self.admin_connections[game_id] == websocket:
                 del self.admin_connections[game_id]
-    
+
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """发送个人消息"""
+        frame = OutboundFrame(json.dumps(message, ensure_ascii=False), message)
+        sender = self.senders.get(websocket)
+        if sender:
+            # 经由连接自己的队列发送，保持与广播消息的顺序
+            sender.enqueue(frame)
+            return
         try:
-            await websocket.send_text(json.dumps(message, ensure_ascii=False))
+            await websocket.send_text(frame.text)
         except Exception as e:
             print(f"发送个人消息失败: {e}")
-    
+
     async def broadcast_to_game(self, message: dict, game_id: int):
-        """向游戏中的所有观察者广播消息"""
-        if game_id not in self.game_connections:
-            return
-        
-        connections = self.game_connections[game_id].copy()  # 创建副本进行迭代
+        """向游戏中的所有观察者广播消息（只入队，不等待发送完成）"""
+        self.enqueue_to_game(message, game_id)
+
+    def enqueue_to_game(self, message: dict, game_id: int):
+        """把消息序列化一次后放入该游戏所有观察者的出站队列"""
+        connections = self.game_connections.get(game_id)
         if not connections:
             return
-        
+
+        # 只序列化一次，所有连接共享同一份编码结果
         message_text = json.dumps(message, ensure_ascii=False)
-        failed_connections = []
-        success_count = 0
-        
-        for connection in connections:
-            try:
-                await connection.send_text(message_text)
-                success_count += 1
-            except Exception as e:
-                print(f"广播消息失败: {e}")
-                failed_connections.append(connection)
-        
-        # 移除失败的连接
-        for failed_connection in failed_connections:
-            if failed_connection in self.game_connections[game_id]:
-                self.game_connections[game_id].remove(failed_connection)
-        
-        if failed_connections:
-            print(f"移除 {len(failed_connections)} 个失效连接，剩余连接数: {len(self.game_connections[game_id])}")
-    
+
+        for connection in connections.copy():  # 创建副本进行迭代
+            sender = self.senders.get(connection)
+            if sender:
+                # 每个连接一个帧包装，溢出合并时互不影响
+                sender.enqueue(OutboundFrame(message_text, message))
+
+    def chunk_coalescer(self, game_id: int, chunk_type: str, message_id: str) -> ChunkCoalescer:
+        """创建流式片段合并器"""
+        return ChunkCoalescer(self, game_id, chunk_type, message_id)
+
     async def send_to_admin(self, message: dict, game_id: int):
         """发送消息给管理员"""
         if game_id in self.admin_connections:
@@ -88,4 +301,4 @@ class WebSocketManager:
             except Exception as e:
                 print(f"发送管理员消息失败: {e}")
                 # 连接已断开，移除
-                del self.admin_connections[game_id] 
\ No newline at end of file
+                del self.admin_connections[game_id]
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+复合索引基准测试 - 在包含大量已结束游戏的临时数据库上对比热点查询耗时
+
+用法: python benchmark_indexes.py [游戏数量，默认3000]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.core.database import Base, COMPOSITE_INDEXES, _ensure_composite_indexes
+from app.models.game import Game
+from app.models.participant import Participant
+from app.models.round_model import Round
+from app.models.message import Message
+from app.models.vote import Vote
+
+PARTICIPANTS_PER_GAME = 15
+MESSAGES_PER_ROUND = 40
+ITERATIONS = 200
+
+# 游戏引擎中的热点查询
+HOT_QUERIES = {
+    "对话历史窗口": (
+        "SELECT content FROM messages WHERE round_id = :round_id AND message_type = 'chat' "
+        "ORDER BY sequence_number DESC LIMIT 10"
+    ),
+    "最大消息序号": (
+        "SELECT sequence_number FROM messages WHERE round_id = :round_id AND sequence_number IS NOT NULL "
+        "ORDER BY sequence_number DESC LIMIT 1"
+    ),
+    "阶段投票": "SELECT * FROM votes WHERE round_id = :round_id AND vote_phase = 'final_voting'",
+    "活跃参与者": "SELECT * FROM participants WHERE game_id = :game_id AND status = 'active'",
+    "最新轮次": "SELECT * FROM rounds WHERE game_id = :game_id ORDER BY round_number DESC LIMIT 1",
+    "运行中游戏": "SELECT * FROM games WHERE status = 'running'",
+}
+
+
+def seed(conn, game_count: int):
+    """写入大量已结束的游戏数据"""
+    games, participants, rounds, messages, votes = [], [], [], [], []
+    participant_id = 0
+    message_id = 0
+    vote_id = 0
+
+    for game_id in range(1, game_count + 1):
+        games.append({"id": game_id, "status": "finished" if game_id % 100 else "running"})
+        rounds.append({"id": game_id, "game_id": game_id, "round_number": 1, "status": "finished"})
+
+        ids = []
+        for i in range(PARTICIPANTS_PER_GAME):
+            participant_id += 1
+            ids.append(participant_id)
+            participants.append({
+                "id": participant_id, "game_id": game_id, "model_name": f"model-{i}",
+                "human_name": f"参与者{i}", "status": "eliminated" if i == 0 else "active"
+            })
+
+        for sequence in range(MESSAGES_PER_ROUND):
+            message_id += 1
+            messages.append({
+                "id": message_id, "round_id": game_id, "participant_id": random.choice(ids),
+                "content": "发言内容" * 20, "message_type": "chat" if sequence % 8 else "system",
+                "sequence_number": sequence
+            })
+
+        for phase in ("initial_voting", "final_voting", "additional_voting"):
+            for voter in ids:
+                vote_id += 1
+                votes.append({
+                    "id": vote_id, "round_id": game_id, "voter_id": voter,
+                    "target_id": random.choice([p for p in ids if p != voter]), "vote_phase": phase
+                })
+
+    conn.execute(text("INSERT INTO games (id, status) VALUES (:id, :status)"), games)
+    conn.execute(text(
+        "INSERT INTO participants (id, game_id, model_name, human_name, status) "
+        "VALUES (:id, :game_id, :model_name, :human_name, :status)"
+    ), participants)
+    conn.execute(text(
+        "INSERT INTO rounds (id, game_id, round_number, status) VALUES (:id, :game_id, :round_number, :status)"
+    ), rounds)
+    conn.execute(text(
+        "INSERT INTO messages (id, round_id, participant_id, content, message_type, sequence_number) "
+        "VALUES (:id, :round_id, :participant_id, :content, :message_type, :sequence_number)"
+    ), messages)
+    conn.execute(text(
+        "INSERT INTO votes (id, round_id, voter_id, target_id, vote_phase) "
+        "VALUES (:id, :round_id, :voter_id, :target_id, :vote_phase)"
+    ), votes)
+    conn.commit()
+    print(f"📊 已写入 {len(games)} 个游戏, {len(participants)} 个参与者, {len(messages)} 条消息, {len(votes)} 张投票")
+
+
+def measure(conn, game_count: int) -> dict:
+    """测量每个热点查询的平均耗时（毫秒）"""
+    timings = {}
+    for name, sql in HOT_QUERIES.items():
+        statement = text(sql)
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            target = random.randint(1, game_count)
+            conn.execute(statement, {"round_id": target, "game_id": target}).fetchall()
+        timings[name] = (time.perf_counter() - start) * 1000 / ITERATIONS
+    return timings
+
+
+def main():
+    game_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+        Base.metadata.create_all(bind=engine)
+
+        with engine.connect() as conn:
+            # 删除模型中声明的复合索引，模拟迁移前的旧数据库
+            for index_name, _, _ in COMPOSITE_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+            conn.commit()
+
+            print(f"🔄 写入 {game_count} 个已结束游戏的测试数据...")
+            seed(conn, game_count)
+
+            before = measure(conn, game_count)
+            _ensure_composite_indexes(conn)
+            conn.execute(text("ANALYZE"))
+            conn.commit()
+            after = measure(conn, game_count)
+
+        engine.dispose()
+
+    print(f"\n{'查询':<12}{'无索引(ms)':>12}{'有索引(ms)':>12}{'加速比':>10}")
+    for name in HOT_QUERIES:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<12}{before[name]:>12.3f}{after[name]:>12.3f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
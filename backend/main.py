@@ -35,6 +35,22 @@ async def startup_event():
     await init_db()
     print("✅ 数据库初始化完成")
     
+    # 启动后端健康监控
+    from app.services.health_monitor import health_monitor
+    await health_monitor.start()
+    
+    # 启动生成调度器的已加载模型刷新
+    from app.services.generation_scheduler import generation_scheduler
+    await generation_scheduler.start()
+    
+    # 启动模型目录的后台刷新
+    from app.services.model_catalog import model_catalog
+    await model_catalog.start()
+    
+    # 启动过期游戏的定期清理
+    from app.services.game_purge import game_purger
+    await game_purger.start()
+    
     # 恢复中断的游戏
     try:
         from app.core.database import get_db
@@ -54,6 +70,38 @@ async def startup_event():
         print(f"⚠️ 游戏恢复过程中出现错误: {e}")
         print("🔄 服务器将继续启动，但中断的游戏可能需要手动重启")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用停止时的清理"""
+    from app.core.http_client import http_clients
+    from app.services.health_monitor import health_monitor
+    from app.services.generation_scheduler import generation_scheduler
+    from app.services.model_catalog import model_catalog
+    from app.services.game_orchestrator import game_orchestrator
+    from app.services.game_purge import game_purger
+    
+    await game_purger.stop()
+    
+    # 等待运行中的游戏结束（超时后取消，重启后自动恢复）
+    await game_orchestrator.drain(settings.GAME_DRAIN_TIMEOUT)
+    
+    # 写完消息队列中尚未提交的记录
+    from app.services.message_writer import message_writer
+    await message_writer.close()
+    
+    # 停止后端健康监控、调度器刷新和模型目录刷新
+    await health_monitor.stop()
+    await generation_scheduler.stop()
+    await model_catalog.stop()
+    
+    # 关闭数据库线程
+    from app.core.database import shutdown_db_executor
+    shutdown_db_executor()
+    
+    # 关闭共享的HTTP连接池
+    await http_clients.close_all()
+    print("✅ HTTP连接池已关闭")
+
 @app.get("/")
 async def root():
     """根路径健康检查"""
@@ -81,9 +81,21 @@ interface ChatMessage {
   chunk?: string; // 文本片段
   isStreaming?: boolean; // 是否正在流式显示
   streamingContent?: string; // 当前累积的流式内容
+  displayedLength?: number; // 节奏动画已显示的字符数
+  charsPerSecond?: number; // 后端节奏提示：每秒显示字符数（0表示直接显示）
+  pendingContent?: string; // 流式结束后等待动画播放完的完整内容
+  pacing?: { mode: string; chars_per_second: number }; // 开始消息中的节奏提示
   error?: string; // 错误信息
 }
 
+// 流式消息完成：节奏动画尚未播放完时先保留完整内容，由动画定时器收尾
+const finishStreamingMessage = (msg: ChatMessage, content: string): ChatMessage => {
+  if (msg.charsPerSecond && (msg.displayedLength || 0) < content.length) {
+    return { ...msg, streamingContent: content, pendingContent: content };
+  }
+  return { ...msg, content, isStreaming: false, streamingContent: undefined, pendingContent: undefined };
+};
+
 const GameRoom: React.FC = () => {
   const { gameId } = useParams<{ gameId: string }>();
   const navigate = useNavigate();
@@ -862,6 +874,37 @@ const GameRoom: React.FC = () => {
     return renderCompletedContent(content);
   };
 
+  // 流式节奏动画：后端全速转发片段，前端按节奏提示逐字显示，积压过多时加速追赶
+  useEffect(() => {
+    const tickMs = 50;
+    const timer = setInterval(() => {
+      setMessages(prev => {
+        let changed = false;
+        const next = prev.map(msg => {
+          if (!msg.isStreaming || !msg.charsPerSecond) {
+            return msg;
+          }
+          const total = (msg.streamingContent || '').length;
+          const shown = msg.displayedLength || 0;
+          if (shown >= total) {
+            if (msg.pendingContent === undefined) {
+              return msg;
+            }
+            changed = true;
+            return { ...msg, content: msg.pendingContent, isStreaming: false, streamingContent: undefined, pendingContent: undefined };
+          }
+          const baseStep = msg.charsPerSecond * tickMs / 1000;
+          const backlog = total - shown - msg.charsPerSecond * 2;
+          const step = Math.max(1, Math.ceil(baseStep + Math.max(0, backlog) / 20));
+          changed = true;
+          return { ...msg, displayedLength: Math.min(total, shown + step) };
+        });
+        return changed ? next : prev;
+      });
+    }, tickMs);
+    return () => clearInterval(timer);
+  }, []);
+
   const handleWebSocketMessage = useCallback((message: ChatMessage) => {
     // 流式消息类型不需要去重，因为它们共享同一个message_id但需要分别处理
     const streamingMessageTypes = [
@@ -983,7 +1026,9 @@ const GameRoom: React.FC = () => {
           timestamp: message.timestamp,
           message_id: message.message_id,
           isStreaming: true,
-          streamingContent: ''
+          streamingContent: '',
+          displayedLength: 0,
+          charsPerSecond: message.pacing?.chars_per_second || 0
         }]);
         break;
       
@@ -1016,12 +1061,9 @@ const GameRoom: React.FC = () => {
           );
           
           if (streamingMessageIndex !== -1) {
-            newMessages[streamingMessageIndex] = {
-              ...newMessages[streamingMessageIndex],
-              content: message.content,
-              isStreaming: false,
-              streamingContent: undefined
-            };
+            newMessages[streamingMessageIndex] = finishStreamingMessage(
+              newMessages[streamingMessageIndex], message.content || ''
+            );
           }
           return newMessages;
         });
@@ -1069,7 +1111,9 @@ const GameRoom: React.FC = () => {
           timestamp: message.timestamp,
           message_id: message.message_id,
           isStreaming: true,
-          streamingContent: ''
+          streamingContent: '',
+          displayedLength: 0,
+          charsPerSecond: message.pacing?.chars_per_second || 0
         }]);
         break;
       
@@ -1101,12 +1145,9 @@ const GameRoom: React.FC = () => {
           );
           
           if (streamingMessageIndex !== -1) {
-            newMessages[streamingMessageIndex] = {
-              ...newMessages[streamingMessageIndex],
-              content: message.content,
-              isStreaming: false,
-              streamingContent: undefined
-            };
+            newMessages[streamingMessageIndex] = finishStreamingMessage(
+              newMessages[streamingMessageIndex], message.content || ''
+            );
           }
           return newMessages;
         });
@@ -1703,7 +1744,12 @@ const GameRoom: React.FC = () => {
                           {message.isStreaming 
                             ? (
                               <span>
-                                {renderMessageContent(message.streamingContent || '', true)}
+                                {renderMessageContent(
+                                  message.charsPerSecond
+                                    ? (message.streamingContent || '').slice(0, message.displayedLength || 0)
+                                    : message.streamingContent || '',
+                                  true
+                                )}
                                 <span 
                                   style={{ 
                                     opacity: 0.7, 